@@ -1,32 +1,65 @@
+import asyncio
 import json
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator, Awaitable, Callable, Tuple, Type
+from pydantic import BaseModel, ValidationError as PydanticValidationError
 from app.services.ollama_client import OllamaClient
+from app.services.llm_usage import llm_call_scope
+from app.services.llm_sessions import llm_sessions, listing_fingerprint
+from app.services.prompt_builder import BuiltPrompt, PromptBuilder, prompt_budget
+from app.services.llm_cascade import cascade_profiles, record_accepted, record_escalation
+from app.services.stage_results import StageResultStore, stage_fingerprint
+from app.services.field_repair import FieldRepair
+from app.services.language_detector import language_detector
 from app.agents.competitor_researcher import CompetitorResearcher
 from app.services.seo_analyzer import SEOAnalyzer
 from app.services.market_intelligence import MarketIntelligence
 from app.core.logger import LoggerMixin
 from app.core.exceptions import AIGenerationError, ValidationError
-from app.core.config import settings
-from app.core.cache import cache_language_detection, cache_competitor_research
+from app.core.config import settings, LLMProfile
+from app.core.deadline import Deadline, deadline_scope
+from app.core.stage_graph import StageGraph
+from app.core.cache import memoize
+from app.schemas.llm import ListingGeneration, FusedAnalysis
 
 
 class AnalyzerAgent(LoggerMixin):
     """Refactored analyzer agent with better structure and logging."""
     
-    def __init__(self):
-        self.ollama = OllamaClient()
-        self.model = settings.ollama_model
-        self.competitor_researcher = CompetitorResearcher()
-        self.seo_analyzer = SEOAnalyzer()
-        self.market_intelligence = MarketIntelligence()
+    def __init__(self, ollama: Optional[OllamaClient] = None,
+                 competitor_researcher: Optional[CompetitorResearcher] = None,
+                 seo_analyzer: Optional[SEOAnalyzer] = None,
+                 market_intelligence: Optional[MarketIntelligence] = None):
+        # The app passes shared instances from ``app.services.registry``
+        self.ollama = ollama or OllamaClient()
+        self.field_repair = FieldRepair("analyzer", self.ollama)
+        self.competitor_researcher = competitor_researcher or CompetitorResearcher()
+        self.seo_analyzer = seo_analyzer or SEOAnalyzer(ollama=self.ollama)
+        self.market_intelligence = market_intelligence or MarketIntelligence(ollama=self.ollama)
     
-    async def analyze(self, title: str, description: str) -> Dict[str, Any]:
+    async def analyze(self, title: str, description: str, session_key: Optional[str] = None,
+                      fused: Optional[bool] = None, deadline: Optional[Deadline] = None,
+                      stage_store: Optional[StageResultStore] = None) -> Dict[str, Any]:
         """
         Main analysis method - orchestrates the entire analysis process.
         
         Args:
             title: Product title to analyze
             description: Product description to analyze
+            session_key: When given, the model context of the generation is kept
+                under this key so a later optimization can continue from it
+            fused: Generate semantic keywords, competitive insights and the listing
+                in a single LLM call; defaults to ``settings.analysis_fused_mode``
+            deadline: Time budget for the whole analysis; defaults to
+                ``settings.analysis_deadline_seconds``. Competitor research, SEO and
+                market analysis are skipped or cut short as needed to leave time for
+                the listing generation, and the response lists the stages cut.
+            stage_store: Stored stage outputs of the listing being re-analyzed;
+                every stage whose inputs are unchanged since they were stored is
+                reused instead of recomputed, and the response lists those stages.
+        
+        Competitor research, SEO and market analysis run concurrently as far as
+        their dependencies allow (see ``_preparation_graph``); the response
+        reports when each of them started and finished.
             
         Returns:
             Dict containing analysis results
@@ -36,40 +69,40 @@ class AnalyzerAgent(LoggerMixin):
             ValidationError: If input validation fails
         """
         self.log_operation_start("product_analysis", title=title[:50])
+        fused = settings.analysis_fused_mode if fused is None else fused
+        deadline = deadline or Deadline(settings.analysis_deadline_seconds)
         
         try:
-            # Validate inputs
-            self._validate_inputs(title, description)
-            
-            # Step 1: Detect language
-            input_language = self._detect_language(title, description)
-            self.logger.info("Language detected", language=input_language)
-            
-            # Step 2: Research competitors
-            competitor_data = await self._research_competitors(title, description)
-            
-            # Step 3: Analyze SEO metrics
-            seo_analysis = await self.seo_analyzer.analyze_seo_metrics(
-                title, description, competitor_data.get("keywords", [])
-            )
-            
-            # Step 4: Analyze market intelligence
-            market_analysis = await self.market_intelligence.analyze_market_competition(
-                title, description, max_competitors=8
-            )
-            
-            # Step 5: Generate AI analysis with enhanced data
-            analysis_result = await self._generate_ai_analysis(
-                title, description, competitor_data, input_language, seo_analysis, market_analysis
-            )
-            
-            # Step 6: Format and enhance response with all data
-            final_result = self._format_analysis_response(
-                analysis_result, competitor_data, input_language, seo_analysis, market_analysis
-            )
+            with deadline_scope(deadline):
+                # Validate inputs
+                self._validate_inputs(title, description)
+                
+                # Step 1: Detect language
+                input_language = language_detector.detect(f"{title} {description}")
+                self.logger.info("Language detected", language=input_language)
+                
+                # Steps 2-4: Competitor research, SEO and market intelligence, concurrently
+                graph = self._preparation_graph(title, description, fused, deadline, stage_store)
+                stages = await graph.run()
+                competitor_data = stages["competitor_research"]
+                seo_analysis = stages["seo_analysis"]
+                market_analysis = stages["market_intelligence"]
+                
+                # Step 5: Generate AI analysis with enhanced data
+                analysis_result = await self._generate_ai_analysis(
+                    title, description, competitor_data, input_language, seo_analysis, market_analysis,
+                    session_key=session_key, fused=fused, stage_store=stage_store
+                )
+                
+                # Step 6: Format and enhance response with all data
+                final_result = self._format_analysis_response(
+                    analysis_result, competitor_data, input_language, seo_analysis, market_analysis, deadline,
+                    stage_timings=graph.timings, stage_store=stage_store
+                )
             
             self.log_operation_success("product_analysis", 
-                                     title_length=len(final_result.get("data", {}).get("title", "")))
+                                     title_length=len(final_result.get("data", {}).get("title", "")),
+                                     stages_cut=len(deadline.stages_cut))
             
             return final_result
             
@@ -79,6 +112,251 @@ class AnalyzerAgent(LoggerMixin):
             self.log_operation_error("product_analysis", e, title=title[:50])
             raise AIGenerationError(f"Unexpected error during analysis: {str(e)}")
     
+    async def analyze_stream(self, title: str, description: str, session_key: Optional[str] = None,
+                             fused: Optional[bool] = None, deadline: Optional[Deadline] = None,
+                             stage_store: Optional[StageResultStore] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of ``analyze``.
+        
+        Yields ``{"event": ..., "data": ...}`` dicts: a ``stage`` event as each
+        preparation step completes (or is skipped to meet the deadline), in
+        completion order since the steps run concurrently and carrying the
+        step's section of the final response under ``result`` so clients can
+        show it before the generation finishes,
+        ``token`` events while the listing is being generated, and a final
+        ``result`` (or ``error``) event carrying the same payload ``analyze``
+        would return. A ``repair`` event means the streamed output was
+        incomplete and the listed fields were regenerated on their own.
+        
+        Args:
+            title: Product title to analyze
+            description: Product description to analyze
+            session_key: See ``analyze``
+            fused: See ``analyze``
+            deadline: See ``analyze``
+            stage_store: See ``analyze``; reused stages are flagged in their events
+        """
+        self.log_operation_start("product_analysis_stream", title=title[:50])
+        fused = settings.analysis_fused_mode if fused is None else fused
+        deadline = deadline or Deadline(settings.analysis_deadline_seconds)
+        
+        try:
+            with deadline_scope(deadline):
+                self._validate_inputs(title, description)
+                
+                input_language = language_detector.detect(f"{title} {description}")
+                yield self._stage_event("language_detection", language=input_language)
+                
+                graph = self._preparation_graph(title, description, fused, deadline, stage_store)
+                async for stage in graph.as_completed():
+                    yield self._stage_event(stage, status=deadline.status(stage),
+                                            success=graph.results[stage].get("success", False),
+                                            seconds=graph.timings[stage]["seconds"],
+                                            reused=self._was_reused(stage_store, stage),
+                                            result=self._stage_section(stage, graph.results[stage]))
+                competitor_data = graph.results["competitor_research"]
+                seo_analysis = graph.results["seo_analysis"]
+                market_analysis = graph.results["market_intelligence"]
+                
+                system_prompt, user_prompt, schema, profile = self._build_generation_request(
+                    title, description, competitor_data, input_language, seo_analysis, market_analysis, fused
+                )
+                
+                generation_fingerprint = self._generation_fingerprint(system_prompt, user_prompt, schema, profile)
+                parsed_data = stage_store.get("ai_generation", generation_fingerprint) if stage_store else None
+                reused = parsed_data is not None
+                
+                # Nothing to generate when the stored listing was built from the same prompt
+                profiles = [] if reused else cascade_profiles(profile)
+                for index, attempt in enumerate(profiles):
+                    final = index == len(profiles) - 1
+                    chunks = []
+                    final_chunk: Dict[str, Any] = {}
+                    partial = None
+                    try:
+                        with llm_call_scope("analyzer", "fused_analysis" if fused else "listing_generation"):
+                            async for chunk in self.ollama.generate_stream(
+                                model=attempt.model,
+                                prompt=user_prompt.text,
+                                system_prompt=system_prompt,
+                                options=attempt.options(),
+                                schema=schema,
+                                keep_context=bool(session_key) and settings.llm_session_enabled
+                            ):
+                                if not chunk["success"]:
+                                    if chunk.get("partial") is not None:
+                                        partial = chunk["partial"]
+                                        break
+                                    raise AIGenerationError(f"Ollama generation failed: {chunk.get('error', 'Unknown error')}")
+                                if chunk["response"]:
+                                    chunks.append(chunk["response"])
+                                    yield {"event": "token", "data": {"text": chunk["response"]}}
+                                if chunk["done"]:
+                                    final_chunk = chunk
+                        
+                        if partial is not None:
+                            parsed_data = await self._complete_listing(partial, schema, f"{title}\n{description}")
+                            # The streamed tokens are incomplete; the result carries the repaired listing
+                            yield {"event": "repair", "data": {"fields": parsed_data["repaired_fields"]}}
+                        else:
+                            parsed_data = self._parse_ai_response("".join(chunks), schema)
+                        reason = None if final else self._cascade_rejection(parsed_data)
+                    except AIGenerationError:
+                        if final:
+                            raise
+                        reason = "invalid_output"
+                    
+                    if reason is None:
+                        if not final:
+                            record_accepted("analyzer", attempt.model)
+                        break
+                    
+                    next_model = profiles[index + 1].model
+                    record_escalation("analyzer", attempt.model, next_model, reason)
+                    # Tells the client to discard the tokens streamed so far
+                    yield {"event": "cascade", "data": {"from_model": attempt.model, "to_model": next_model, "reason": reason}}
+                
+                if not reused and stage_store is not None:
+                    stage_store.save("ai_generation", generation_fingerprint, parsed_data)
+                if fused:
+                    parsed_data = await self._apply_fused_results(parsed_data, seo_analysis, market_analysis)
+                if session_key and not reused:
+                    self._save_session(session_key, attempt.model, parsed_data, final_chunk)
+                yield self._stage_event("ai_generation", bullets_count=len(parsed_data.get("bullets", [])),
+                                        prompt=user_prompt.report(), reused=reused)
+                
+                final_result = self._format_analysis_response(
+                    parsed_data, competitor_data, input_language, seo_analysis, market_analysis, deadline,
+                    stage_timings=graph.timings, stage_store=stage_store
+                )
+                
+                self.log_operation_success("product_analysis_stream",
+                                         title_length=len(final_result.get("data", {}).get("title", "")),
+                                         stages_cut=len(deadline.stages_cut))
+                
+                yield {"event": "result", "data": final_result}
+        
+        except (AIGenerationError, ValidationError) as e:
+            self.log_operation_error("product_analysis_stream", e, title=title[:50])
+            yield {"event": "error", "data": {"type": type(e).__name__, "message": str(e)}}
+        except Exception as e:
+            self.log_operation_error("product_analysis_stream", e, title=title[:50])
+            yield {"event": "error", "data": {
+                "type": "AIGenerationError",
+                "message": f"Unexpected error during analysis: {str(e)}"
+            }}
+    
+    def _stage_event(self, stage: str, status: str = "completed", **details: Any) -> Dict[str, Any]:
+        """Build a stage-completion event for streaming responses."""
+        return {"event": "stage", "data": {"stage": stage, "status": status, **details}}
+    
+    def _stage_section(self, stage: str, result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The part of the final response a preparation stage's result ends up in."""
+        if stage == "competitor_research":
+            return self._extract_competitor_info(result)
+        if stage == "seo_analysis":
+            return self._seo_section(result)
+        if stage == "market_intelligence":
+            return self._market_section(result)
+        return None
+    
+    def _preparation_graph(self, title: str, description: str, fused: bool, deadline: Deadline,
+                           stage_store: Optional[StageResultStore] = None) -> StageGraph:
+        """Declare the stages that gather data for the generation and what each needs.
+        
+        Competitor research and market intelligence are independent; SEO only
+        needs the keywords competitor research searched with. Semantic keywords
+        and competitive insights come from the generation itself in fused mode.
+        
+        Each stage is fingerprinted by exactly the inputs it uses, so with a
+        ``stage_store`` a description edit that leaves the search terms alone
+        reuses the stored competitor research.
+        """
+        search_terms = self.competitor_researcher.search_terms(title, description)
+        
+        async def competitor_research(_: Dict[str, Any]) -> Dict[str, Any]:
+            fingerprint = stage_fingerprint("competitor_research", search_terms=search_terms)
+            return await self._incremental_stage(deadline, stage_store, "competitor_research", fingerprint,
+                                                 lambda: self._research_competitors(title, description))
+        
+        async def market_intelligence(_: Dict[str, Any]) -> Dict[str, Any]:
+            fingerprint = stage_fingerprint("market_intelligence", title=title, description=description,
+                                            include_insights=not fused, embeddings=settings.embeddings_enabled)
+            return await self._incremental_stage(
+                deadline, stage_store, "market_intelligence", fingerprint,
+                lambda: self.market_intelligence.analyze_market_competition(
+                    title, description, max_competitors=8, include_insights=not fused
+                )
+            )
+        
+        async def seo_analysis(done: Dict[str, Any]) -> Dict[str, Any]:
+            keywords = self._competitor_keywords(done["competitor_research"])
+            fingerprint = stage_fingerprint("seo_analysis", title=title, description=description, keywords=keywords,
+                                            include_semantic=not fused, embeddings=settings.embeddings_enabled)
+            return await self._incremental_stage(
+                deadline, stage_store, "seo_analysis", fingerprint,
+                lambda: self.seo_analyzer.analyze_seo_metrics(title, description, keywords, include_semantic=not fused)
+            )
+        
+        graph = StageGraph("analysis")
+        graph.add("competitor_research", competitor_research)
+        graph.add("market_intelligence", market_intelligence)
+        graph.add("seo_analysis", seo_analysis, depends_on=["competitor_research"])
+        return graph
+    
+    async def _incremental_stage(self, deadline: Deadline, stage_store: Optional[StageResultStore], stage: str,
+                                 fingerprint: str, run: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """The stored output of ``stage`` if its inputs are unchanged, else a fresh run within the deadline."""
+        if stage_store is None:
+            return await self._run_stage(deadline, stage, run)
+        
+        stored = stage_store.get(stage, fingerprint)
+        if stored is not None:
+            return stored
+        
+        result = await self._run_stage(deadline, stage, run)
+        stage_store.save(stage, fingerprint, result)
+        return result
+    
+    def _was_reused(self, stage_store: Optional[StageResultStore], stage: str) -> bool:
+        return stage_store is not None and stage in stage_store.reused
+    
+    def _generation_fingerprint(self, system_prompt: str, user_prompt: BuiltPrompt,
+                                schema: Type[BaseModel], profile: LLMProfile) -> str:
+        """Inputs of the generation: the prompts themselves (which embed every stage output) and the model."""
+        return stage_fingerprint("ai_generation", system_prompt=system_prompt, prompt=user_prompt.text,
+                                 schema=schema.__name__, model=profile.model, options=profile.options())
+    
+    def _competitor_keywords(self, competitor_data: Dict[str, Any]) -> List[str]:
+        """Keywords competitor research searched with, if it succeeded."""
+        if not competitor_data.get("success") or not competitor_data.get("data"):
+            return []
+        return competitor_data["data"].get("keywords_used", [])
+    
+    async def _run_stage(self, deadline: Deadline, stage: str,
+                         run: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Run an optional preparation stage within its share of the deadline.
+        
+        The stage is skipped when its budget would eat into the time reserved
+        for the listing generation, and cut off when it overruns; either way the
+        cut is recorded on the deadline and an unsuccessful result is returned,
+        which every later step already treats as missing data.
+        """
+        stage_deadline = deadline.for_stage(
+            stage,
+            settings.deadline_stage_budgets.get(stage, deadline.remaining()),
+            reserve=settings.deadline_generation_reserve
+        )
+        if stage_deadline is None:
+            return {"success": False, "error": f"{stage} skipped to meet the deadline", "data": None}
+        
+        with deadline_scope(stage_deadline):
+            try:
+                return await asyncio.wait_for(run(), timeout=stage_deadline.remaining())
+            except asyncio.TimeoutError:
+                deadline.cut(stage, "timed_out")
+                return {"success": False, "error": f"{stage} timed out", "data": None}
+    
     def _validate_inputs(self, title: str, description: str) -> None:
         """Validate input parameters."""
         if not title or not title.strip():
@@ -93,7 +371,9 @@ class AnalyzerAgent(LoggerMixin):
         if len(description) > 10000:
             raise ValidationError("Description too long (max 10000 characters)")
     
-    @cache_competitor_research(ttl=7200)  # Cache for 2 hours  
+    @memoize("competitor_research", ttl=7200, depends_on=(CompetitorResearcher,),
+             # Demo-sourced or deadline-cut research is retried rather than served for hours
+             cache_if=lambda result: result.get("success", False) and not result.get("degraded"))
     async def _research_competitors(self, title: str, description: str) -> Dict[str, Any]:
         """Research competitors for the given product."""
         self.log_operation_start("competitor_research", title=title[:50])
@@ -117,31 +397,58 @@ class AnalyzerAgent(LoggerMixin):
     async def _generate_ai_analysis(self, title: str, description: str, 
                                   competitor_data: Dict[str, Any], language: str,
                                   seo_analysis: Optional[Dict[str, Any]] = None,
-                                  market_analysis: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Generate AI analysis using Ollama."""
+                                  market_analysis: Optional[Dict[str, Any]] = None,
+                                  session_key: Optional[str] = None,
+                                  fused: bool = False,
+                                  stage_store: Optional[StageResultStore] = None) -> Dict[str, Any]:
+        """Generate AI analysis using Ollama, or reuse the stored listing built from the same prompt."""
         self.log_operation_start("ai_generation", language=language)
         
         try:
             # Build prompts
-            system_prompt = self._build_system_prompt(language)
-            user_prompt = self._build_user_prompt(title, description, competitor_data, language, seo_analysis, market_analysis)
-            
-            # Generate response
-            result = await self.ollama.generate(
-                model=self.model,
-                prompt=user_prompt,
-                system_prompt=system_prompt
+            system_prompt, user_prompt, schema, profile = self._build_generation_request(
+                title, description, competitor_data, language, seo_analysis, market_analysis, fused
             )
             
-            if not result["success"]:
-                raise AIGenerationError(f"Ollama generation failed: {result.get('error', 'Unknown error')}")
+            generation_fingerprint = self._generation_fingerprint(system_prompt, user_prompt, schema, profile)
+            parsed_data = stage_store.get("ai_generation", generation_fingerprint) if stage_store else None
+            reused = parsed_data is not None
+            
+            # Try the cascade's fast model first; the configured model only sees rejected outputs
+            profiles = [] if reused else cascade_profiles(profile)
+            for index, attempt in enumerate(profiles):
+                final = index == len(profiles) - 1
+                try:
+                    parsed_data, result = await self._generate_listing(
+                        attempt, system_prompt, user_prompt, schema, fused, product=f"{title}\n{description}",
+                        keep_context=bool(session_key) and settings.llm_session_enabled
+                    )
+                except AIGenerationError:
+                    if final:
+                        raise
+                    record_escalation("analyzer", attempt.model, profiles[index + 1].model, "invalid_output")
+                    continue
+                
+                reason = None if final else self._cascade_rejection(parsed_data)
+                if reason is None:
+                    if not final:
+                        record_accepted("analyzer", attempt.model)
+                    break
+                record_escalation("analyzer", attempt.model, profiles[index + 1].model, reason)
             
-            # Parse and validate JSON response
-            parsed_data = self._parse_ai_response(result["response"])
+            if not reused and stage_store is not None:
+                stage_store.save("ai_generation", generation_fingerprint, parsed_data)
+            
+            if fused:
+                parsed_data = await self._apply_fused_results(parsed_data, seo_analysis, market_analysis)
+            
+            if session_key and not reused:
+                self._save_session(session_key, attempt.model, parsed_data, result)
             
             self.log_operation_success("ai_generation", 
                                      title_generated=bool(parsed_data.get("title")),
-                                     bullets_count=len(parsed_data.get("bullets", [])))
+                                     bullets_count=len(parsed_data.get("bullets", [])),
+                                     reused=reused)
             
             return parsed_data
             
@@ -151,6 +458,131 @@ class AnalyzerAgent(LoggerMixin):
             self.log_operation_error("ai_generation", e)
             raise AIGenerationError(f"AI generation failed: {str(e)}")
     
+    async def _generate_listing(self, profile: LLMProfile, system_prompt: str, user_prompt: BuiltPrompt,
+                                schema: Type[BaseModel], fused: bool,
+                                product: str = "",
+                                keep_context: bool = False) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Run the generation call on ``profile``'s model and parse it against ``schema``.
+        
+        An output missing fields (or with invalid ones) is completed by
+        regenerating just those fields for ``product``. ``keep_context`` reads
+        the generation to its end so the result carries the model context.
+        """
+        # Generate response constrained to the listing schema
+        with llm_call_scope("analyzer", "fused_analysis" if fused else "listing_generation"):
+            result = await self.ollama.generate(
+                model=profile.model,
+                prompt=user_prompt.text,
+                system_prompt=system_prompt,
+                options=profile.options(),
+                schema=schema,
+                keep_context=keep_context
+            )
+        
+        if not result["success"]:
+            if result.get("partial") is not None:
+                return await self._complete_listing(result["partial"], schema, product), result
+            raise AIGenerationError(f"Ollama generation failed: {result.get('error', 'Unknown error')}")
+        
+        # Parse and validate JSON response
+        return self._parse_ai_response(result["response"], schema), result
+    
+    async def _complete_listing(self, partial: Dict[str, Any], schema: Type[BaseModel],
+                                product: str) -> Dict[str, Any]:
+        """Regenerate only the fields missing from a partial output and validate the merged listing."""
+        missing = {
+            name: "missing" for name, field in schema.model_fields.items()
+            if field.is_required() and name not in partial
+        }
+        repaired = await self.field_repair.repair(partial, missing, schema, product=product)
+        if repaired is None:
+            raise AIGenerationError(f"Missing required fields: {list(missing)}")
+        
+        parsed_data = self._parse_ai_response(json.dumps(repaired, ensure_ascii=False), schema)
+        parsed_data["repaired_fields"] = list(missing)
+        return parsed_data
+    
+    def _cascade_rejection(self, parsed_data: Dict[str, Any]) -> Optional[str]:
+        """Why a fast-model listing is not good enough to keep, or None to accept it."""
+        if not parsed_data.get("title", "").strip() or not parsed_data.get("description", "").strip():
+            return "empty_fields"
+        if len([bullet for bullet in parsed_data.get("bullets", []) if bullet.strip()]) < settings.llm_cascade_min_bullets:
+            return "too_few_bullets"
+        if not parsed_data.get("keywords"):
+            return "no_keywords"
+        return None
+    
+    def _save_session(self, session_key: str, model: str,
+                      parsed_data: Dict[str, Any], result: Dict[str, Any]) -> None:
+        """Keep the generation's model context so the optimizer can continue from it.
+        
+        A repaired output has no context: the store counts and logs the missed save.
+        """
+        llm_sessions.save(
+            session_key,
+            model=model,
+            context=result.get("context"),
+            backend=result.get("backend"),
+            fingerprint=listing_fingerprint(
+                parsed_data.get("title", ""), parsed_data.get("description", ""), parsed_data.get("bullets", [])
+            )
+        )
+    
+    def _build_generation_request(self, title: str, description: str,
+                                  competitor_data: Dict[str, Any], language: str,
+                                  seo_analysis: Optional[Dict[str, Any]],
+                                  market_analysis: Optional[Dict[str, Any]],
+                                  fused: bool) -> Tuple[str, BuiltPrompt, Type[BaseModel], LLMProfile]:
+        """Build prompts, output schema and model profile for the generation call.
+        
+        The user prompt is trimmed to what the profile's context window leaves
+        after the system prompt and the reserved output tokens.
+        """
+        system_prompt = self._build_system_prompt(language)
+        schema = ListingGeneration
+        profile = settings.llm_profile("listing_generation")
+        if fused:
+            system_prompt += self._build_fused_instructions()
+            schema = FusedAnalysis
+            profile = settings.llm_profile("fused_analysis")
+        
+        budget = prompt_budget(profile.num_ctx, profile.num_predict, system_prompt)
+        user_prompt = self._build_user_prompt(
+            title, description, competitor_data, language, seo_analysis, market_analysis, budget_tokens=budget
+        )
+        
+        report = user_prompt.report()
+        self.logger.info("Prompt assembled",
+                         num_ctx=profile.num_ctx,
+                         budget_tokens=budget,
+                         total_tokens=report["total_tokens"],
+                         section_tokens={name: section["tokens"] for name, section in report["sections"].items()},
+                         trimmed=[name for name, section in report["sections"].items() if section["trimmed"]])
+        
+        return system_prompt, user_prompt, schema, profile
+    
+    def _build_fused_instructions(self) -> str:
+        """Extra tasks the fused call takes over from the SEO and market services."""
+        return """
+
+ALSO include in the same JSON response:
+5. "semantic_keywords": 10 Spanish search terms semantically related to the product that Spanish Amazon buyers would use (synonyms, related terms, colloquial variations, transactional keywords)
+6. "competitive_insights": 5 actionable Spanish insights from the competitive analysis (differentiation opportunities, positioning strategies, content improvements, competitive advantages, marketing recommendations)"""
+    
+    async def _apply_fused_results(self, parsed_data: Dict[str, Any],
+                                   seo_analysis: Optional[Dict[str, Any]],
+                                   market_analysis: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Move the fused call's SEO and market fields into their analyses, returning the listing."""
+        semantic_keywords = parsed_data.pop("semantic_keywords", [])
+        competitive_insights = parsed_data.pop("competitive_insights", [])
+        
+        if seo_analysis:
+            await self.seo_analyzer.apply_semantic_keywords(seo_analysis, semantic_keywords)
+        if market_analysis:
+            self.market_intelligence.apply_competitive_insights(market_analysis, competitive_insights)
+        
+        return parsed_data
+    
     def _build_system_prompt(self, language: str) -> str:
         """Build system prompt based on detected language."""
         language_instruction = self._get_language_instruction(language)
@@ -184,26 +616,23 @@ Response format (JSON ONLY):
     def _build_user_prompt(self, title: str, description: str, 
                           competitor_data: Dict[str, Any], language: str,
                           seo_analysis: Optional[Dict[str, Any]] = None,
-                          market_analysis: Optional[Dict[str, Any]] = None) -> str:
-        """Build user prompt with competitor context."""
-        competitor_context = self._build_competitor_context(competitor_data)
-        seo_context = self._build_seo_context(seo_analysis)
-        market_context = self._build_market_context(market_analysis)
+                          market_analysis: Optional[Dict[str, Any]] = None,
+                          budget_tokens: Optional[int] = None) -> BuiltPrompt:
+        """Build user prompt with competitor context, trimmed to ``budget_tokens``.
         
-        return f"""
-Analyze this product and create a professional Amazon listing in SPANISH that beats the competition:
-
-PRODUCT TO ANALYZE:
-Title: {title}
-Description: {description}
-
-{competitor_context}
-
-{seo_context}
-
-{market_context}
-
-REQUIREMENTS:
+        Market context is trimmed first, then competitor context, SEO context
+        and finally the product description; title and instructions are kept.
+        """
+        builder = PromptBuilder(budget_tokens)
+        builder.add("instructions",
+                    "Analyze this product and create a professional Amazon listing in SPANISH that beats the competition:",
+                    required=True)
+        builder.add("product", f"PRODUCT TO ANALYZE:\nTitle: {title}", required=True)
+        builder.add("description", f"Description: {description}", priority=1, min_tokens=64, max_tokens=1024)
+        builder.add("competitor_context", self._build_competitor_context(competitor_data), priority=3, strategy="lines")
+        builder.add("seo_context", self._build_seo_context(seo_analysis), priority=2, strategy="lines")
+        builder.add("market_context", self._build_market_context(market_analysis), priority=4, strategy="lines")
+        builder.add("requirements", """REQUIREMENTS:
 - Translate and improve content to Spanish if needed
 - Create attractive, SEO-optimized Spanish title that outperforms competitors
 - Write persuasive Spanish description highlighting unique benefits vs competitors
@@ -217,8 +646,9 @@ REQUIREMENTS:
 
 CREATE A LISTING THAT STANDS OUT AND WINS AGAINST COMPETITORS!
 
-Respond with JSON only.
-"""
+Respond with JSON only.""", required=True)
+        
+        return builder.build(agent="analyzer")
     
     def _build_competitor_context(self, competitor_data: Dict[str, Any]) -> str:
         """Build competitor context string for the prompt."""
@@ -249,84 +679,29 @@ INSTRUCCIONES CRÍTICAS:
 ¡CREA UN LISTING QUE APLASTE A LA COMPETENCIA!
 """
     
-    def _parse_ai_response(self, response_text: str) -> Dict[str, Any]:
-        """Parse and clean AI response to extract JSON."""
+    def _parse_ai_response(self, response_text: str,
+                           schema: Type[BaseModel] = ListingGeneration) -> Dict[str, Any]:
+        """Validate the schema-constrained AI response against ``schema``."""
         self.logger.debug("Parsing AI response", response_length=len(response_text))
         
-        # Clean response text
-        cleaned_text = self._clean_response_text(response_text)
-        
         try:
-            parsed_data = json.loads(cleaned_text)
-            
-            # Validate required fields
-            required_fields = ["title", "description", "bullets", "keywords"]
-            missing_fields = [field for field in required_fields if field not in parsed_data]
+            return schema.model_validate_json(response_text).model_dump()
             
+        except PydanticValidationError as e:
+            missing_fields = [str(error["loc"][0]) for error in e.errors() if error["type"] == "missing"]
             if missing_fields:
                 raise AIGenerationError(f"Missing required fields: {missing_fields}")
             
-            # Validate data types
-            if not isinstance(parsed_data.get("bullets"), list):
-                raise AIGenerationError("Bullets must be a list")
-            
-            if not isinstance(parsed_data.get("keywords"), list):
-                raise AIGenerationError("Keywords must be a list")
-            
-            return parsed_data
-            
-        except json.JSONDecodeError as e:
-            self.logger.error("JSON parsing failed", error=str(e), response_preview=cleaned_text[:200])
-            raise AIGenerationError(f"Invalid JSON response: {str(e)}")
-    
-    def _clean_response_text(self, response_text: str) -> str:
-        """Clean and extract JSON from AI response."""
-        cleaned = response_text.strip()
-        
-        # Remove thinking tags
-        if "<think>" in cleaned:
-            if "</think>" in cleaned:
-                think_end = cleaned.find("</think>") + 8
-                cleaned = cleaned[think_end:].strip()
-            else:
-                json_start = cleaned.find("{")
-                if json_start > 0:
-                    cleaned = cleaned[json_start:].strip()
-        
-        # Remove markdown code blocks
-        if "```json" in cleaned:
-            json_start = cleaned.find("```json") + 7
-            json_end = cleaned.find("```", json_start)
-            cleaned = cleaned[json_start:json_end].strip()
-        elif "```" in cleaned:
-            json_start = cleaned.find("```") + 3
-            json_end = cleaned.find("```", json_start)
-            cleaned = cleaned[json_start:json_end].strip()
-        
-        # Extract JSON object
-        if "{" in cleaned:
-            start_brace = cleaned.find("{")
-            brace_count = 0
-            end_brace = start_brace
-            
-            for i, char in enumerate(cleaned[start_brace:], start_brace):
-                if char == "{":
-                    brace_count += 1
-                elif char == "}":
-                    brace_count -= 1
-                    if brace_count == 0:
-                        end_brace = i
-                        break
-            
-            if brace_count == 0:
-                cleaned = cleaned[start_brace:end_brace + 1]
-        
-        return cleaned
+            self.logger.error("JSON parsing failed", error=str(e), response_preview=response_text[:200])
+            raise AIGenerationError(f"Invalid JSON response: {e.errors()[0]['msg']}")
     
     def _format_analysis_response(self, parsed_data: Dict[str, Any], 
                                  competitor_data: Dict[str, Any], language: str,
                                  seo_analysis: Optional[Dict[str, Any]] = None,
-                                 market_analysis: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+                                 market_analysis: Optional[Dict[str, Any]] = None,
+                                 deadline: Optional[Deadline] = None,
+                                 stage_timings: Optional[Dict[str, Dict[str, float]]] = None,
+                                 stage_store: Optional[StageResultStore] = None) -> Dict[str, Any]:
         """Format the final analysis response."""
         # Enhance with competitor intelligence
         competitor_info = self._extract_competitor_info(competitor_data)
@@ -335,37 +710,55 @@ INSTRUCCIONES CRÍTICAS:
         if competitor_info and competitor_data.get("success"):
             parsed_data = self._enhance_keywords_with_competitor_data(parsed_data, competitor_data["data"])
         
-        # Extract SEO and market data for response
-        seo_data = seo_analysis.get("data", {}) if seo_analysis and seo_analysis.get("success") else {}
-        market_data = market_analysis.get("data", {}) if market_analysis and market_analysis.get("success") else {}
-        
         result_data = {
             **parsed_data,
             "competitor_intelligence": competitor_info,
-            "seo_analysis": {
-                "seo_score": seo_data.get("seo_score", 0),
-                "enhanced_keywords": seo_data.get("enhanced_keywords", {}),
-                "search_intent": seo_data.get("search_intent", {}),
-                "content_gaps": seo_data.get("content_gaps", {}),
-                "recommendations": seo_data.get("seo_recommendations", [])
-            },
-            "market_intelligence": {
-                "competitors_analyzed": market_data.get("competitors_analyzed", 0),
-                "pricing_analysis": market_data.get("pricing_analysis", {}),
-                "market_gaps": market_data.get("market_gaps", {}),
-                "competitive_insights": market_data.get("competitive_insights", []),
-                "brand_landscape": market_data.get("brand_landscape", {})
-            },
+            "seo_analysis": self._seo_section(seo_analysis),
+            "market_intelligence": self._market_section(market_analysis),
             "analysis_enhanced_with_market_data": competitor_data.get("success", False),
             "input_language_detected": language
         }
         
+        if deadline is not None:
+            # Which optional stages were skipped or cut short to answer in time
+            result_data["deadline"] = deadline.report()
+        
+        if stage_timings is not None:
+            # Start and end (seconds from the start of the preparation stages) and run time of each
+            result_data["stage_timings"] = stage_timings
+        
+        if stage_store is not None:
+            # Stages whose inputs were unchanged since the last analysis
+            result_data["stages_reused"] = list(stage_store.reused)
+        
         return {
             "success": True,
             "message": "Análisis completado con SEO, inteligencia de mercado y análisis competitivo",
             "data": result_data
         }
     
+    def _seo_section(self, seo_analysis: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """SEO data for the response."""
+        seo_data = seo_analysis.get("data", {}) if seo_analysis and seo_analysis.get("success") else {}
+        return {
+            "seo_score": seo_data.get("seo_score", 0),
+            "enhanced_keywords": seo_data.get("enhanced_keywords", {}),
+            "search_intent": seo_data.get("search_intent", {}),
+            "content_gaps": seo_data.get("content_gaps", {}),
+            "recommendations": seo_data.get("seo_recommendations", [])
+        }
+    
+    def _market_section(self, market_analysis: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Market intelligence data for the response."""
+        market_data = market_analysis.get("data", {}) if market_analysis and market_analysis.get("success") else {}
+        return {
+            "competitors_analyzed": market_data.get("competitors_analyzed", 0),
+            "pricing_analysis": market_data.get("pricing_analysis", {}),
+            "market_gaps": market_data.get("market_gaps", {}),
+            "competitive_insights": market_data.get("competitive_insights", []),
+            "brand_landscape": market_data.get("brand_landscape", {})
+        }
+    
     def _extract_competitor_info(self, competitor_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Extract competitor information for the response."""
         if not competitor_data.get("success") or not competitor_data.get("data"):
@@ -380,7 +773,9 @@ INSTRUCCIONES CRÍTICAS:
             "strategic_recommendations": comp_data.get("recommendations", []),
             "keywords_from_market": comp_data.get("keywords_used", []),
             "pricing_insights": comp_data.get("pricing_insights", {}),
-            "title_patterns": comp_data.get("title_patterns", [])
+            "title_patterns": comp_data.get("title_patterns", []),
+            # Built from demo data or cut searches, not real market research
+            "degraded": competitor_data.get("degraded", False)
         }
     
     def _enhance_keywords_with_competitor_data(self, parsed_data: Dict[str, Any], 
@@ -394,39 +789,6 @@ INSTRUCCIONES CRÍTICAS:
         
         return parsed_data
     
-    @cache_language_detection(ttl=86400)  # Cache for 24 hours
-    def _detect_language(self, title: str, description: str) -> str:
-        """Detect the primary language of the input text."""
-        text = f"{title} {description}".lower()
-        
-        # Language indicators
-        spanish_words = {
-            'el', 'la', 'de', 'en', 'con', 'para', 'por', 'que', 'es', 'una', 'del', 'las', 'los', 
-            'se', 'su', 'al', 'más', 'como', 'pero', 'todo', 'esta', 'sus', 'le', 'ya', 'o', 
-            'porque', 'cuando', 'sin', 'sobre', 'también', 'me', 'hasta', 'donde', 'ser', 'tiene'
-        }
-        
-        english_words = {
-            'the', 'and', 'for', 'are', 'with', 'his', 'they', 'this', 'have', 'from', 'or', 
-            'one', 'had', 'by', 'word', 'but', 'not', 'what', 'all', 'were', 'we', 'when', 
-            'your', 'can', 'said', 'there', 'each', 'which', 'she', 'do', 'how', 'their'
-        }
-        
-        words = set(text.split())
-        spanish_count = len(words.intersection(spanish_words))
-        english_count = len(words.intersection(english_words))
-        
-        # Check for Spanish characters
-        if any(char in text for char in 'ñáéíóú'):
-            return 'spanish'
-        
-        if spanish_count > english_count:
-            return 'spanish'
-        elif english_count > spanish_count:
-            return 'english'
-        else:
-            return 'mixed'
-    
     def _get_language_instruction(self, detected_language: str) -> str:
         """Get specific instructions based on detected input language."""
         instructions = {
@@ -1,14 +1,19 @@
 import json
 import asyncio
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from app.core.deadline import deadline_expired
 from app.services.web_search import WebSearchService
 
 class CompetitorResearcher:
-    def __init__(self):
-        self.web_search = WebSearchService()
+    def __init__(self, web_search: Optional[WebSearchService] = None):
+        self.web_search = web_search or WebSearchService()
     
     async def research_competitors(self, title: str, description: str) -> Dict[str, Any]:
-        """Research competitors for the given product"""
+        """Research competitors for the given product
+        
+        A result built from demo data or from searches cut by the deadline is
+        marked ``"degraded": True`` so it is not stored or cached as real research.
+        """
         
         try:
             # Extract key product terms for search
@@ -16,12 +21,21 @@ class CompetitorResearcher:
             
             # Perform competitor searches
             search_results = await self._search_competitors(product_keywords)
+            cut = deadline_expired()
+            if cut and not search_results:
+                return {
+                    "success": False,
+                    "degraded": True,
+                    "message": "Competitor research skipped: deadline exceeded",
+                    "data": None
+                }
             
             # Analyze competitor data
             analysis = await self._analyze_competitor_data(search_results)
             
             return {
                 "success": True,
+                "degraded": cut or any(result.get("demo") for result in search_results),
                 "data": {
                     "keywords_used": product_keywords,
                     "competitors_found": len(search_results),
@@ -41,6 +55,10 @@ class CompetitorResearcher:
                 "data": None
             }
     
+    def search_terms(self, title: str, description: str) -> List[str]:
+        """Terms the research searches for; its results depend on nothing else"""
+        return self._extract_keywords(title, description)
+    
     def _extract_keywords(self, title: str, description: str) -> List[str]:
         """Extract main product keywords for search"""
         
@@ -82,22 +100,18 @@ class CompetitorResearcher:
     async def _search_competitors(self, keywords: List[str]) -> List[Dict]:
         """Search for competitor products"""
         
-        search_results = []
-        
+        queries = []
         for keyword in keywords:
             # Search Amazon specifically
-            amazon_query = f"{keyword} Amazon precio características"
-            amazon_results = await self.web_search.search(amazon_query, max_results=3)
+            queries.append((f"{keyword} Amazon precio características", 3))
             
             # Search general e-commerce
-            ecommerce_query = f"{keyword} venta online precio reviews"
-            ecommerce_results = await self.web_search.search(ecommerce_query, max_results=2)
-            
-            search_results.extend(amazon_results)
-            search_results.extend(ecommerce_results)
-            
-            # Small delay to avoid rate limiting
-            await asyncio.sleep(0.5)
+            queries.append((f"{keyword} venta online precio reviews", 2))
+        
+        # Queries run in parallel; the search service bounds concurrency to avoid rate limiting
+        search_results = []
+        for results in await self.web_search.search_many(queries):
+            search_results.extend(results)
         
         return search_results
     
@@ -7,10 +7,11 @@ from app.services.ollama_client import OllamaClient
 from app.services.real_image_service import RealImageService
 
 class ImageFinder:
-    def __init__(self):
-        self.web_search = WebSearchService()
-        self.ollama = OllamaClient()
-        self.real_image_service = RealImageService()
+    def __init__(self, web_search: Optional[WebSearchService] = None, ollama: Optional[OllamaClient] = None,
+                 real_image_service: Optional[RealImageService] = None):
+        self.web_search = web_search or WebSearchService()
+        self.ollama = ollama or OllamaClient()
+        self.real_image_service = real_image_service or RealImageService()
     
     async def find_similar_images(self, title: str, description: str, existing_images: List[str] = None, reference_image_path: Optional[str] = None) -> Dict[str, Any]:
         """Find similar product images - SIMPLIFIED APPROACH"""
@@ -1,12 +1,19 @@
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
+from pydantic import ValidationError
 from app.services.ollama_client import OllamaClient
-from app.core.config import settings
+from app.services.field_repair import FieldRepair
+from app.services.llm_usage import llm_call_scope
+from app.services.llm_sessions import LLMSession, llm_sessions, listing_fingerprint
+from app.services.llm_cascade import cascade_profiles, record_accepted, record_escalation
+from app.core.config import settings, LLMProfile
+from app.core.deadline import Deadline, deadline_scope
+from app.schemas.llm import OptimizedListing
 
 class OptimizerAgent:
-    def __init__(self):
-        self.ollama = OllamaClient()
-        self.model = settings.ollama_model
+    def __init__(self, ollama: Optional[OllamaClient] = None):
+        self.ollama = ollama or OllamaClient()
+        self.field_repair = FieldRepair("optimizer", self.ollama)
         
         # Amazon best practices rules
         self.amazon_rules = {
@@ -22,8 +29,175 @@ class OptimizerAgent:
             ]
         }
     
-    async def optimize(self, title: str, description: str, bullets: List[str], keywords: List[str]) -> Dict[str, Any]:
-        """Optimize listing based on Amazon best practices"""
+    async def optimize(self, title: str, description: str, bullets: List[str], keywords: List[str],
+                       session_key: Optional[str] = None, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Optimize listing based on Amazon best practices
+        
+        With a ``session_key`` whose analysis context is still valid, the
+        request continues from that context instead of re-sending the listing.
+        In cascade mode the fast model goes first and the configured model is
+        only used when its result fails validation. Every generation shares
+        ``deadline`` (``settings.optimization_deadline_seconds`` by default).
+        Missing fields and the few fields that break a compliance rule are
+        regenerated on their own and merged back (see ``FieldRepair``).
+        """
+        
+        profiles = cascade_profiles(settings.llm_profile("optimization"))
+        with deadline_scope(deadline or Deadline(settings.optimization_deadline_seconds)):
+            for index, profile in enumerate(profiles):
+                result = await self._optimize_with(profile, title, description, bullets, keywords, session_key)
+                if index == len(profiles) - 1:
+                    return result
+                
+                reason = self._cascade_rejection(result)
+                if reason is None:
+                    record_accepted("optimizer", profile.model)
+                    return result
+                record_escalation("optimizer", profile.model, profiles[index + 1].model, reason)
+    
+    async def _optimize_with(self, profile: LLMProfile, title: str, description: str, bullets: List[str],
+                             keywords: List[str], session_key: Optional[str]) -> Dict[str, Any]:
+        """Run one optimization generation on ``profile``'s model"""
+        
+        system_prompt, prompt, session = self._prepare_request(profile, title, description, bullets, keywords, session_key)
+        
+        try:
+            with llm_call_scope("optimizer", "optimization_continued" if session else "optimization"):
+                result = await self.ollama.generate(
+                    model=profile.model,
+                    prompt=prompt,
+                    system_prompt=system_prompt,
+                    options=profile.options(),
+                    schema=OptimizedListing,
+                    context=session.context if session else None,
+                    backend=session.backend if session else None
+                )
+            
+            if not result["success"]:
+                if result.get("partial") is not None:
+                    # The model understood the context: repair the output and keep the session
+                    return await self._complete(result["partial"], title, description)
+                if session:
+                    # The saved context may no longer be usable; retry with the full prompt
+                    llm_sessions.drop(session_key)
+                    return await self._optimize_with(profile, title, description, bullets, keywords, None)
+                return {
+                    "success": False,
+                    "message": f"Error del modelo: {result.get('error', 'Unknown error')}",
+                    "data": None
+                }
+            
+            return await self._repair_compliance(self._process_response(result["response"]), title, description)
+                
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Error inesperado: {str(e)}",
+                "data": None
+            }
+    
+    async def optimize_stream(self, title: str, description: str, bullets: List[str], keywords: List[str],
+                              session_key: Optional[str] = None,
+                              deadline: Optional[Deadline] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming variant of optimize: yields token events, then a result event
+        
+        When the cascade escalates, a ``cascade`` event tells the client to
+        discard the tokens streamed so far before the larger model's tokens follow.
+        """
+        
+        profiles = cascade_profiles(settings.llm_profile("optimization"))
+        with deadline_scope(deadline or Deadline(settings.optimization_deadline_seconds)):
+            for index, profile in enumerate(profiles):
+                final = index == len(profiles) - 1
+                async for event in self._optimize_stream_with(profile, title, description, bullets, keywords, session_key):
+                    if event["event"] != "result" or final:
+                        yield event
+                        continue
+                    
+                    reason = self._cascade_rejection(event["data"])
+                    if reason is None:
+                        record_accepted("optimizer", profile.model)
+                        yield event
+                        return
+                    
+                    next_model = profiles[index + 1].model
+                    record_escalation("optimizer", profile.model, next_model, reason)
+                    yield {"event": "cascade", "data": {"from_model": profile.model, "to_model": next_model, "reason": reason}}
+    
+    async def _optimize_stream_with(self, profile: LLMProfile, title: str, description: str, bullets: List[str],
+                                    keywords: List[str], session_key: Optional[str]) -> AsyncIterator[Dict[str, Any]]:
+        """Stream one optimization generation on ``profile``'s model"""
+        
+        system_prompt, prompt, session = self._prepare_request(profile, title, description, bullets, keywords, session_key)
+        
+        try:
+            chunks = []
+            with llm_call_scope("optimizer", "optimization_continued" if session else "optimization"):
+                async for chunk in self.ollama.generate_stream(
+                    model=profile.model,
+                    prompt=prompt,
+                    system_prompt=system_prompt,
+                    options=profile.options(),
+                    schema=OptimizedListing,
+                    context=session.context if session else None,
+                    backend=session.backend if session else None
+                ):
+                    if not chunk["success"]:
+                        if chunk.get("partial") is not None:
+                            yield {"event": "result", "data": await self._complete(chunk["partial"], title, description)}
+                            return
+                        if session and not chunks:
+                            # Nothing streamed yet: fall back to the full prompt
+                            llm_sessions.drop(session_key)
+                            async for event in self._optimize_stream_with(profile, title, description, bullets, keywords, None):
+                                yield event
+                            return
+                        yield {"event": "result", "data": {
+                            "success": False,
+                            "message": f"Error del modelo: {chunk.get('error', 'Unknown error')}",
+                            "data": None
+                        }}
+                        return
+                    
+                    if chunk["response"]:
+                        chunks.append(chunk["response"])
+                        yield {"event": "token", "data": {"text": chunk["response"]}}
+            
+            result = self._process_response("".join(chunks))
+            yield {"event": "result", "data": await self._repair_compliance(result, title, description)}
+            
+        except Exception as e:
+            yield {"event": "result", "data": {
+                "success": False,
+                "message": f"Error inesperado: {str(e)}",
+                "data": None
+            }}
+    
+    def _cascade_rejection(self, result: Dict[str, Any]) -> Optional[str]:
+        """Why a cascade attempt's result is not good enough, or None to accept it"""
+        
+        if not result["success"]:
+            return "invalid_output"
+        if result["data"]["compliance_score"] < settings.llm_cascade_min_compliance:
+            return "low_compliance"
+        return None
+    
+    def _prepare_request(self, profile: LLMProfile, title: str, description: str, bullets: List[str],
+                         keywords: List[str], session_key: Optional[str]) -> Tuple[str, str, Optional[LLMSession]]:
+        """Pick the prompts, continuing the listing's analysis session when it still matches"""
+        
+        system_prompt, prompt = self._build_prompts(title, description, bullets, keywords)
+        
+        session = None
+        if session_key:
+            session = llm_sessions.get(session_key, profile.model, listing_fingerprint(title, description, bullets))
+        if session:
+            prompt = self._build_continuation_prompt(keywords)
+        
+        return system_prompt, prompt, session
+    
+    def _build_prompts(self, title: str, description: str, bullets: List[str], keywords: List[str]) -> Tuple[str, str]:
+        """Build the system and user prompts for an optimization request"""
         
         system_prompt = f"""You are an Amazon listing optimization expert. Your job is to improve an existing listing following Amazon best practices and output everything in SPANISH.
 
@@ -69,7 +243,23 @@ CURRENT TITLE: {title}
 CURRENT DESCRIPTION: {description}
 CURRENT BULLETS: {bullets}
 AVAILABLE KEYWORDS: {keywords}
+{self._optimization_guidelines()}"""
+        
+        return system_prompt, prompt
+    
+    def _build_continuation_prompt(self, keywords: List[str]) -> str:
+        """User prompt for continuing from the analysis session, which already holds the listing"""
+        
+        return f"""
+Now optimize the listing you just generated to maximize conversions and comply with rules. OUTPUT EVERYTHING IN SPANISH:
 
+AVAILABLE KEYWORDS: {keywords}
+{self._optimization_guidelines()}"""
+    
+    def _optimization_guidelines(self) -> str:
+        """Optimization criteria shared by the full and continuation prompts"""
+        
+        return """
 Optimize considering:
 1. Amazon rules compliance
 2. SEO and ranking
@@ -96,121 +286,112 @@ LANGUAGE CLEANING REQUIRED:
 
 Respond in valid JSON format with PURE Spanish content only.
 """
+    
+    async def _complete(self, partial: Dict[str, Any], title: str, description: str) -> Dict[str, Any]:
+        """Regenerate the missing or invalid fields of a rejected output instead of the whole listing
+        
+        When every required field is present and valid, invalid optional fields
+        are dropped (their defaults are fine) and nothing is regenerated.
+        """
+        
+        problems = {
+            name: "missing" for name, field in OptimizedListing.model_fields.items()
+            if field.is_required() and name not in partial
+        }
+        problems.update(self._invalid_fields(partial))
+        
+        if not any(OptimizedListing.model_fields[name].is_required() for name in problems):
+            listing = {name: value for name, value in partial.items() if name not in problems}
+            return await self._repair_compliance(self._process_response(json.dumps(listing)), title, description)
+        
+        repaired = await self.field_repair.repair(
+            partial, problems, OptimizedListing, product=f"{title}\n{description}", rules=self._repair_rules()
+        )
+        if repaired is None:
+            return {
+                "success": False,
+                "message": "Respuesta incompleta del modelo",
+                "data": None
+            }
+        
+        result = await self._repair_compliance(self._process_response(json.dumps(repaired)), title, description)
+        if result["success"]:
+            result["data"]["repaired_fields"] = sorted(set(result["data"].get("repaired_fields", [])) | set(problems))
+        return result
+    
+    def _invalid_fields(self, partial: Dict[str, Any]) -> Dict[str, str]:
+        """Fields of ``partial`` whose value fails validation, with the reason"""
         
         try:
-            result = await self.ollama.generate(
-                model=self.model,
-                prompt=prompt,
-                system_prompt=system_prompt
-            )
-            
-            if not result["success"]:
-                return {
-                    "success": False,
-                    "message": f"Error del modelo: {result.get('error', 'Unknown error')}",
-                    "data": None
-                }
-            
-            # Parse JSON response
-            response_text = result["response"].strip()
-            
-            # Remove thinking tags if present (more aggressive cleaning)
-            if "<think>" in response_text or "thinking" in response_text.lower():
-                # Try multiple patterns for thinking tags
-                patterns_to_remove = [
-                    (r"<think>.*?</think>", ""),
-                    (r"<thinking>.*?</thinking>", ""),
-                    (r"thinking:.*?(?=\{)", ""),
-                    (r".*?(?=\{)", "")  # Remove everything before first {
-                ]
-                
-                import re
-                for pattern, replacement in patterns_to_remove:
-                    response_text = re.sub(pattern, replacement, response_text, flags=re.DOTALL | re.IGNORECASE)
-                    response_text = response_text.strip()
-                    if response_text.startswith("{"):
-                        break
-                
-                # If still no valid start, try to find JSON boundaries
-                if not response_text.startswith("{"):
-                    json_start = response_text.find("{")
-                    if json_start >= 0:
-                        response_text = response_text[json_start:].strip()
-                    else:
-                        return {
-                            "success": False,
-                            "message": "No se encontró JSON válido en la respuesta del modelo",
-                            "data": None
-                        }
-            
-            # Try to extract JSON if it's wrapped in markdown
-            if "```json" in response_text:
-                json_start = response_text.find("```json") + 7
-                json_end = response_text.find("```", json_start)
-                response_text = response_text[json_start:json_end].strip()
-            elif "```" in response_text:
-                json_start = response_text.find("```") + 3
-                json_end = response_text.find("```", json_start)
-                response_text = response_text[json_start:json_end].strip()
-            
-            # Find JSON object boundaries
-            if response_text.find("{") >= 0:
-                start_brace = response_text.find("{")
-                # Find matching closing brace
-                brace_count = 0
-                end_brace = start_brace
-                for i, char in enumerate(response_text[start_brace:], start_brace):
-                    if char == "{":
-                        brace_count += 1
-                    elif char == "}":
-                        brace_count -= 1
-                        if brace_count == 0:
-                            end_brace = i
-                            break
-                
-                if brace_count == 0:
-                    response_text = response_text[start_brace:end_brace + 1]
-            
-            try:
-                parsed_data = json.loads(response_text)
-                
-                # Validate required fields
-                required_fields = ["title", "description", "bullets"]
-                if not all(field in parsed_data for field in required_fields):
-                    return {
-                        "success": False,
-                        "message": "Respuesta incompleta del modelo",
-                        "data": None
-                    }
-                
-                # Validate Amazon compliance
-                compliance_issues = self._validate_compliance(parsed_data)
-                
-                if compliance_issues:
-                    parsed_data["compliance_issues"] = compliance_issues
-                    parsed_data["compliance_score"] = max(0, 100 - len(compliance_issues) * 10)
-                else:
-                    parsed_data["compliance_score"] = 100
-                
-                return {
-                    "success": True,
-                    "message": "Optimización completada exitosamente",
-                    "data": parsed_data
-                }
-                
-            except json.JSONDecodeError as e:
-                return {
-                    "success": False,
-                    "message": f"Error parsing JSON: {str(e)}. Response: {response_text[:200]}...",
-                    "data": None
-                }
-                
-        except Exception as e:
+            OptimizedListing.model_validate(partial)
+        except ValidationError as e:
+            return {
+                str(error["loc"][0]): error["msg"] for error in e.errors()
+                if error["type"] != "missing" and error["loc"]
+            }
+        return {}
+    
+    async def _repair_compliance(self, result: Dict[str, Any], title: str, description: str) -> Dict[str, Any]:
+        """Regenerate just the fields that break a compliance rule; kept only if it leaves fewer issues"""
+        
+        if not result["success"]:
+            return result
+        problems = self._compliance_problems(result["data"])
+        if not self.field_repair.can_repair(problems):
+            return result
+        
+        listing = {name: value for name, value in result["data"].items() if name in OptimizedListing.model_fields}
+        repaired = await self.field_repair.repair(
+            listing, problems, OptimizedListing, product=f"{title}\n{description}", rules=self._repair_rules()
+        )
+        if repaired is None:
+            return result
+        
+        fixed = self._process_response(json.dumps(repaired))
+        if not fixed["success"] or len(fixed["data"].get("compliance_issues", [])) >= len(result["data"]["compliance_issues"]):
+            return result
+        fixed["data"]["repaired_fields"] = list(problems)
+        return fixed
+    
+    def _repair_rules(self) -> str:
+        """Amazon rules every repaired field must follow"""
+        
+        return f"""RULES:
+- Title max {self.amazon_rules['title_max_length']} characters
+- Each bullet point max {self.amazon_rules['bullet_max_length']} characters
+- Description max {self.amazon_rules['description_max_length']} characters
+- DO NOT use these words: {', '.join(self.amazon_rules['forbidden_words'])}"""
+    
+    def _process_response(self, raw_response: str) -> Dict[str, Any]:
+        """Validate the schema-constrained model output and attach compliance validation"""
+        
+        try:
+            parsed_data = OptimizedListing.model_validate_json(raw_response).model_dump()
+        except ValidationError as e:
+            if any(error["type"] == "missing" for error in e.errors()):
+                message = "Respuesta incompleta del modelo"
+            else:
+                message = f"Error parsing JSON: {e.errors()[0]['msg']}. Response: {raw_response[:200]}..."
             return {
                 "success": False,
-                "message": f"Error inesperado: {str(e)}",
+                "message": message,
                 "data": None
             }
+        
+        # Validate Amazon compliance
+        compliance_issues = self._validate_compliance(parsed_data)
+        
+        if compliance_issues:
+            parsed_data["compliance_issues"] = compliance_issues
+            parsed_data["compliance_score"] = max(0, 100 - len(compliance_issues) * 10)
+        else:
+            parsed_data["compliance_score"] = 100
+        
+        return {
+            "success": True,
+            "message": "Optimización completada exitosamente",
+            "data": parsed_data
+        }
     
     def _validate_compliance(self, data: Dict[str, Any]) -> List[str]:
         """Validate Amazon compliance rules"""
@@ -238,4 +419,22 @@ Respond in valid JSON format with PURE Spanish content only.
             if forbidden_word.lower() in full_text:
                 issues.append(f"Contiene palabra prohibida: '{forbidden_word}'")
         
-        return issues
\ No newline at end of file
+        return issues
+    
+    def _compliance_problems(self, data: Dict[str, Any]) -> Dict[str, str]:
+        """Compliance issues by the field that causes them (``"bullets.2"`` for the third bullet)"""
+        problems: Dict[str, List[str]] = {}
+        
+        fields = [("title", data.get("title", ""), self.amazon_rules["title_max_length"]),
+                  ("description", data.get("description", ""), self.amazon_rules["description_max_length"])]
+        fields += [(f"bullets.{i}", bullet, self.amazon_rules["bullet_max_length"])
+                   for i, bullet in enumerate(data.get("bullets", []))]
+        
+        for path, text, max_length in fields:
+            if len(text) > max_length:
+                problems.setdefault(path, []).append(f"exceeds {max_length} characters")
+            for forbidden_word in self.amazon_rules["forbidden_words"]:
+                if forbidden_word.lower() in text.lower():
+                    problems.setdefault(path, []).append(f"contains the forbidden word '{forbidden_word}'")
+        
+        return {path: "; ".join(issues) for path, issues in problems.items()}
\ No newline at end of file
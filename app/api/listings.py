@@ -2,14 +2,19 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.models.database import get_db
-from app.models.listing import Listing as ListingModel
+from app.models.listing import Listing as ListingModel, ListingStageResult
 from app.schemas.listing import Listing, ListingCreate, ListingUpdate, AgentRequest, AgentResponse
 from app.agents.analyzer import AnalyzerAgent
 from app.agents.image_finder import ImageFinder
 from app.agents.optimizer import OptimizerAgent
+from app.services.stage_results import StageResultStore
+from app.services.registry import registry
+from app.core.config import settings
+from app.core.deadline import Deadline
 from app.core.logger import get_logger
 from app.core.exceptions import ValidationError, AIGenerationError, DatabaseError
 from app.core.security import SecurityUtils
+from app.core.sse import sse_response
 
 logger = get_logger(__name__)
 router = APIRouter()
@@ -98,36 +103,68 @@ def delete_listing(listing_id: int, db: Session = Depends(get_db)):
     if listing is None:
         raise HTTPException(status_code=404, detail="Listing not found")
     
+    db.query(ListingStageResult).filter(ListingStageResult.listing_id == listing_id).delete()
     db.delete(listing)
     db.commit()
     return {"message": "Listing deleted successfully"}
 
 @router.post("/{listing_id}/analyze", response_model=AgentResponse)
-async def analyze_listing(listing_id: int, db: Session = Depends(get_db)):
+async def analyze_listing(listing_id: int, db: Session = Depends(get_db),
+                          analyzer: AnalyzerAgent = Depends(registry.provider("analyzer"))):
+    # The clock starts when the request arrives, not when the analysis does
+    deadline = Deadline(settings.analysis_deadline_seconds)
     listing = db.query(ListingModel).filter(ListingModel.id == listing_id).first()
     if listing is None:
         raise HTTPException(status_code=404, detail="Listing not found")
     
-    analyzer = AnalyzerAgent()
-    result = await analyzer.analyze(listing.original_title, listing.original_description)
+    result = await analyzer.analyze(
+        listing.original_title, listing.original_description, session_key=_session_key(listing_id),
+        deadline=deadline, stage_store=StageResultStore(db, listing_id)
+    )
     
     if result["success"]:
-        listing.generated_title = result["data"]["title"]
-        listing.generated_description = result["data"]["description"]
-        listing.generated_bullets = result["data"]["bullets"]
-        listing.keywords = result["data"]["keywords"]
-        listing.status = "analyzed"
-        db.commit()
+        _save_analysis(listing, result, db)
     
     return AgentResponse(**result)
 
-@router.post("/{listing_id}/find-images", response_model=AgentResponse)
-async def find_images(listing_id: int, db: Session = Depends(get_db)):
+@router.post("/{listing_id}/analyze/stream")
+async def analyze_listing_stream(listing_id: int, db: Session = Depends(get_db),
+                                 analyzer: AnalyzerAgent = Depends(registry.provider("analyzer"))):
+    """Server-Sent Events variant of analyze: streams stage completions and tokens."""
+    deadline = Deadline(settings.analysis_deadline_seconds)
     listing = db.query(ListingModel).filter(ListingModel.id == listing_id).first()
     if listing is None:
         raise HTTPException(status_code=404, detail="Listing not found")
     
-    image_finder = ImageFinder()
+    async def events():
+        async for event in analyzer.analyze_stream(
+            listing.original_title, listing.original_description, session_key=_session_key(listing_id),
+            deadline=deadline, stage_store=StageResultStore(db, listing_id)
+        ):
+            if event["event"] == "result" and event["data"]["success"]:
+                _save_analysis(listing, event["data"], db)
+            yield event
+    
+    return sse_response(events())
+
+def _session_key(listing_id: int) -> Optional[str]:
+    """Key of the LLM session shared by a listing's analysis and optimization, if sessions are enabled."""
+    return f"listing:{listing_id}" if settings.llm_session_enabled else None
+
+def _save_analysis(listing: ListingModel, result: dict, db: Session) -> None:
+    listing.generated_title = result["data"]["title"]
+    listing.generated_description = result["data"]["description"]
+    listing.generated_bullets = result["data"]["bullets"]
+    listing.keywords = result["data"]["keywords"]
+    listing.status = "analyzed"
+    db.commit()
+
+@router.post("/{listing_id}/find-images", response_model=AgentResponse)
+async def find_images(listing_id: int, db: Session = Depends(get_db),
+                      image_finder: ImageFinder = Depends(registry.provider("image_finder"))):
+    listing = db.query(ListingModel).filter(ListingModel.id == listing_id).first()
+    if listing is None:
+        raise HTTPException(status_code=404, detail="Listing not found")
     
     # Check if listing has uploaded images to use as reference
     reference_image = None
@@ -160,24 +197,54 @@ async def find_images(listing_id: int, db: Session = Depends(get_db)):
     return AgentResponse(**result)
 
 @router.post("/{listing_id}/optimize", response_model=AgentResponse)
-async def optimize_listing(listing_id: int, db: Session = Depends(get_db)):
+async def optimize_listing(listing_id: int, db: Session = Depends(get_db),
+                           optimizer: OptimizerAgent = Depends(registry.provider("optimizer"))):
+    deadline = Deadline(settings.optimization_deadline_seconds)
     listing = db.query(ListingModel).filter(ListingModel.id == listing_id).first()
     if listing is None:
         raise HTTPException(status_code=404, detail="Listing not found")
     
-    optimizer = OptimizerAgent()
     result = await optimizer.optimize(
         listing.generated_title or listing.original_title,
         listing.generated_description or listing.original_description,
         listing.generated_bullets or [],
-        listing.keywords or []
+        listing.keywords or [],
+        session_key=_session_key(listing_id),
+        deadline=deadline
     )
     
     if result["success"]:
-        listing.optimized_title = result["data"]["title"]
-        listing.optimized_description = result["data"]["description"]
-        listing.optimized_bullets = result["data"]["bullets"]
-        listing.status = "optimized"
-        db.commit()
+        _save_optimization(listing, result, db)
+    
+    return AgentResponse(**result)
+
+@router.post("/{listing_id}/optimize/stream")
+async def optimize_listing_stream(listing_id: int, db: Session = Depends(get_db),
+                                  optimizer: OptimizerAgent = Depends(registry.provider("optimizer"))):
+    """Server-Sent Events variant of optimize: streams tokens, then the result."""
+    deadline = Deadline(settings.optimization_deadline_seconds)
+    listing = db.query(ListingModel).filter(ListingModel.id == listing_id).first()
+    if listing is None:
+        raise HTTPException(status_code=404, detail="Listing not found")
     
-    return AgentResponse(**result)
\ No newline at end of file
+    async def events():
+        async for event in optimizer.optimize_stream(
+            listing.generated_title or listing.original_title,
+            listing.generated_description or listing.original_description,
+            listing.generated_bullets or [],
+            listing.keywords or [],
+            session_key=_session_key(listing_id),
+            deadline=deadline
+        ):
+            if event["event"] == "result" and event["data"]["success"]:
+                _save_optimization(listing, event["data"], db)
+            yield event
+    
+    return sse_response(events())
+
+def _save_optimization(listing: ListingModel, result: dict, db: Session) -> None:
+    listing.optimized_title = result["data"]["title"]
+    listing.optimized_description = result["data"]["description"]
+    listing.optimized_bullets = result["data"]["bullets"]
+    listing.status = "optimized"
+    db.commit()
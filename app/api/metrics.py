@@ -0,0 +1,31 @@
+from fastapi import APIRouter
+from app.core.metrics import metrics
+from app.core.cache import memo_stats
+from app.services.llm_scheduler import llm_scheduler
+from app.services.llm_usage import usage_summary
+from app.services.llm_sessions import llm_sessions
+from app.services.llm_cascade import cascade_stats
+from app.services.llm_hedging import hedge_stats
+from app.services.model_manager import model_manager
+from app.services.ollama_pool import ollama_pool
+from app.services.registry import registry
+from app.services.language_detector import language_detector
+
+router = APIRouter()
+
+@router.get("/")
+def read_metrics():
+    """Snapshot of in-process counters, gauges and histograms."""
+    return {
+        "metrics": metrics.snapshot(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "llm_usage": usage_summary(),
+        "models": model_manager.stats(),
+        "backends": ollama_pool.stats(),
+        "llm_sessions": llm_sessions.stats(),
+        "llm_cascade": cascade_stats(),
+        "llm_hedging": hedge_stats(),
+        "registry": registry.stats(),
+        "memoization": memo_stats(),
+        "language_detector": language_detector.stats()
+    }
@@ -1,170 +1,282 @@
-import json
 import hashlib
-from typing import Any, Optional, Union
+import inspect
+import json
+import time
+import unicodedata
+from collections import OrderedDict
 from functools import wraps
-import redis
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
 from app.core.config import settings
+from app.core.disk_cache import DiskCache
 from app.core.logger import get_logger
+from app.core.metrics import metrics
+from app.core.singleflight import SingleFlight
 
 logger = get_logger(__name__)
 
+memo_counter = metrics.counter("memo_requests_total", "Memoized calls by function and outcome")
 
-class CacheManager:
-    """Redis-based cache manager for application data."""
+
+class MemoryBackend:
+    """In-process LRU of JSON-encoded values with per-entry expiry."""
     
-    def __init__(self):
-        self.redis_client: Optional[redis.Redis] = None
-        self._connect()
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Optional[float], str]]" = OrderedDict()
     
-    def _connect(self) -> None:
-        """Connect to Redis server."""
-        try:
-            self.redis_client = redis.Redis(
-                host=settings.redis_host,
-                port=settings.redis_port,
-                db=settings.redis_db,
-                password=settings.redis_password if settings.redis_password else None,
-                decode_responses=True,
-                socket_timeout=5,
-                socket_connect_timeout=5
-            )
-            # Test connection
-            self.redis_client.ping()
-            logger.info("Connected to Redis cache")
-        except Exception as e:
-            logger.warning("Failed to connect to Redis, caching disabled", error=str(e))
-            self.redis_client = None
+    def get_nowait(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return json.loads(value)
     
-    def _generate_key(self, prefix: str, *args: Any) -> str:
-        """Generate a cache key from prefix and arguments."""
-        key_data = f"{prefix}:{':'.join(str(arg) for arg in args)}"
-        return hashlib.md5(key_data.encode()).hexdigest()
+    def set_nowait(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        self._entries[key] = (time.time() + ttl if ttl else None, json.dumps(value, ensure_ascii=False, default=str))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
     
-    def get(self, key: str) -> Optional[Any]:
-        """Get value from cache."""
-        if not self.redis_client:
-            return None
-        
-        try:
-            value = self.redis_client.get(key)
-            if value:
-                return json.loads(value)
-        except Exception as e:
-            logger.error("Cache get failed", key=key, error=str(e))
-        return None
+    async def get(self, key: str) -> Optional[Any]:
+        return self.get_nowait(key)
     
-    def set(self, key: str, value: Any, ttl: int = 3600) -> bool:
-        """Set value in cache with TTL."""
-        if not self.redis_client:
-            return False
-        
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        self.set_nowait(key, value, ttl)
+    
+    async def close(self) -> None:
+        self._entries.clear()
+
+
+class DiskBackend:
+    """Persistent backend on a local SQLite ``DiskCache``; survives restarts."""
+    
+    def __init__(self, path: str, max_bytes: int):
+        self.cache = DiskCache("memo", path, max_bytes=max_bytes)
+    
+    async def get(self, key: str) -> Optional[Any]:
+        return await self.cache.aget_json(key)
+    
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        await self.cache.aset_json(key, value, ttl)
+    
+    async def close(self) -> None:
+        self.cache.close()
+
+
+class RedisBackend:
+    """Shared backend on Redis (``redis.asyncio``); errors count as misses so Redis stays optional."""
+
+    def __init__(self):
+        self._client = None
+    
+    def _connect(self):
+        if self._client is None:
+            import redis.asyncio as redis
+            if settings.redis_url:
+                self._client = redis.from_url(settings.redis_url, socket_timeout=5, socket_connect_timeout=5)
+            else:
+                self._client = redis.Redis(
+                    host=settings.redis_host,
+                    port=settings.redis_port,
+                    db=settings.redis_db,
+                    password=settings.redis_password or None,
+                    socket_timeout=5,
+                    socket_connect_timeout=5
+                )
+        return self._client
+    
+    async def get(self, key: str) -> Optional[Any]:
         try:
-            serialized = json.dumps(value, default=str)
-            return self.redis_client.setex(key, ttl, serialized)
+            value = await self._connect().get(f"memo:{key}")
         except Exception as e:
-            logger.error("Cache set failed", key=key, error=str(e))
-            return False
+            logger.warning("Redis memo get failed", error=str(e))
+            return None
+        return json.loads(value) if value is not None else None
     
-    def delete(self, key: str) -> bool:
-        """Delete key from cache."""
-        if not self.redis_client:
-            return False
-        
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
         try:
-            return bool(self.redis_client.delete(key))
+            await self._connect().set(f"memo:{key}", json.dumps(value, ensure_ascii=False, default=str), ex=ttl or None)
         except Exception as e:
-            logger.error("Cache delete failed", key=key, error=str(e))
-            return False
+            logger.warning("Redis memo set failed", error=str(e))
     
-    def invalidate_pattern(self, pattern: str) -> int:
-        """Invalidate all keys matching pattern."""
-        if not self.redis_client:
-            return 0
-        
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def _create_backend():
+    if settings.memo_backend == "redis":
+        return RedisBackend()
+    if settings.memo_backend == "disk":
+        return DiskBackend(settings.memo_cache_path, settings.memo_cache_max_bytes)
+    return MemoryBackend(settings.memo_memory_max_entries)
+
+
+# Global backend shared by every memoized coroutine function
+memo_backend = _create_backend()
+
+# Version of every memoized function, by name, for ``memo_stats``
+_memoized: Dict[str, str] = {}
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form of a text argument: NFC, trimmed, runs of whitespace collapsed."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def fold_text(text: str) -> str:
+    """``normalize_text`` plus case folding, for functions that ignore case."""
+    return normalize_text(text).casefold()
+
+
+def code_version(*objects: Any) -> str:
+    """
+    Short hash of the source code of ``objects`` (functions, classes, modules).
+    
+    Part of every memo key, so editing the memoized code, or the code and
+    prompts it depends on, invalidates the entries it produced.
+    """
+    digest = hashlib.sha256()
+    for obj in objects:
         try:
-            keys = self.redis_client.keys(pattern)
-            if keys:
-                return self.redis_client.delete(*keys)
-        except Exception as e:
-            logger.error("Cache pattern invalidation failed", pattern=pattern, error=str(e))
-        return 0
+            source = inspect.getsource(obj)
+        except (OSError, TypeError):
+            # No source available (e.g. compiled only): fall back to the name
+            source = getattr(obj, "__qualname__", repr(obj))
+        digest.update(source.encode("utf-8"))
+    return digest.hexdigest()[:12]
 
 
-# Global cache instance
-cache = CacheManager()
+def _canonical(value: Any, normalize: Callable[[str], str]) -> Any:
+    if isinstance(value, str):
+        return normalize(value)
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item, normalize) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _canonical(item, normalize) for key, item in value.items()}
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    # str() of arbitrary objects usually embeds a memory address and would never hit
+    raise TypeError(f"Cannot memoize on argument of type {type(value).__name__}")
 
 
-def cached(prefix: str, ttl: int = 3600):
+def memoize(name: str, ttl: Optional[int] = 3600, version: str = "1", depends_on: Iterable[Any] = (),
+            normalize: Callable[[str], str] = normalize_text,
+            cache_if: Callable[[Any], bool] = lambda result: result is not None):
     """
-    Decorator for caching function results.
+    Memoize a function or method on its arguments.
+    
+    The key is built from ``name``, ``version``, a hash of the function's
+    source and of ``depends_on``, and the call's arguments bound to the
+    signature: ``self``/``cls`` are left out, so every instance shares
+    entries, and text arguments go through ``normalize``. Results go through
+    JSON, so callers always get their own copy.
+    
+    Coroutine functions use the configured ``memo_backend`` (memory, disk or
+    Redis) and concurrent misses on the same key run once. Plain functions
+    can't await a backend and use a private in-process LRU. Only results
+    accepted by ``cache_if`` are stored. Hits and misses are counted per
+    ``name`` (see ``memo_stats``).
     
     Args:
-        prefix: Cache key prefix
-        ttl: Time to live in seconds
+        name: Identifies the function in keys and stats
+        ttl: Seconds an entry stays valid; None keeps it until evicted
+        version: Bump to invalidate entries for changes the source hash can't see
+        depends_on: Code the result depends on (classes, functions, modules)
+        normalize: Canonical form of text arguments
+        cache_if: Whether a result may be stored
     """
     def decorator(func):
-        @wraps(func)
-        async def async_wrapper(*args, **kwargs):
-            # Generate cache key
-            cache_key = cache._generate_key(prefix, *args, *kwargs.values())
-            
-            # Try to get from cache
-            cached_result = cache.get(cache_key)
-            if cached_result is not None:
-                logger.debug("Cache hit", function=func.__name__, key=cache_key)
-                return cached_result
-            
-            # Execute function
-            logger.debug("Cache miss", function=func.__name__, key=cache_key)
-            result = await func(*args, **kwargs)
+        signature = inspect.signature(func)
+        parameters = list(signature.parameters)
+        skip = parameters[0] if parameters and parameters[0] in ("self", "cls") else None
+        key_version = f"{version}:{code_version(func, *depends_on)}"
+        _memoized[name] = key_version
+        
+        def make_key(args, kwargs) -> str:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = {param: _canonical(value, normalize)
+                         for param, value in bound.arguments.items() if param != skip}
+            payload = json.dumps([name, key_version, arguments], ensure_ascii=False, sort_keys=True)
+            return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        
+        if inspect.iscoroutinefunction(func):
+            flights = SingleFlight(f"memo:{name}")
             
-            # Cache the result
-            if result is not None:
-                cache.set(cache_key, result, ttl)
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not settings.memo_enabled:
+                    return await func(*args, **kwargs)
+                
+                key = make_key(args, kwargs)
+                cached = await memo_backend.get(key)
+                if cached is not None:
+                    memo_counter.inc(function=name, outcome="hit")
+                    return cached
+                
+                computed = False
+                
+                async def compute():
+                    nonlocal computed
+                    computed = True
+                    memo_counter.inc(function=name, outcome="miss")
+                    result = await func(*args, **kwargs)
+                    if cache_if(result):
+                        await memo_backend.set(key, result, ttl)
+                    return result
+                
+                result = await flights.do(key, compute)
+                if not computed:
+                    # Joined a concurrent miss on the same key
+                    memo_counter.inc(function=name, outcome="coalesced")
+                return result
             
-            return result
+            return async_wrapper
+        
+        local = MemoryBackend(settings.memo_memory_max_entries)
         
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
-            # Generate cache key
-            cache_key = cache._generate_key(prefix, *args, *kwargs.values())
+            if not settings.memo_enabled:
+                return func(*args, **kwargs)
             
-            # Try to get from cache
-            cached_result = cache.get(cache_key)
-            if cached_result is not None:
-                logger.debug("Cache hit", function=func.__name__, key=cache_key)
-                return cached_result
+            key = make_key(args, kwargs)
+            cached = local.get_nowait(key)
+            if cached is not None:
+                memo_counter.inc(function=name, outcome="hit")
+                return cached
             
-            # Execute function
-            logger.debug("Cache miss", function=func.__name__, key=cache_key)
+            memo_counter.inc(function=name, outcome="miss")
             result = func(*args, **kwargs)
-            
-            # Cache the result
-            if result is not None:
-                cache.set(cache_key, result, ttl)
-            
+            if cache_if(result):
+                local.set_nowait(key, result, ttl)
             return result
-        
-        # Return appropriate wrapper based on function type
-        import asyncio
-        if asyncio.iscoroutinefunction(func):
-            return async_wrapper
-        else:
-            return sync_wrapper
-    
-    return decorator
 
+        return sync_wrapper
 
-def cache_competitor_research(ttl: int = 7200):
-    """Cache decorator specifically for competitor research (2 hours TTL)."""
-    return cached("competitor_research", ttl)
-
+    return decorator
 
-def cache_language_detection(ttl: int = 86400):
-    """Cache decorator for language detection (24 hours TTL)."""
-    return cached("language_detection", ttl)
 
+def memo_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Per memoized function: the version in its keys, hits, misses, calls that
+    joined a concurrent miss, and the hit rate (share of calls that did not
+    run the function).
+    """
+    stats = {name: {"version": version, "hits": 0, "misses": 0, "coalesced": 0}
+             for name, version in _memoized.items()}
+    for entry in memo_counter.snapshot()["values"]:
+        labels = entry["labels"]
+        row = stats.setdefault(labels["function"], {"version": None, "hits": 0, "misses": 0, "coalesced": 0})
+        row[{"hit": "hits", "miss": "misses"}.get(labels["outcome"], labels["outcome"])] += int(entry["value"])
 
-def cache_image_search(ttl: int = 3600):
-    """Cache decorator for image search results (1 hour TTL)."""
-    return cached("image_search", ttl)
\ No newline at end of file
+    for row in stats.values():
+        calls = row["hits"] + row["misses"] + row["coalesced"]
+        row["hit_rate"] = round((row["hits"] + row["coalesced"]) / calls, 3) if calls else 0.0
+    return stats
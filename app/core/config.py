@@ -1,15 +1,170 @@
-from typing import Optional
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, field_validator
 from pydantic_settings import BaseSettings
 
 
+class LLMProfile(BaseModel):
+    """Model and generation options for one kind of LLM task."""
+    model: Optional[str] = None  # Explicit model; otherwise chosen by tier
+    tier: str = "main"  # "light" tasks run on ollama_light_model when it is set
+    num_predict: Optional[int] = None
+    num_ctx: Optional[int] = None
+    temperature: Optional[float] = None
+    stop: List[str] = []
+    
+    def options(self) -> Dict[str, Any]:
+        """Ollama ``options`` for this profile, omitting unset values."""
+        options = {
+            name: getattr(self, name)
+            for name in ("num_predict", "num_ctx", "temperature")
+            if getattr(self, name) is not None
+        }
+        if self.stop:
+            options["stop"] = self.stop
+        return options
+
+
+DEFAULT_LLM_PROFILES: Dict[str, LLMProfile] = {
+    "semantic_keywords": LLMProfile(tier="light", num_predict=256, temperature=0.3),
+    "competitive_insights": LLMProfile(tier="light", num_predict=512, temperature=0.5),
+    "listing_generation": LLMProfile(num_predict=2048, temperature=0.7),
+    "fused_analysis": LLMProfile(num_predict=3072, temperature=0.7),
+    "optimization": LLMProfile(num_predict=2048, temperature=0.4),
+    "field_repair": LLMProfile(tier="light", num_predict=512, temperature=0.3),
+}
+
+
 class Settings(BaseSettings):
     # Database
     database_url: str = "sqlite:///./listings.db"
     
     # Ollama Configuration
     ollama_base_url: str = "http://localhost:11434"
+    ollama_base_urls: List[str] = []  # Pool of backends; defaults to [ollama_base_url]
+    ollama_health_check_interval: int = 10
+    ollama_health_check_timeout: float = 2.0
     ollama_model: str = "qwen2.5-coder:32b"
     ollama_timeout: int = 300
+    ollama_keep_alive: str = "30m"
+    ollama_light_model: Optional[str] = None  # Small model for "light" tasks, e.g. qwen2.5:3b
+    
+    # Per-task generation profiles; LLM_PROFILES (JSON) overrides individual
+    # tasks. Profiles sharing a model should share num_ctx: Ollama reloads the
+    # model whenever the context size changes.
+    llm_profiles: Dict[str, LLMProfile] = DEFAULT_LLM_PROFILES
+    
+    # Small-model-first cascade: try the fast model, escalate to the profile's
+    # model only when the output fails validation
+    llm_cascade_enabled: bool = False
+    llm_cascade_model: Optional[str] = None  # Defaults to ollama_light_model
+    llm_cascade_min_compliance: int = 80
+    llm_cascade_min_bullets: int = 5
+    
+    # Prompt token budgeting
+    llm_num_ctx: int = 8192  # Context window sent with every request unless a profile sets one
+    llm_chars_per_token: float = 3.5  # Conservative estimate for Spanish/English text
+    llm_prompt_safety_margin: int = 128
+    
+    # Model warm-up and residency
+    ollama_warmup_enabled: bool = True
+    ollama_warmup_models: List[str] = []  # Defaults to the main model (OLLAMA_MODEL)
+    ollama_residency_check_interval: int = 60
+    
+    # Outbound HTTP connection pool
+    http_pool_limit: int = 100
+    http_pool_limit_per_host: int = 20
+    http_dns_cache_ttl: int = 300
+    http_keepalive_timeout: float = 60.0
+    http_connect_timeout: float = 10.0
+    
+    # LLM request scheduling
+    llm_max_in_flight: int = 4
+    llm_min_in_flight: int = 1
+    llm_model_max_in_flight: Dict[str, int] = {}
+    llm_adaptive_concurrency: bool = True
+    llm_latency_tolerance: float = 2.0
+    llm_latency_ewma_alpha: float = 0.2
+    llm_latency_window: int = 50
+    
+    # Hedged requests: with several backends, a generation that has not answered
+    # (first token when streaming) within this percentile of recent latency is
+    # duplicated to another backend; the first answer wins, the other is cancelled
+    llm_hedge_enabled: bool = False
+    llm_hedge_percentile: float = 95.0
+    llm_hedge_min_samples: int = 20  # No hedging until the percentile is meaningful
+    llm_hedge_min_delay: float = 1.0
+    llm_hedge_max_backend_in_flight: int = 2  # Only hedge onto a backend this idle
+    llm_hedge_measure_fraction: float = 0.05  # Losing primaries left to finish to measure the saving
+    
+    # LLM response cache
+    llm_cache_enabled: bool = True
+    llm_cache_path: str = "cache/llm_responses.sqlite"
+    llm_cache_max_bytes: int = 256 * 1024 * 1024  # 256MB
+    llm_cache_ttl: int = 7 * 24 * 3600  # 7 days
+    
+    # Schema-constrained generations are streamed and parsed as they arrive:
+    # stopped once the JSON object is complete (after a few chunks of grace for
+    # the model to end on its own) or as soon as a field fails validation
+    llm_json_early_stop: bool = True
+    llm_json_stop_grace_chunks: int = 4
+    
+    # Targeted repair: missing fields or single non-compliant fields (a long
+    # bullet, a forbidden word) are regenerated on their own and merged back;
+    # with more failing fields than the maximum a full generation is used
+    llm_field_repair_enabled: bool = True
+    llm_field_repair_max_fields: int = 4
+    llm_field_repair_context_chars: int = 400  # Product description sent as context
+    
+    # Memoized agent methods (app.core.cache.memoize): "memory" (in-process
+    # LRU), "disk" (SQLite, survives restarts) or "redis" (shared by workers)
+    memo_enabled: bool = True
+    memo_backend: str = "memory"
+    memo_memory_max_entries: int = 4096
+    memo_cache_path: str = "cache/memo.sqlite"
+    memo_cache_max_bytes: int = 64 * 1024 * 1024  # 64MB
+    
+    # Language detection: results kept in memory by hash of the text
+    language_cache_max_entries: int = 10000
+    
+    # Embeddings (Ollama /api/embed) for keyword dedup, category detection and
+    # competitor relevance; the heuristics are used when disabled or unavailable
+    embeddings_enabled: bool = False
+    embedding_model: str = "nomic-embed-text"
+    embedding_batch_size: int = 64
+    embedding_cache_path: str = "cache/embeddings.sqlite"
+    embedding_cache_max_bytes: int = 128 * 1024 * 1024  # 128MB
+    embedding_dedup_threshold: float = 0.92  # Cosine similarity above which keywords are duplicates
+    embedding_category_threshold: float = 0.5  # Minimum similarity to assign a category
+    
+    # Analysis: generate semantic keywords, competitive insights and the
+    # listing in one LLM call instead of three
+    analysis_fused_mode: bool = False
+    # Re-analysis reuses the stored output of every stage whose inputs are unchanged
+    incremental_analysis_enabled: bool = True
+    
+    # LLM sessions (reuse of a listing's model context between agents). Off by
+    # default: keeping the context means reading every analysis generation to
+    # its end instead of stopping it once the JSON object is complete
+    llm_session_enabled: bool = False
+    llm_session_ttl: int = 1800  # seconds; keep in line with ollama_keep_alive
+    llm_session_max_entries: int = 256
+    
+    # Request deadlines (seconds). Optional analysis stages get their budget
+    # but never the time reserved for the listing generation that follows;
+    # optional LLM calls are skipped when less than the minimum is left.
+    analysis_deadline_seconds: float = 240.0
+    optimization_deadline_seconds: float = 180.0
+    deadline_stage_budgets: Dict[str, float] = {
+        "competitor_research": 20.0,
+        "seo_analysis": 30.0,
+        "market_intelligence": 30.0,
+    }
+    deadline_generation_reserve: float = 90.0
+    deadline_min_llm_seconds: float = 15.0
+    
+    # Web search
+    web_search_timeout: float = 10.0
+    web_search_concurrency: int = 4
     
     # API Keys
     unsplash_api_key: Optional[str] = None
@@ -51,9 +206,35 @@ class Settings(BaseSettings):
     rate_limit_requests: int = 100
     rate_limit_period: int = 3600  # 1 hour
     
+    @field_validator("llm_profiles")
+    @classmethod
+    def _merge_default_profiles(cls, profiles: Dict[str, LLMProfile]) -> Dict[str, LLMProfile]:
+        # Field by field: overriding one option of a task keeps its other defaults
+        merged = dict(DEFAULT_LLM_PROFILES)
+        for name, override in profiles.items():
+            default = DEFAULT_LLM_PROFILES.get(name)
+            merged[name] = default.model_copy(update=override.model_dump(exclude_unset=True)) if default else override
+        return merged
+    
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
+    
+    def llm_profile(self, task: str) -> LLMProfile:
+        """Profile for ``task`` with its model resolved."""
+        profile = self.llm_profiles.get(task) or LLMProfile()
+        model = profile.model or (
+            self.ollama_light_model if profile.tier == "light" and self.ollama_light_model else self.ollama_model
+        )
+        return profile.model_copy(update={"model": model, "num_ctx": profile.num_ctx or self.llm_num_ctx})
+    
+    def model_num_ctx(self, model: str) -> int:
+        """Context window requests to ``model`` run with (warm-up must match it)."""
+        for task in self.llm_profiles:
+            profile = self.llm_profile(task)
+            if profile.model == model:
+                return profile.num_ctx
+        return self.llm_num_ctx
 
 
 settings = Settings()
\ No newline at end of file
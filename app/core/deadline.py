@@ -0,0 +1,139 @@
+"""
+Deadline - Per-request time budgets propagated to every stage and outbound call
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+import aiohttp
+
+from app.core.logger import get_logger
+from app.core.metrics import metrics
+
+logger = get_logger(__name__)
+
+stage_cuts_counter = metrics.counter("deadline_stage_cuts_total", "Optional stages skipped or cut short by the deadline")
+
+
+class Deadline:
+    """
+    Point in time by which a request must have produced its response.
+
+    Created at the API layer and made current with ``deadline_scope``; the
+    HTTP clients cap their timeouts at the time remaining. Stages get child
+    deadlines from ``for_stage`` that never outlive their parent, and every
+    stage skipped or cut short is recorded on the root so the response can
+    report it.
+    """
+
+    def __init__(self, seconds: float, name: str = "request", parent: Optional["Deadline"] = None):
+        now = time.monotonic()
+        self.name = name
+        self.started_at = now
+        self.expires_at = now + seconds
+        if parent is not None:
+            self.expires_at = min(self.expires_at, parent.expires_at)
+        self.budget = self.expires_at - now
+        self._root = parent._root if parent is not None else self
+        self._cuts: List[Dict[str, str]] = []
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """Seconds an operation may take: the time remaining, at most ``cap``."""
+        remaining = self.remaining()
+        return remaining if cap is None else min(cap, remaining)
+
+    def for_stage(self, stage: str, budget: float, reserve: float = 0.0) -> Optional["Deadline"]:
+        """
+        Child deadline for an optional stage, or None when it should be skipped.
+
+        The stage gets at most ``budget`` seconds and never eats into the
+        ``reserve`` kept for the stages that must still run after it.
+        """
+        available = min(budget, self.remaining() - reserve)
+        if available <= 0:
+            self.cut(stage, "skipped")
+            return None
+        return Deadline(available, name=stage, parent=self)
+
+    def cut(self, stage: str, reason: str) -> None:
+        """Record that ``stage`` was skipped or degraded to stay within the deadline."""
+        self._root._cuts.append({"stage": stage, "reason": reason})
+        stage_cuts_counter.inc(stage=stage, reason=reason)
+        logger.info("Stage cut by deadline", stage=stage, reason=reason,
+                    remaining=round(self._root.remaining(), 2))
+
+    def status(self, stage: str) -> str:
+        """``completed`` or the reason the stage was cut."""
+        for cut in self._root._cuts:
+            if cut["stage"] == stage:
+                return cut["reason"]
+        return "completed"
+
+    @property
+    def stages_cut(self) -> List[Dict[str, str]]:
+        return list(self._root._cuts)
+
+    def report(self) -> Dict[str, Any]:
+        root = self._root
+        return {
+            "budget_seconds": round(root.budget, 2),
+            "elapsed_seconds": round(time.monotonic() - root.started_at, 2),
+            "stages_cut": root.stages_cut,
+        }
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[None]:
+    """Make ``deadline`` the one every call inside the block must respect."""
+    token = _current_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+def deadline_expired() -> bool:
+    deadline = current_deadline()
+    return deadline is not None and deadline.expired
+
+
+def remaining_timeout(cap: Optional[float]) -> Optional[float]:
+    """``cap`` limited by the current deadline (``cap`` itself when there is none)."""
+    deadline = current_deadline()
+    if deadline is None:
+        return cap
+    return deadline.timeout(cap)
+
+
+def client_timeout(cap: Optional[float]) -> aiohttp.ClientTimeout:
+    """Total timeout for one outbound request under the current deadline."""
+    total = remaining_timeout(cap)
+    if total is not None:
+        # aiohttp treats a zero timeout as "no timeout"
+        total = max(total, 0.001)
+    return aiohttp.ClientTimeout(total=total)
+
+
+def allow_optional(stage: str, min_seconds: float) -> bool:
+    """Whether an optional step still fits in the current deadline; records the cut if not."""
+    deadline = current_deadline()
+    if deadline is None or deadline.remaining() >= min_seconds:
+        return True
+    deadline.cut(stage, "skipped")
+    return False
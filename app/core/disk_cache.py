@@ -0,0 +1,237 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from app.core.logger import get_logger
+from app.core.metrics import metrics
+
+logger = get_logger(__name__)
+
+cache_requests = metrics.counter("disk_cache_requests_total", "Disk cache lookups by cache and outcome")
+cache_bytes = metrics.gauge("disk_cache_bytes", "Bytes stored per disk cache")
+cache_evictions = metrics.counter("disk_cache_evictions_total", "Entries evicted to honour the size budget")
+
+
+class DiskCache:
+    """
+    Persistent content-addressed cache stored in a local SQLite file.
+
+    Entries expire after ``ttl`` seconds and the least recently used ones are
+    evicted once the stored payload exceeds ``max_bytes``. Blocking SQLite
+    work runs in a worker thread so callers on the event loop never stall.
+    """
+
+    def __init__(self, name: str, path: str, max_bytes: int, ttl: Optional[int] = None):
+        self.name = name
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    expires_at REAL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)")
+            self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            cache_bytes.set(self._total_bytes, cache=self.name)
+            self._conn = conn
+            logger.info("Disk cache opened", cache=self.name, path=self.path, bytes=self._total_bytes)
+        return self._conn
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """Return the stored value, or None when missing or expired."""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value, size, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                cache_requests.inc(cache=self.name, outcome="miss")
+                return None
+
+            value, size, expires_at = row
+            now = time.time()
+            if expires_at is not None and expires_at < now:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                conn.commit()
+                self._total_bytes -= size
+                cache_bytes.set(self._total_bytes, cache=self.name)
+                cache_requests.inc(cache=self.name, outcome="expired")
+                return None
+
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+            cache_requests.inc(cache=self.name, outcome="hit")
+            return value
+
+    def set_bytes(self, key: str, value: bytes, ttl: Optional[int] = None) -> None:
+        """Store a value, evicting least recently used entries if over budget."""
+        size = len(value)
+        if size > self.max_bytes:
+            return
+
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+
+        with self._lock:
+            conn = self._connect()
+            previous = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), size, now, now, expires_at),
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self._evict(conn)
+            conn.commit()
+            cache_bytes.set(self._total_bytes, cache=self.name)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        # Drop expired entries first, then the least recently used ones
+        now = time.time()
+        expired = conn.execute(
+            "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM entries WHERE expires_at IS NOT NULL AND expires_at < ?",
+            (now,),
+        ).fetchone()
+        conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+        self._total_bytes -= expired[0]
+        evicted = expired[1]
+
+        while self._total_bytes > self.max_bytes:
+            rows = conn.execute("SELECT key, size FROM entries ORDER BY accessed_at LIMIT 64").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._total_bytes -= size
+                evicted += 1
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+        if evicted:
+            cache_evictions.inc(evicted, cache=self.name)
+
+    def get_many_bytes(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """Values for the ``keys`` present and unexpired (one lock and commit for the batch)."""
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+            for key in keys:
+                row = conn.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None or (row[1] is not None and row[1] < now):
+                    # Expired rows are left for eviction to reclaim
+                    cache_requests.inc(cache=self.name, outcome="miss")
+                    continue
+                found[key] = row[0]
+                cache_requests.inc(cache=self.name, outcome="hit")
+            if found:
+                conn.executemany("UPDATE entries SET accessed_at = ? WHERE key = ?", [(now, key) for key in found])
+                conn.commit()
+        return found
+
+    def set_many_bytes(self, items: Dict[str, bytes], ttl: Optional[int] = None) -> None:
+        """Store several values in one transaction."""
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+
+        with self._lock:
+            conn = self._connect()
+            for key, value in items.items():
+                if len(value) > self.max_bytes:
+                    continue
+                previous = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, sqlite3.Binary(value), len(value), now, now, expires_at),
+                )
+                self._total_bytes += len(value) - (previous[0] if previous else 0)
+            self._evict(conn)
+            conn.commit()
+            cache_bytes.set(self._total_bytes, cache=self.name)
+
+    async def aget_many_bytes(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        return await asyncio.to_thread(self.get_many_bytes, list(keys))
+
+    async def aset_many_bytes(self, items: Dict[str, bytes], ttl: Optional[int] = None) -> None:
+        await asyncio.to_thread(self.set_many_bytes, items, ttl)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            conn.commit()
+            self._total_bytes -= row[0]
+            cache_bytes.set(self._total_bytes, cache=self.name)
+
+    def get_json(self, key: str) -> Optional[Any]:
+        """Stored JSON value; an entry that no longer decodes is dropped and read as a miss."""
+        value = self.get_bytes(key)
+        if value is None:
+            return None
+        try:
+            return json.loads(value)
+        except ValueError as e:
+            cache_requests.inc(cache=self.name, outcome="corrupt")
+            logger.warning("Dropping unreadable disk cache entry", cache=self.name, key=key, error=str(e))
+            self.delete(key)
+            return None
+
+    def set_json(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        self.set_bytes(key, json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"), ttl)
+
+    async def aget_json(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self.get_json, key)
+
+    async def aset_json(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        await asyncio.to_thread(self.set_json, key, value, ttl)
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM entries")
+            conn.commit()
+            self._total_bytes = 0
+            cache_bytes.set(0, cache=self.name)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+        }
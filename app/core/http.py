@@ -0,0 +1,91 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+from app.core.config import settings
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class HTTPTransport:
+    """App-scoped pooled HTTP transport shared by all outbound clients.
+
+    Keeps a single ``aiohttp.ClientSession`` with a keep-alive connection pool,
+    per-host connection limits and a DNS cache, so LLM calls and web searches
+    reuse warm TCP connections instead of paying a handshake per request.
+    """
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Build a session backed by a tuned connection pool."""
+        connector = aiohttp.TCPConnector(
+            limit=settings.http_pool_limit,
+            limit_per_host=settings.http_pool_limit_per_host,
+            ttl_dns_cache=settings.http_dns_cache_ttl,
+            use_dns_cache=True,
+            keepalive_timeout=settings.http_keepalive_timeout,
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=None, connect=settings.http_connect_timeout),
+        )
+
+    @property
+    def is_open(self) -> bool:
+        """Whether a live session is available."""
+        return self._session is not None and not self._session.closed
+
+    async def start(self) -> None:
+        """Open the shared session (called on application startup)."""
+        await self.get_session()
+        logger.info(
+            "HTTP transport started",
+            pool_limit=settings.http_pool_limit,
+            pool_limit_per_host=settings.http_pool_limit_per_host,
+        )
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it lazily for the running loop."""
+        loop = asyncio.get_running_loop()
+        if not self.is_open or self._loop is not loop:
+            # A session is bound to the loop it was created on; scripts and
+            # tests that spin up fresh loops get their own pool.
+            stale = self._session
+            self._session = self._create_session()
+            self._loop = loop
+            if stale is not None and not stale.closed:
+                # Releases the old pool's sockets; with its loop already
+                # closed aiohttp just marks the connector closed
+                await stale.close()
+        return self._session
+
+    async def close(self) -> None:
+        """Close the shared session (called on application shutdown)."""
+        if self.is_open:
+            await self._session.close()
+            logger.info("HTTP transport closed")
+        self._session = None
+        self._loop = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool configuration and usage."""
+        if not self.is_open:
+            return {"open": False}
+
+        connector = self._session.connector
+        return {
+            "open": True,
+            "limit": connector.limit,
+            "limit_per_host": connector.limit_per_host,
+            "idle_connections": sum(len(conns) for conns in connector._conns.values()),
+            "acquired_connections": len(connector._acquired),
+        }
+
+
+# Global transport instance
+http_transport = HTTPTransport()
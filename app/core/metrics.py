@@ -0,0 +1,175 @@
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    """Normalize a label dict into a hashable, ordered key."""
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _label_dict(key: LabelKey) -> Dict[str, str]:
+    return dict(key)
+
+
+class Counter:
+    """Monotonically increasing counter, optionally split by labels."""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "type": "counter",
+            "description": self.description,
+            "values": [{"labels": _label_dict(key), "value": value} for key, value in self._values.items()],
+        }
+
+
+class Gauge:
+    """Value that can go up and down, optionally split by labels."""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "type": "gauge",
+            "description": self.description,
+            "values": [{"labels": _label_dict(key), "value": value} for key, value in self._values.items()],
+        }
+
+
+class _HistogramSeries:
+    """Bucketed observations plus a bounded reservoir of recent samples for percentiles."""
+
+    def __init__(self, buckets: Tuple[float, ...], reservoir_size: int):
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self.recent: Deque[float] = deque(maxlen=reservoir_size)
+
+
+class Histogram:
+    """Distribution of observed values, optionally split by labels."""
+
+    def __init__(self, name: str, description: str,
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS, reservoir_size: int = 1000):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.reservoir_size = reservoir_size
+        self._series: Dict[LabelKey, _HistogramSeries] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(self.buckets, self.reservoir_size)
+            series.count += 1
+            series.total += value
+            series.recent.append(value)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series.bucket_counts[i] += 1
+
+    def percentile(self, percentile: float, **labels: Any) -> Optional[float]:
+        """Percentile (0-100) over the recent-sample reservoir, or None if empty."""
+        series = self._series.get(_label_key(labels))
+        if series is None or not series.recent:
+            return None
+        return _percentile(sorted(series.recent), percentile)
+
+    def count(self, **labels: Any) -> int:
+        series = self._series.get(_label_key(labels))
+        return series.count if series else 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        values = []
+        for key, series in self._series.items():
+            recent = sorted(series.recent)
+            values.append({
+                "labels": _label_dict(key),
+                "count": series.count,
+                "sum": round(series.total, 6),
+                "buckets": {str(bound): count for bound, count in zip(self.buckets, series.bucket_counts)},
+                "p50": _percentile(recent, 50),
+                "p95": _percentile(recent, 95),
+                "p99": _percentile(recent, 99),
+            })
+        return {"type": "histogram", "description": self.description, "values": values}
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(percentile / 100 * (len(sorted_values) - 1)))))
+    return round(sorted_values[index], 6)
+
+
+class MetricsRegistry:
+    """In-process registry of application metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, description: str, **kwargs: Any):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, description, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {type(metric).__name__}")
+            return metric
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name: str, description: str = "") -> Gauge:
+        return self._get_or_create(Gauge, name, description)
+
+    def histogram(self, name: str, description: str = "", **kwargs: Any) -> Histogram:
+        return self._get_or_create(Histogram, name, description, **kwargs)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: metric.snapshot() for name, metric in sorted(self._metrics.items())}
+
+
+# Global metrics registry
+metrics = MetricsRegistry()
@@ -0,0 +1,32 @@
+import json
+from typing import Any, AsyncIterator, Dict
+
+from fastapi.responses import StreamingResponse
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Format a single Server-Sent Event frame."""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def sse_response(events: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    """
+    Wrap an async iterator of ``{"event": ..., "data": ...}`` dicts in an SSE response.
+
+    Proxy buffering is disabled so each frame reaches the browser as soon as it
+    is produced.
+    """
+    async def stream() -> AsyncIterator[str]:
+        async for item in events:
+            yield format_sse(item["event"], item.get("data"))
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Index
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Index, ForeignKey, UniqueConstraint
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -25,4 +25,21 @@ class Listing(Base):
     __table_args__ = (
         Index('idx_status_created', 'status', 'created_at'),
         Index('idx_title_status', 'original_title', 'status'),
+    )
+
+
+class ListingStageResult(Base):
+    """Output of one analysis stage for a listing, with the fingerprint of its inputs."""
+    __tablename__ = "listing_stage_results"
+
+    id = Column(Integer, primary_key=True, index=True)
+    listing_id = Column(Integer, ForeignKey("listings.id", ondelete="CASCADE"), nullable=False, index=True)
+    stage = Column(String(50), nullable=False)
+    fingerprint = Column(String(64), nullable=False)
+    result = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('listing_id', 'stage', name='uq_listing_stage'),
     )
\ No newline at end of file
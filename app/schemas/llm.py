@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+from typing import List
+
+# Structured-output schemas sent to Ollama as ``format`` so generations
+# come back as JSON matching these models.
+
+class ListingGeneration(BaseModel):
+    title: str
+    description: str
+    bullets: List[str]
+    keywords: List[str]
+
+class OptimizedListing(BaseModel):
+    title: str
+    description: str
+    bullets: List[str]
+    improvements: List[str] = []
+    # Recomputed by the optimizer; whatever the model reports is overwritten
+    compliance_score: int = 0
+
+class SemanticKeywords(BaseModel):
+    keywords: List[str]
+
+class CompetitiveInsights(BaseModel):
+    insights: List[str]
+
+class FusedAnalysis(ListingGeneration):
+    """Listing plus the SEO and market generations, produced in a single call."""
+    semantic_keywords: List[str]
+    competitive_insights: List[str]
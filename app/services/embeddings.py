@@ -0,0 +1,104 @@
+"""
+Embeddings - Batched text vectors with a persistent content-hash cache
+"""
+
+import hashlib
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.disk_cache import DiskCache
+from app.core.logger import get_logger
+from app.core.metrics import metrics
+from app.services.ollama_client import OllamaClient
+
+logger = get_logger(__name__)
+
+embedded_texts = metrics.counter("embedding_texts_total", "Texts embedded by model and source (cache or model)")
+
+# Vectors are a pure function of model and text, so entries never expire
+embedding_cache = DiskCache(
+    "embeddings",
+    settings.embedding_cache_path,
+    max_bytes=settings.embedding_cache_max_bytes
+)
+
+
+def vector_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length so dot products are cosine similarities."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+class EmbeddingService:
+    """
+    Embeds texts through Ollama's ``/api/embed`` in batches.
+
+    Vectors are cached on disk keyed by a hash of model and text, so only
+    texts never seen before reach the model. Every method returns None when
+    embeddings are disabled or the model is unavailable; callers keep their
+    heuristic path for that case.
+    """
+
+    def __init__(self, model: Optional[str] = None, ollama: Optional[OllamaClient] = None):
+        self.ollama = ollama or OllamaClient()
+        self.model = model or settings.embedding_model
+
+    @property
+    def enabled(self) -> bool:
+        return settings.embeddings_enabled
+
+    async def embed(self, texts: Sequence[str]) -> Optional[np.ndarray]:
+        """Unit-length vectors for ``texts``, one row per text in order."""
+        if not self.enabled:
+            return None
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        unique = list(dict.fromkeys(texts))
+        keys = {text: vector_key(self.model, text) for text in unique}
+        cached = await embedding_cache.aget_many_bytes(keys.values())
+        vectors = {text: np.frombuffer(cached[key], dtype=np.float32) for text, key in keys.items() if key in cached}
+        embedded_texts.inc(len(vectors), model=self.model, source="cache")
+
+        missing = [text for text in unique if text not in vectors]
+        for start in range(0, len(missing), settings.embedding_batch_size):
+            batch = missing[start:start + settings.embedding_batch_size]
+            result = await self.ollama.embed(self.model, batch)
+            if not result["success"] or len(result["embeddings"]) != len(batch):
+                logger.warning("Embedding failed", model=self.model, texts=len(batch), error=result.get("error"))
+                return None
+
+            for text, vector in zip(batch, result["embeddings"]):
+                vectors[text] = vector
+            embedded_texts.inc(len(batch), model=self.model, source="model")
+            await embedding_cache.aset_many_bytes({keys[text]: vectors[text].tobytes() for text in batch})
+
+        return normalize(np.vstack([vectors[text] for text in texts]))
+
+    async def similarity(self, queries: Sequence[str], candidates: Sequence[str]) -> Optional[np.ndarray]:
+        """Cosine similarity matrix (queries x candidates), embedded in one batch."""
+        vectors = await self.embed(list(queries) + list(candidates))
+        if vectors is None:
+            return None
+        return vectors[:len(queries)] @ vectors[len(queries):].T
+
+    async def dedupe(self, texts: Sequence[str], threshold: Optional[float] = None) -> Optional[List[str]]:
+        """Keep the first of every group of near-duplicate texts, preserving order."""
+        threshold = settings.embedding_dedup_threshold if threshold is None else threshold
+        unique = list(dict.fromkeys(texts))
+        vectors = await self.embed(unique)
+        if vectors is None:
+            return None
+
+        similarities = vectors @ vectors.T
+        kept: List[int] = []
+        for index in range(len(unique)):
+            if not kept or similarities[index, kept].max() < threshold:
+                kept.append(index)
+        return [unique[index] for index in kept]
@@ -0,0 +1,146 @@
+"""
+Field Repair - Regenerate only the missing or failing fields of a generated listing
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, create_model
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.metrics import metrics
+from app.services.llm_usage import llm_call_scope
+from app.services.ollama_client import OllamaClient
+
+logger = get_logger(__name__)
+
+repairs_counter = metrics.counter("llm_field_repairs_total", "Targeted field repairs by agent and outcome")
+
+# What each field should contain, for the repair prompt
+FIELD_HINTS: Dict[str, str] = {
+    "title": "product title",
+    "description": "product description",
+    "bullets": "list of 5 bullet points",
+    "keywords": "list of 10-15 search keywords",
+    "improvements": "list of the improvements made",
+    "semantic_keywords": "list of related search keywords",
+    "competitive_insights": "list of competitive insights",
+}
+
+
+def split_path(path: str) -> Tuple[str, Optional[int]]:
+    """``"bullets.2"`` -> ``("bullets", 2)``; ``"title"`` -> ``("title", None)``."""
+    name, _, index = path.partition(".")
+    return name, int(index) if index else None
+
+
+class FieldRepair:
+    """
+    Regenerates individual fields of a listing with a small focused prompt.
+
+    Problems are keyed by path: a top-level field (``"keywords"``) or one
+    item of a list field (``"bullets.2"``, zero-based). The model only sees
+    the product, the current value of each field to fix and what is wrong
+    with it, and answers with just those fields, which are merged back into
+    the listing. Fixing one bullet costs a few hundred tokens instead of a
+    full generation.
+    """
+
+    def __init__(self, agent: str, ollama: Optional[OllamaClient] = None):
+        self.agent = agent
+        self.ollama = ollama or OllamaClient()
+
+    def can_repair(self, problems: Dict[str, str]) -> bool:
+        """Worth a repair: some problems, but few enough that a full generation is not cheaper."""
+        return settings.llm_field_repair_enabled and 0 < len(problems) <= settings.llm_field_repair_max_fields
+
+    async def repair(self, listing: Dict[str, Any], problems: Dict[str, str], schema: Type[BaseModel],
+                     product: str, language: str = "español", rules: str = "") -> Optional[Dict[str, Any]]:
+        """``listing`` with the fields in ``problems`` regenerated, or None when the repair failed."""
+        if not self.can_repair(problems):
+            return None
+
+        slots = {path: path.replace(".", "_") for path in problems}
+        repair_schema = create_model(
+            f"{schema.__name__}Repair",
+            **{slot: (self._slot_type(schema, path), ...) for path, slot in slots.items()}
+        )
+        profile = settings.llm_profile("field_repair")
+
+        with llm_call_scope(self.agent, "field_repair"):
+            result = await self.ollama.generate(
+                model=profile.model,
+                prompt=self._build_prompt(listing, problems, slots, product),
+                system_prompt=self._build_system_prompt(language, rules),
+                options=profile.options(),
+                schema=repair_schema,
+                use_cache=False
+            )
+
+        if not result["success"]:
+            repairs_counter.inc(agent=self.agent, outcome="failed")
+            logger.warning("Field repair failed", agent=self.agent, fields=list(problems), error=result.get("error"))
+            return None
+
+        try:
+            values = repair_schema.model_validate_json(result["response"]).model_dump()
+        except ValueError as e:
+            repairs_counter.inc(agent=self.agent, outcome="failed")
+            logger.warning("Field repair returned invalid output", agent=self.agent, error=str(e))
+            return None
+
+        repaired = dict(listing)
+        for path, slot in slots.items():
+            name, index = split_path(path)
+            if index is None:
+                repaired[name] = values[slot]
+            else:
+                items = list(repaired.get(name) or [])
+                if index < len(items):
+                    items[index] = values[slot]
+                else:
+                    items.append(values[slot])
+                repaired[name] = items
+
+        repairs_counter.inc(agent=self.agent, outcome="repaired")
+        logger.info("Repaired listing fields", agent=self.agent, fields=list(problems),
+                    usage=result.get("usage"))
+        return repaired
+
+    def _slot_type(self, schema: Type[BaseModel], path: str) -> Any:
+        name, index = split_path(path)
+        if index is not None:
+            return str
+        return schema.model_fields[name].annotation
+
+    def _build_system_prompt(self, language: str, rules: str) -> str:
+        return f"""You fix individual fields of an Amazon product listing.
+Write every field in {language}. Respond ONLY with a JSON object containing exactly the requested fields.
+{rules}""".strip()
+
+    def _build_prompt(self, listing: Dict[str, Any], problems: Dict[str, str],
+                      slots: Dict[str, str], product: str) -> str:
+        lines: List[str] = []
+        for path, problem in problems.items():
+            name, index = split_path(path)
+            current = listing.get(name)
+            if index is not None:
+                current = current[index] if current and index < len(current) else None
+                hint = f"bullet point {index + 1}"
+            else:
+                hint = FIELD_HINTS.get(name, name)
+
+            if current is None:
+                lines.append(f"- {slots[path]} ({hint}): missing")
+            else:
+                lines.append(f"- {slots[path]} ({hint}): current value {json.dumps(current, ensure_ascii=False)}; "
+                             f"problem: {problem}")
+
+        title = listing.get("title") or ""
+        return f"""PRODUCT:
+{title}
+{product[:settings.llm_field_repair_context_chars]}
+
+FIELDS TO WRITE:
+{chr(10).join(lines)}"""
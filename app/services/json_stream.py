@@ -0,0 +1,172 @@
+"""
+JSON Stream - Incremental parsing of streamed JSON output to stop generations early
+"""
+
+import json
+from typing import Annotated, Any, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+early_stops_counter = metrics.counter(
+    "llm_json_early_stops_total", "Streamed generations stopped before the model finished, by model and reason"
+)
+
+_adapters: Dict[Tuple[Type[BaseModel], str], TypeAdapter] = {}
+
+
+def _field_adapter(schema: Type[BaseModel], name: str) -> TypeAdapter:
+    """Validator for one field of ``schema``, including its constraints (``ge``, ``le``...)."""
+    adapter = _adapters.get((schema, name))
+    if adapter is None:
+        field = schema.model_fields[name]
+        annotation = Annotated[(field.annotation, *field.metadata)] if field.metadata else field.annotation
+        adapter = _adapters[(schema, name)] = TypeAdapter(annotation)
+    return adapter
+
+
+class JSONObjectStream:
+    """
+    Incremental parser for a JSON object arriving in chunks of generated text.
+
+    Tracks nesting across chunks so it knows when each top-level member and
+    the object itself are complete. Every member is validated against its
+    field in ``schema`` as soon as its value closes, and required fields are
+    checked when the object closes, so a bad output is known before the model
+    finishes. Once the object is complete the caller can stop the generation
+    instead of paying for trailing text (explanations, a second fence, runs
+    of whitespace): ``should_stop`` allows ``grace_chunks`` more chunks for
+    the model to end on its own, which keeps its final stats and context.
+    ``fields`` holds the valid members parsed so far, so a failed output can
+    be completed by regenerating just the rest.
+    """
+
+    def __init__(self, schema: Type[BaseModel], grace_chunks: Optional[int] = None):
+        self.schema = schema
+        self.grace_chunks = settings.llm_json_stop_grace_chunks if grace_chunks is None else grace_chunks
+        self.fields: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+        self._buffer = ""
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._end: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self._chunks_after_end = 0
+
+    @property
+    def complete(self) -> bool:
+        return self._end is not None
+
+    @property
+    def text(self) -> str:
+        """The object's text, from its opening to its closing brace (so far)."""
+        if self._start is None:
+            return ""
+        return self._buffer[self._start:self._end]
+
+    def finish(self) -> None:
+        """The generation ended: an object that never closed (e.g. cut by ``num_predict``) is an error."""
+        if self.error is None and not self.complete:
+            self.error = f"Incomplete JSON response, missing fields: {self.missing_fields()}"
+
+    def should_stop(self) -> bool:
+        """Whether the generation can be stopped: invalid output, or complete and past the grace chunks."""
+        return self.error is not None or (self.complete and self._chunks_after_end > self.grace_chunks)
+
+    def feed(self, chunk: str) -> str:
+        """Consume one chunk; returns the part of it up to the end of the object."""
+        if self.complete:
+            self._chunks_after_end += 1
+            return ""
+
+        self._buffer += chunk
+        for index in range(self._pos, len(self._buffer)):
+            self._scan(index, self._buffer[index])
+            if self.complete or self.error:
+                break
+        self._pos = len(self._buffer)
+
+        if self._end is not None:
+            return chunk[:len(chunk) - (len(self._buffer) - self._end)]
+        return chunk
+
+    def _scan(self, index: int, char: str) -> None:
+        if self._start is None:
+            # Skip anything before the object, such as a code fence
+            if char == "{":
+                self._start = index
+                self._depth = 1
+                self._expect_key = True
+            return
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._key_start is not None:
+                    self._key = json.loads(self._buffer[self._key_start:index + 1])
+                    self._key_start = None
+            return
+
+        if char == '"':
+            self._in_string = True
+            if self._depth == 1 and self._expect_key:
+                self._key_start = index
+                self._expect_key = False
+        elif char in "{[":
+            self._depth += 1
+        elif char in "}]":
+            self._depth -= 1
+            if self._depth == 0:
+                self._end_member(index)
+                self._end = index + 1
+                self._check_required()
+        elif self._depth == 1:
+            if char == ":":
+                self._value_start = index + 1
+            elif char == ",":
+                self._end_member(index)
+                self._expect_key = True
+
+    def _end_member(self, index: int) -> None:
+        if self._key is None or self._value_start is None:
+            return
+        key, raw = self._key, self._buffer[self._value_start:index]
+        self._key = self._value_start = None
+
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            self.error = f"Invalid JSON response: bad value for '{key}'"
+            return
+        self.fields[key] = value
+
+        if key in self.schema.model_fields:
+            try:
+                _field_adapter(self.schema, key).validate_python(value)
+            except ValidationError as e:
+                # Left out of ``fields`` so a repair treats it as missing
+                del self.fields[key]
+                self.error = f"Invalid JSON response: field '{key}': {e.errors()[0]['msg']}"
+
+    def _check_required(self) -> None:
+        if self.error is not None:
+            return
+        missing = self.missing_fields()
+        if missing:
+            self.error = f"Missing required fields: {missing}"
+
+    def missing_fields(self) -> List[str]:
+        return [name for name, field in self.schema.model_fields.items()
+                if field.is_required() and name not in self.fields]
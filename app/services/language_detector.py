@@ -0,0 +1,125 @@
+"""
+Language Detector - Stopword scoring of listing text, in batches
+"""
+
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+detections_counter = metrics.counter("language_detections_total", "Texts tagged, by source (cache or model)")
+
+LANGUAGES = ("spanish", "english")
+
+# Frequent words of each language, matched as whole words
+STOPWORDS: Dict[str, Sequence[str]] = {
+    "spanish": (
+        "el", "la", "de", "en", "con", "para", "por", "que", "es", "una", "del", "las", "los",
+        "se", "su", "al", "más", "como", "pero", "todo", "esta", "sus", "le", "ya", "o",
+        "porque", "cuando", "sin", "sobre", "también", "me", "hasta", "donde", "ser", "tiene"
+    ),
+    "english": (
+        "the", "and", "for", "are", "with", "his", "they", "this", "have", "from", "or",
+        "one", "had", "by", "word", "but", "not", "what", "all", "were", "we", "when",
+        "your", "can", "said", "there", "each", "which", "she", "do", "how", "their"
+    ),
+}
+
+# Any of these letters makes a text Spanish, whatever its words
+SPANISH_LETTERS = "ñáéíóú"
+
+
+def content_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class LanguageDetector:
+    """
+    Tags text as ``spanish``, ``english`` or ``mixed``.
+
+    A text with any of ``SPANISH_LETTERS`` is Spanish; otherwise the language
+    with more distinct stopwords in it wins, and a tie is ``mixed``. The
+    stopword index and a weight matrix (one row per stopword, one column per
+    language) are built once; scoring a batch fills a texts x stopwords
+    matrix with one lookup per whitespace-separated word and counts every
+    text's matches with one matrix product. Results are kept in an LRU keyed
+    by a hash of the normalized text, so repeated texts are not scored again.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = settings.language_cache_max_entries if max_entries is None else max_entries
+        self._cache: "OrderedDict[bytes, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        words = sorted({word for language in LANGUAGES for word in STOPWORDS[language]})
+        self._word_index = {word: column for column, word in enumerate(words)}
+        self._weights = np.zeros((len(words), len(LANGUAGES)), dtype=np.float32)
+        for column, language in enumerate(LANGUAGES):
+            for word in STOPWORDS[language]:
+                self._weights[self._word_index[word], column] = 1.0
+
+    def detect(self, text: str) -> str:
+        return self.detect_many([text])[0]
+
+    def detect_many(self, texts: Sequence[str]) -> List[str]:
+        """Language of each text, in order."""
+        normalized = [unicodedata.normalize("NFC", text).lower() for text in texts]
+        keys = [content_hash(text) for text in normalized]
+        results: List[Optional[str]] = [None] * len(texts)
+
+        with self._lock:
+            for position, key in enumerate(keys):
+                language = self._cache.get(key)
+                if language is not None:
+                    self._cache.move_to_end(key)
+                    results[position] = language
+
+        missing = [position for position, language in enumerate(results) if language is None]
+        if missing:
+            for position, language in zip(missing, self._score([normalized[position] for position in missing])):
+                results[position] = language
+            with self._lock:
+                for position in missing:
+                    self._cache[keys[position]] = results[position]
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+
+        if len(texts) > len(missing):
+            detections_counter.inc(len(texts) - len(missing), source="cache")
+        if missing:
+            detections_counter.inc(len(missing), source="model")
+        return results
+
+    def _score(self, texts: Sequence[str]) -> List[str]:
+        # Texts x stopwords presence (each word counts once), then one product with the weights
+        vocabulary = len(self._word_index)
+        word_hits: List[int] = []
+        for row, text in enumerate(texts):
+            offset = row * vocabulary
+            word_hits.extend(offset + column for column in map(self._word_index.get, text.split())
+                             if column is not None)
+
+        word_counts = np.bincount(np.array(word_hits, dtype=np.intp), minlength=len(texts) * vocabulary)
+        present = (word_counts.reshape(len(texts), vocabulary) > 0).astype(np.float32)
+        accented = np.array([any(letter in text for letter in SPANISH_LETTERS) for text in texts], dtype=bool)
+
+        scores = present @ self._weights
+        spanish, english = scores[:, 0], scores[:, 1]
+        labels = np.full(len(texts), "mixed", dtype=object)
+        labels[spanish > english] = "spanish"
+        labels[english > spanish] = "english"
+        labels[accented] = "spanish"
+        return labels.tolist()
+
+    def stats(self) -> Dict[str, int]:
+        return {"cached": len(self._cache), "max_entries": self.max_entries, "features": len(self._weights)}
+
+
+# Global detector instance
+language_detector = LanguageDetector()
@@ -0,0 +1,56 @@
+"""
+LLM Cascade - Try a fast model first and escalate only when its output fails validation
+"""
+
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings, LLMProfile
+from app.core.logger import get_logger
+from app.core.metrics import metrics
+
+logger = get_logger(__name__)
+
+cascade_counter = metrics.counter("llm_cascade_decisions_total", "Cascade outcomes by agent, outcome and reason")
+
+
+def cascade_model() -> Optional[str]:
+    """Fast model tried first, or None when the cascade is disabled."""
+    if not settings.llm_cascade_enabled:
+        return None
+    return settings.llm_cascade_model or settings.ollama_light_model or None
+
+
+def cascade_profiles(profile: LLMProfile) -> List[LLMProfile]:
+    """Profiles to try in order: the fast model first (if any), then ``profile`` itself."""
+    fast_model = cascade_model()
+    if not fast_model or fast_model == profile.model:
+        return [profile]
+    # Same options and context size, so the prompt built for the main model still fits
+    return [profile.model_copy(update={"model": fast_model}), profile]
+
+
+def record_accepted(agent: str, model: str) -> None:
+    cascade_counter.inc(agent=agent, outcome="accepted", reason="valid")
+    logger.debug("Cascade accepted fast model output", agent=agent, model=model)
+
+
+def record_escalation(agent: str, from_model: str, to_model: str, reason: str) -> None:
+    cascade_counter.inc(agent=agent, outcome="escalated", reason=reason)
+    logger.info("Cascade escalating to larger model", agent=agent,
+                from_model=from_model, to_model=to_model, reason=reason)
+
+
+def cascade_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-agent count of cascade decisions and the share that escalated."""
+    stats: Dict[str, Dict[str, Any]] = {}
+    for entry in cascade_counter.snapshot()["values"]:
+        labels = entry["labels"]
+        row = stats.setdefault(labels["agent"], {"decisions": 0, "escalated": 0, "reasons": {}})
+        row["decisions"] += int(entry["value"])
+        if labels["outcome"] == "escalated":
+            row["escalated"] += int(entry["value"])
+            row["reasons"][labels["reason"]] = row["reasons"].get(labels["reason"], 0) + int(entry["value"])
+
+    for row in stats.values():
+        row["escalation_rate"] = round(row["escalated"] / row["decisions"], 3) if row["decisions"] else 0.0
+    return stats
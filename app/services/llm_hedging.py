@@ -0,0 +1,154 @@
+"""
+LLM Hedging - Duplicate slow generations to another backend and keep the first answer
+"""
+
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, TypeVar
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.metrics import metrics
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+first_response_histogram = metrics.histogram(
+    "llm_first_response_seconds",
+    "Time to first token (streams) or to the full response, with hedging, per model and mode"
+)
+hedges_counter = metrics.counter("llm_hedges_total", "Hedged requests by model, mode and winner")
+hedge_saved_histogram = metrics.histogram(
+    "llm_hedge_saved_seconds", "Latency saved by hedges that won, measured on the sampled primaries"
+)
+
+# Sampled losing primaries left running to measure what hedging saved
+_measurements: Set[asyncio.Task] = set()
+
+
+def hedge_delay(model: str, mode: str) -> Optional[float]:
+    """
+    How long to wait for the first response before hedging, or None to never hedge.
+
+    Latencies are kept per ``mode`` and never mixed: ``stream`` measures the
+    time to the first token, ``generate`` the time to the full response.
+    """
+    if not settings.llm_hedge_enabled:
+        return None
+    if first_response_histogram.count(model=model, mode=mode) < settings.llm_hedge_min_samples:
+        return None
+    threshold = first_response_histogram.percentile(settings.llm_hedge_percentile, model=model, mode=mode)
+    return max(threshold, settings.llm_hedge_min_delay)
+
+
+async def hedged_call(model: str, mode: str, primary: Callable[[], Awaitable[T]],
+                      hedge: Optional[Callable[[], Awaitable[T]]] = None,
+                      can_hedge: Callable[[], bool] = lambda: True,
+                      accept: Callable[[T], bool] = lambda result: True,
+                      discard: Optional[Callable[[T], Awaitable[None]]] = None,
+                      keep_running: Optional[Callable[[asyncio.Future], None]] = None) -> T:
+    """
+    Run ``primary`` and, if it has not completed within the hedge delay, ``hedge`` too.
+
+    The first completion that ``accept`` approves wins and the other attempt is
+    cancelled (``discard`` releases a losing result that completed anyway).
+    Failed or rejected attempts only decide the outcome when nothing better
+    is left; then the primary's result or exception is returned. The caller
+    keeps hedges within its concurrency limits: ``hedge`` should take its own
+    scheduler slot and ``can_hedge`` refuse when none is free.
+
+    A sample of primaries beaten by their hedge is left to finish, to measure
+    what hedging saved; ``keep_running`` receives that measurement so the
+    caller can keep the primary's slot until it is done. Without it losing
+    primaries are always cancelled and nothing is measured.
+    """
+    started_at = time.monotonic()
+    tasks: List[asyncio.Future] = [asyncio.ensure_future(primary())]
+    winner: Optional[asyncio.Future] = None
+    measured = False
+
+    try:
+        delay = hedge_delay(model, mode) if hedge is not None else None
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and can_hedge():
+                tasks.append(asyncio.ensure_future(hedge()))
+                logger.debug("Hedging slow LLM request", model=model, mode=mode, delay=round(delay, 3))
+
+        pending = set(tasks)
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Checked in dispatch order so the primary wins a tie
+            winner = next(
+                (task for task in tasks if task in done and task.exception() is None and accept(task.result())),
+                None
+            )
+        if winner is None:
+            winner = next((task for task in tasks if task.exception() is None), tasks[0])
+
+        latency = time.monotonic() - started_at
+        if winner.exception() is None:
+            first_response_histogram.observe(latency, model=model, mode=mode)
+        if len(tasks) > 1:
+            hedge_won = winner is tasks[1]
+            hedges_counter.inc(model=model, mode=mode, winner="hedge" if hedge_won else "primary")
+            if (hedge_won and keep_running is not None and not tasks[0].done()
+                    and random.random() < settings.llm_hedge_measure_fraction):
+                keep_running(_measure_primary(tasks[0], started_at, latency, model, mode, discard))
+                measured = True
+
+        return winner.result()
+
+    finally:
+        losers = [task for task in tasks if task is not winner and not (measured and task is tasks[0])]
+        for task in losers:
+            task.cancel()
+        for task, outcome in zip(losers, await asyncio.gather(*losers, return_exceptions=True)):
+            if discard is not None and not isinstance(outcome, BaseException):
+                await discard(outcome)
+
+
+def _measure_primary(task: asyncio.Future, started_at: float, hedged_latency: float,
+                     model: str, mode: str, discard: Optional[Callable[[Any], Awaitable[None]]]) -> asyncio.Future:
+    """Let a losing primary finish in the background to record how much the hedge saved."""
+    async def measure() -> None:
+        try:
+            result = await task
+        except Exception:
+            return
+        hedge_saved_histogram.observe(time.monotonic() - started_at - hedged_latency, model=model, mode=mode)
+        if discard is not None:
+            await discard(result)
+
+    measurement = asyncio.ensure_future(measure())
+    _measurements.add(measurement)
+    measurement.add_done_callback(_measurements.discard)
+    return measurement
+
+
+def hedge_stats() -> Dict[str, Dict[str, Any]]:
+    """Per ``model/mode``: hedge rate, which attempt won and the latency tail."""
+    stats: Dict[str, Dict[str, Any]] = {}
+    saved = hedge_saved_histogram.snapshot()["values"]
+    for entry in first_response_histogram.snapshot()["values"]:
+        labels = entry["labels"]
+        key = f"{labels['model']}/{labels['mode']}"
+        hedged = {winner: int(hedges_counter.value(model=labels["model"], mode=labels["mode"], winner=winner))
+                  for winner in ("primary", "hedge")}
+        total_hedged = hedged["primary"] + hedged["hedge"]
+        saved_entry = next((value for value in saved if value["labels"] == labels), None)
+        stats[key] = {
+            "requests": entry["count"],
+            "hedged": total_hedged,
+            "hedge_rate": round(total_hedged / entry["count"], 3) if entry["count"] else 0.0,
+            "hedge_wins": hedged["hedge"],
+            "p50_seconds": entry["p50"],
+            "p99_seconds": entry["p99"],
+            "hedge_delay_seconds": hedge_delay(labels["model"], labels["mode"]),
+            # Measured on the sampled primaries that were left to finish
+            "saved_seconds_p50": saved_entry["p50"] if saved_entry else None,
+            "saved_seconds_p99": saved_entry["p99"] if saved_entry else None,
+        }
+    return stats
@@ -0,0 +1,231 @@
+"""
+LLM Scheduler - Priority-aware admission control in front of Ollama
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.metrics import metrics
+
+logger = get_logger(__name__)
+
+
+class Priority(IntEnum):
+    """Request priority classes; lower values are served first."""
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+_current_priority: ContextVar[Priority] = ContextVar("llm_priority", default=Priority.INTERACTIVE)
+
+
+@contextmanager
+def priority_scope(priority: Priority) -> Iterator[None]:
+    """Run every LLM call made inside the block with the given priority."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+queue_depth_gauge = metrics.gauge("llm_scheduler_queue_depth", "Requests waiting for an LLM slot")
+in_flight_gauge = metrics.gauge("llm_scheduler_in_flight", "LLM requests currently running")
+limit_gauge = metrics.gauge("llm_scheduler_concurrency_limit", "Current adaptive in-flight limit")
+wait_histogram = metrics.histogram("llm_scheduler_wait_seconds", "Time spent queued before dispatch")
+latency_histogram = metrics.histogram("llm_scheduler_request_seconds", "LLM request duration once dispatched")
+
+
+class Slot:
+    """A held in-flight slot; ``record`` marks the request as a successful generation."""
+    
+    def __init__(self):
+        self.tokens: Optional[int] = None
+        self.held: Optional[asyncio.Future] = None
+    
+    def record(self, tokens: int) -> None:
+        """The request succeeded after generating ``tokens`` tokens."""
+        self.tokens = max(1, int(tokens or 0))
+    
+    def hold_until(self, future: asyncio.Future) -> None:
+        """Keep the slot taken after the block exits, until ``future`` is done."""
+        self.held = future
+
+
+class _ModelLane:
+    """Queue and concurrency state for a single model."""
+
+    def __init__(self, model: str, max_in_flight: int, min_in_flight: int):
+        self.model = model
+        self.max_limit = max_in_flight
+        self.min_limit = min(min_in_flight, max_in_flight)
+        self.limit = max_in_flight
+        self.in_flight = 0
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        # Seconds per generated token of recent successful requests
+        self.recent_latencies: Deque[float] = deque(maxlen=settings.llm_latency_window)
+        self.latency_ewma: Optional[float] = None
+
+    def queue_depth(self, priority: Optional[Priority] = None) -> int:
+        return sum(
+            1 for prio, _, future in self.waiters
+            if not future.done() and (priority is None or prio == priority)
+        )
+
+
+class LLMScheduler:
+    """
+    Bounds in-flight LLM requests per model and serves queued requests by priority.
+
+    When adaptive concurrency is enabled the per-model limit follows observed
+    latency: it shrinks while the latency EWMA exceeds the recent baseline by
+    the configured tolerance, and grows back while requests are queueing and
+    latency stays near baseline. Latency is measured per generated token, so
+    a short field repair and a long fused generation are comparable, and only
+    requests the caller ``record``-ed as successful count: fast failures
+    (connection refused, unknown model) would otherwise set the baseline.
+    """
+
+    def __init__(self):
+        self._lanes: Dict[str, _ModelLane] = {}
+        self._sequence = itertools.count()
+
+    def _lane(self, model: str) -> _ModelLane:
+        lane = self._lanes.get(model)
+        if lane is None:
+            max_in_flight = settings.llm_model_max_in_flight.get(model, settings.llm_max_in_flight)
+            lane = self._lanes[model] = _ModelLane(model, max_in_flight, settings.llm_min_in_flight)
+            limit_gauge.set(lane.limit, model=model)
+        return lane
+
+    @asynccontextmanager
+    async def slot(self, model: str, priority: Optional[Priority] = None) -> AsyncIterator[Slot]:
+        """Hold an in-flight slot for ``model`` for the duration of the block.
+        
+        Call ``record(eval_count)`` on the yielded ``Slot`` when the request
+        succeeds; only recorded requests feed the adaptive limit. Work the
+        request leaves running (a hedged request's losing primary) keeps the
+        slot through ``hold_until``.
+        """
+        priority = _current_priority.get() if priority is None else priority
+        lane = self._lane(model)
+
+        queued_at = time.monotonic()
+        await self._acquire(lane, priority)
+        wait_histogram.observe(time.monotonic() - queued_at, model=model, priority=priority.name.lower())
+
+        started_at = time.monotonic()
+        slot = Slot()
+        completed = False
+        try:
+            yield slot
+            completed = True
+        finally:
+            latency = time.monotonic() - started_at
+            if completed:
+                latency_histogram.observe(latency, model=model)
+            sample = latency / slot.tokens if completed and slot.tokens else None
+            if slot.held is not None and not slot.held.done():
+                slot.held.add_done_callback(lambda _: self._release(lane, sample))
+            else:
+                self._release(lane, sample)
+
+    def has_capacity(self, model: str) -> bool:
+        """Whether a request for ``model`` would be dispatched without queueing."""
+        lane = self._lane(model)
+        return lane.in_flight < lane.limit and not lane.queue_depth()
+
+    async def _acquire(self, lane: _ModelLane, priority: Priority) -> None:
+        if lane.in_flight < lane.limit and not lane.queue_depth():
+            self._start(lane)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(lane.waiters, (int(priority), next(self._sequence), future))
+        self._publish_queue_depth(lane)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was granted just as we were cancelled; hand it on.
+                self._release(lane, None)
+            else:
+                future.cancel()
+            raise
+        finally:
+            self._publish_queue_depth(lane)
+
+    def _start(self, lane: _ModelLane) -> None:
+        lane.in_flight += 1
+        in_flight_gauge.set(lane.in_flight, model=lane.model)
+
+    def _release(self, lane: _ModelLane, latency: Optional[float]) -> None:
+        lane.in_flight -= 1
+        in_flight_gauge.set(lane.in_flight, model=lane.model)
+        if latency is not None and settings.llm_adaptive_concurrency:
+            self._adapt(lane, latency)
+        self._dispatch(lane)
+
+    def _dispatch(self, lane: _ModelLane) -> None:
+        while lane.waiters and lane.in_flight < lane.limit:
+            _, _, future = heapq.heappop(lane.waiters)
+            if future.done():
+                continue
+            self._start(lane)
+            future.set_result(None)
+        self._publish_queue_depth(lane)
+
+    def _adapt(self, lane: _ModelLane, latency: float) -> None:
+        """Adjust the lane's limit from a request's seconds per token (additive increase, additive decrease)."""
+        lane.recent_latencies.append(latency)
+        alpha = settings.llm_latency_ewma_alpha
+        lane.latency_ewma = latency if lane.latency_ewma is None else (
+            alpha * latency + (1 - alpha) * lane.latency_ewma
+        )
+
+        # Wait for a minimal sample before judging latency
+        if len(lane.recent_latencies) < 5:
+            return
+
+        baseline = min(lane.recent_latencies)
+        previous_limit = lane.limit
+        if lane.latency_ewma > baseline * settings.llm_latency_tolerance:
+            lane.limit = max(lane.min_limit, lane.limit - 1)
+        elif lane.queue_depth() and lane.in_flight + 1 >= lane.limit:
+            lane.limit = min(lane.max_limit, lane.limit + 1)
+
+        if lane.limit != previous_limit:
+            limit_gauge.set(lane.limit, model=lane.model)
+            logger.debug("LLM concurrency limit adjusted", model=lane.model,
+                         limit=lane.limit, latency_ewma=round(lane.latency_ewma, 3))
+
+    def _publish_queue_depth(self, lane: _ModelLane) -> None:
+        for priority in Priority:
+            queue_depth_gauge.set(lane.queue_depth(priority), model=lane.model, priority=priority.name.lower())
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-model snapshot of limits, in-flight counts and queue depth."""
+        return {
+            model: {
+                "limit": lane.limit,
+                "max_limit": lane.max_limit,
+                "in_flight": lane.in_flight,
+                "queued": {priority.name.lower(): lane.queue_depth(priority) for priority in Priority},
+                "token_latency_ewma": round(lane.latency_ewma, 5) if lane.latency_ewma is not None else None,
+            }
+            for model, lane in self._lanes.items()
+        }
+
+
+# Global scheduler instance
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,116 @@
+"""
+LLM Sessions - Keep a listing's model context between agent turns
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.metrics import metrics
+
+logger = get_logger(__name__)
+
+session_lookups = metrics.counter("llm_session_lookups_total", "Session lookups by outcome")
+session_saves = metrics.counter("llm_session_saves_total", "Session saves by outcome")
+session_tokens = metrics.histogram(
+    "llm_session_context_tokens", "Context tokens carried over per reused session",
+    buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+)
+
+
+def listing_fingerprint(title: str, description: str, bullets: List[str]) -> str:
+    """Hash of the listing content a session's context was built from."""
+    material = json.dumps([title or "", description or "", list(bullets or [])], ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMSession:
+    """Model context (Ollama ``context`` tokens) left behind by one generation."""
+
+    def __init__(self, key: str, model: str, context: List[int],
+                 backend: Optional[str], fingerprint: str):
+        self.key = key
+        self.model = model
+        self.context = context
+        self.backend = backend
+        self.fingerprint = fingerprint
+        self.created_at = time.time()
+
+    def expired(self, ttl: int) -> bool:
+        return time.time() - self.created_at > ttl
+
+
+class LLMSessionStore:
+    """
+    Bounded in-memory store of sessions keyed by listing.
+
+    The analyzer saves the context of the conversation that produced a
+    listing; the optimizer continues from it instead of re-sending and
+    re-evaluating the whole listing. A session is only handed out while the
+    listing still matches the content it was built from, and expires with
+    the model's keep-alive since the backend's KV cache is gone by then.
+    """
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, LLMSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def save(self, key: str, model: str, context: Optional[List[int]],
+             backend: Optional[str], fingerprint: str) -> bool:
+        """Keep ``context`` under ``key``; returns False when there was no context to keep."""
+        if not settings.llm_session_enabled:
+            return False
+        if not context:
+            # e.g. a generation stopped early or repaired: the next turn starts from scratch
+            session_saves.inc(outcome="no_context")
+            logger.warning("LLM session not saved: the generation returned no context", session=key, model=model)
+            return False
+        with self._lock:
+            self._sessions[key] = LLMSession(key, model, context, backend, fingerprint)
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+        session_saves.inc(outcome="saved")
+        logger.debug("LLM session saved", session=key, model=model, context_tokens=len(context))
+        return True
+
+    def get(self, key: str, model: str, fingerprint: str) -> Optional[LLMSession]:
+        """Return the session for ``key`` if it is fresh and still matches the listing."""
+        if not settings.llm_session_enabled:
+            return None
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                outcome = "miss"
+            elif session.expired(self.ttl):
+                del self._sessions[key]
+                session, outcome = None, "expired"
+            elif session.model != model or session.fingerprint != fingerprint:
+                # Listing was edited (or another model is configured) since the analysis
+                session, outcome = None, "stale"
+            else:
+                self._sessions.move_to_end(key)
+                outcome = "hit"
+
+        session_lookups.inc(outcome=outcome)
+        if session is not None:
+            session_tokens.observe(len(session.context))
+        return session
+
+    def drop(self, key: str) -> None:
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"sessions": len(self._sessions), "max_entries": self.max_entries, "ttl": self.ttl}
+
+
+# Global session store
+llm_sessions = LLMSessionStore(settings.llm_session_max_entries, settings.llm_session_ttl)
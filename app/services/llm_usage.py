@@ -0,0 +1,118 @@
+"""
+LLM Usage - Per-call token and latency accounting for Ollama generations
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from app.core.metrics import metrics
+
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+_current_call: ContextVar[Tuple[str, str]] = ContextVar("llm_call", default=("unknown", "unknown"))
+
+
+@contextmanager
+def llm_call_scope(agent: str, stage: str) -> Iterator[None]:
+    """Tag every LLM call made inside the block with the calling agent and stage."""
+    token = _current_call.set((agent, stage))
+    try:
+        yield
+    finally:
+        _current_call.reset(token)
+
+
+def current_call() -> Dict[str, str]:
+    agent, stage = _current_call.get()
+    return {"agent": agent, "stage": stage}
+
+
+calls_counter = metrics.counter("llm_calls_total", "LLM calls by agent, stage, model and outcome")
+prompt_tokens_counter = metrics.counter("llm_prompt_tokens_total", "Prompt tokens evaluated by agent and stage")
+completion_tokens_counter = metrics.counter("llm_completion_tokens_total", "Tokens generated by agent and stage")
+compute_seconds_counter = metrics.counter(
+    "llm_compute_seconds_total", "Model time (load + prompt eval + generation) by agent and stage"
+)
+prompt_tokens_histogram = metrics.histogram(
+    "llm_prompt_tokens", "Prompt tokens evaluated per call", buckets=TOKEN_BUCKETS
+)
+completion_tokens_histogram = metrics.histogram(
+    "llm_completion_tokens", "Tokens generated per call", buckets=TOKEN_BUCKETS
+)
+prompt_eval_histogram = metrics.histogram("llm_prompt_eval_seconds", "Prompt evaluation time per call")
+eval_histogram = metrics.histogram("llm_eval_seconds", "Token generation time per call")
+load_histogram = metrics.histogram("llm_load_seconds", "Model load time per call")
+total_histogram = metrics.histogram("llm_total_seconds", "Total server-side time per call")
+
+
+def _seconds(value: Any) -> float:
+    # Ollama reports durations in nanoseconds
+    return (value or 0) / 1e9
+
+
+def extract_usage(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Pull the token counts and timings out of a final Ollama response."""
+    usage = {
+        "prompt_tokens": result.get("prompt_eval_count", 0) or 0,
+        "completion_tokens": result.get("eval_count", 0) or 0,
+        "prompt_eval_seconds": _seconds(result.get("prompt_eval_duration")),
+        "eval_seconds": _seconds(result.get("eval_duration")),
+        "load_seconds": _seconds(result.get("load_duration")),
+        "total_seconds": _seconds(result.get("total_duration")),
+    }
+    if usage["eval_seconds"]:
+        usage["tokens_per_second"] = round(usage["completion_tokens"] / usage["eval_seconds"], 2)
+    return usage
+
+
+def record_usage(model: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Record metrics for one completed generation and return its usage summary."""
+    usage = extract_usage(result)
+    labels = {**current_call(), "model": model}
+
+    calls_counter.inc(outcome="ok", **labels)
+    prompt_tokens_counter.inc(usage["prompt_tokens"], **labels)
+    completion_tokens_counter.inc(usage["completion_tokens"], **labels)
+    compute_seconds_counter.inc(
+        usage["load_seconds"] + usage["prompt_eval_seconds"] + usage["eval_seconds"], **labels
+    )
+
+    prompt_tokens_histogram.observe(usage["prompt_tokens"], **labels)
+    completion_tokens_histogram.observe(usage["completion_tokens"], **labels)
+    prompt_eval_histogram.observe(usage["prompt_eval_seconds"], **labels)
+    eval_histogram.observe(usage["eval_seconds"], **labels)
+    load_histogram.observe(usage["load_seconds"], **labels)
+    if usage["total_seconds"]:
+        total_histogram.observe(usage["total_seconds"], **labels)
+    return usage
+
+
+def record_outcome(model: str, outcome: str) -> None:
+    """Count a call that produced no generation metrics (cache hit, error)."""
+    calls_counter.inc(outcome=outcome, **current_call(), model=model)
+
+
+def usage_summary() -> Dict[str, Dict[str, Any]]:
+    """Aggregate token and compute totals per ``agent/stage``, heaviest first."""
+    summary: Dict[str, Dict[str, Any]] = {}
+    for name, counter in (
+        ("calls", calls_counter),
+        ("prompt_tokens", prompt_tokens_counter),
+        ("completion_tokens", completion_tokens_counter),
+        ("compute_seconds", compute_seconds_counter),
+    ):
+        for entry in counter.snapshot()["values"]:
+            labels = entry["labels"]
+            if name == "calls" and labels.get("outcome") != "ok":
+                continue
+            key = f"{labels.get('agent')}/{labels.get('stage')}"
+            row = summary.setdefault(key, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                           "compute_seconds": 0.0})
+            row[name] += entry["value"]
+
+    for row in summary.values():
+        for name in ("calls", "prompt_tokens", "completion_tokens"):
+            row[name] = int(row[name])
+        row["compute_seconds"] = round(row["compute_seconds"], 3)
+    return dict(sorted(summary.items(), key=lambda item: item[1]["compute_seconds"], reverse=True))
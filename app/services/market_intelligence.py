@@ -9,15 +9,22 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime
 import hashlib
 from app.services.ollama_client import OllamaClient
+from app.services.embeddings import EmbeddingService
+from app.services.llm_usage import llm_call_scope
 from app.services.web_search import WebSearchService
 from app.core.config import settings
+from app.core.deadline import allow_optional, deadline_expired
+from app.schemas.llm import CompetitiveInsights
+from pydantic import ValidationError
 
 class MarketIntelligence:
     """Advanced market analysis and competitive intelligence"""
     
-    def __init__(self):
-        self.ollama = OllamaClient()
-        self.web_search = WebSearchService()
+    def __init__(self, ollama: Optional[OllamaClient] = None, embeddings: Optional[EmbeddingService] = None,
+                 web_search: Optional[WebSearchService] = None):
+        self.ollama = ollama or OllamaClient()
+        self.embeddings = embeddings or EmbeddingService(ollama=self.ollama)
+        self.web_search = web_search or WebSearchService()
         
         # Price extraction patterns
         self.price_patterns = {
@@ -45,12 +52,23 @@ class MarketIntelligence:
             'performance': ['procesador', 'cpu', 'gpu', 'ram', 'ghz', 'cores']
         }
     
-    async def analyze_market_competition(self, title: str, description: str, max_competitors: int = 10) -> Dict[str, Any]:
-        """Comprehensive competitive analysis"""
+    async def analyze_market_competition(self, title: str, description: str, max_competitors: int = 10,
+                                         include_insights: bool = True) -> Dict[str, Any]:
+        """Comprehensive competitive analysis
+        
+        With ``include_insights=False`` the AI competitive insights are left
+        empty so the caller can generate them elsewhere and add them with
+        ``apply_competitive_insights``. Like competitor research, a result that
+        includes simulated competitors or searches cut by the deadline is
+        marked ``"degraded": True`` so it is not stored or cached as real analysis.
+        """
         
         try:
             # Search for competitors
             competitors = await self._find_competitors(title, description, max_competitors)
+            degraded = deadline_expired() or any(
+                competitor.get("source") == "simulated" for competitor in competitors
+            )
             
             # Analyze pricing strategies
             pricing_analysis = self._analyze_pricing_strategies(competitors)
@@ -64,14 +82,19 @@ class MarketIntelligence:
             # Identify market gaps
             market_gaps = self._identify_market_gaps(competitors, feature_analysis)
             
-            # Generate competitive insights
-            insights = await self._generate_competitive_insights(title, description, competitors, feature_analysis)
+            # Generate competitive insights (an optional LLM call, skipped when the deadline is close)
+            insights = (
+                await self._generate_competitive_insights(title, description, competitors, feature_analysis)
+                if include_insights and allow_optional("competitive_insights", settings.deadline_min_llm_seconds)
+                else []
+            )
             
             # Brand analysis
             brand_analysis = self._analyze_brand_landscape(competitors)
             
             return {
                 "success": True,
+                "degraded": degraded,
                 "data": {
                     "competitors_analyzed": len(competitors),
                     "competitors": competitors,
@@ -92,6 +115,15 @@ class MarketIntelligence:
                 "data": None
             }
     
+    def apply_competitive_insights(self, market_analysis: Dict[str, Any], insights: List[str]) -> Dict[str, Any]:
+        """Merge externally generated competitive insights into a market analysis"""
+        
+        if market_analysis.get("success"):
+            market_analysis["data"]["competitive_insights"] = [
+                insight for insight in insights if len(insight.strip()) > 10
+            ]
+        return market_analysis
+    
     async def _find_competitors(self, title: str, description: str, max_competitors: int) -> List[Dict[str, Any]]:
         """Find competitor products using web search"""
         
@@ -100,14 +132,18 @@ class MarketIntelligence:
         
         competitors = []
         
-        for search_term in search_terms[:3]:  # Search with top 3 terms
+        # Search with top 3 terms, all in parallel
+        search_terms = search_terms[:3]
+        all_results = await self.web_search.search_many(
+            [(f"{search_term} amazon precio", max_competitors) for search_term in search_terms]
+        )
+        
+        relevances = await self._score_relevance(search_terms, all_results)
+        
+        for search_term, results, scores in zip(search_terms, all_results, relevances):
             try:
-                # Search for competitors
-                search_query = f"{search_term} amazon precio"
-                results = await self.web_search.search(search_query, max_results=max_competitors)
-                
-                for result in results:
-                    competitor = self._process_competitor_result(result, search_term)
+                for result, relevance in zip(results, scores):
+                    competitor = self._process_competitor_result(result, search_term, relevance)
                     if competitor and len(competitors) < max_competitors:
                         competitors.append(competitor)
                 
@@ -117,7 +153,7 @@ class MarketIntelligence:
                     competitors.extend(simulated)
                 
             except Exception as e:
-                print(f"Error searching for term '{search_term}': {e}")
+                print(f"Error processing results for term '{search_term}': {e}")
         
         return competitors[:max_competitors]
     
@@ -149,7 +185,33 @@ class MarketIntelligence:
         
         return search_terms[:15]
     
-    def _process_competitor_result(self, result: Dict, search_term: str) -> Optional[Dict[str, Any]]:
+    async def _score_relevance(self, search_terms: List[str],
+                               all_results: List[List[Dict[str, Any]]]) -> List[List[Optional[float]]]:
+        """Embedding similarity of every result to its search term, in one batch
+        
+        Scores are None when embeddings are unavailable, leaving each result to
+        the keyword-overlap heuristic in ``_calculate_relevance``.
+        """
+        
+        texts = [f"{result.get('title', '')} {result.get('snippet', '')}" for results in all_results for result in results]
+        similarity = None
+        if texts and self.embeddings.enabled:
+            with llm_call_scope("market_intelligence", "competitor_relevance"):
+                similarity = await self.embeddings.similarity(search_terms, texts)
+        
+        scores = []
+        offset = 0
+        for row, results in enumerate(all_results):
+            if similarity is None:
+                scores.append([None] * len(results))
+            else:
+                scores.append([round(max(0.0, float(value)), 2)
+                               for value in similarity[row, offset:offset + len(results)]])
+            offset += len(results)
+        return scores
+    
+    def _process_competitor_result(self, result: Dict, search_term: str,
+                                   relevance: Optional[float] = None) -> Optional[Dict[str, Any]]:
         """Process a search result into competitor data"""
         
         try:
@@ -166,8 +228,9 @@ class MarketIntelligence:
             # Extract features
             features = self._extract_features_from_text(f"{title} {snippet}")
             
-            # Estimate relevance
-            relevance = self._calculate_relevance(title + " " + snippet, search_term)
+            # Estimate relevance unless an embedding score was provided
+            if relevance is None:
+                relevance = self._calculate_relevance(title + " " + snippet, search_term)
             
             return {
                 "title": title,
@@ -584,7 +647,7 @@ class MarketIntelligence:
         system_prompt = """Eres un experto en análisis competitivo y marketing para Amazon España.
         Genera insights accionables basados en el análisis de la competencia.
         
-        IMPORTANTE: Responde SOLO con un JSON array de strings con insights específicos."""
+        IMPORTANTE: Responde SOLO con un objeto JSON con la lista "insights" de insights específicos."""
         
         competitor_summary = {
             "competitor_count": len(competitors),
@@ -604,29 +667,27 @@ class MarketIntelligence:
         4. Ventajas competitivas
         5. Recomendaciones de marketing
         
-        Formato: ["insight 1", "insight 2", "insight 3", "insight 4", "insight 5"]
+        Formato: {{"insights": ["insight 1", "insight 2", "insight 3", "insight 4", "insight 5"]}}
         """
         
+        profile = settings.llm_profile("competitive_insights")
+        
         try:
-            result = await self.ollama.generate(
-                model=settings.ollama_model,
-                prompt=prompt,
-                system_prompt=system_prompt
-            )
+            with llm_call_scope("market_intelligence", "competitive_insights"):
+                result = await self.ollama.generate(
+                    model=profile.model,
+                    prompt=prompt,
+                    system_prompt=system_prompt,
+                    options=profile.options(),
+                    schema=CompetitiveInsights
+                )
             
             if result["success"]:
-                response_text = result["response"].strip()
-                
-                if "[" in response_text and "]" in response_text:
-                    start = response_text.find("[")
-                    end = response_text.rfind("]") + 1
-                    json_text = response_text[start:end]
-                    
-                    try:
-                        insights = json.loads(json_text)
-                        return [insight for insight in insights if isinstance(insight, str) and len(insight.strip()) > 10]
-                    except json.JSONDecodeError:
-                        pass
+                try:
+                    insights = CompetitiveInsights.model_validate_json(result["response"]).insights
+                    return [insight for insight in insights if len(insight.strip()) > 10]
+                except ValidationError:
+                    pass
             
             # Fallback insights
             return [
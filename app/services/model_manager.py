@@ -0,0 +1,141 @@
+"""
+Model Manager - Keeps configured Ollama models warm and resident
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logger import LoggerMixin
+from app.core.metrics import metrics
+from app.services.ollama_client import OllamaClient
+from app.services.ollama_pool import ollama_pool
+
+load_latency_histogram = metrics.histogram("ollama_model_load_seconds", "Wall-clock time to load a model")
+load_duration_histogram = metrics.histogram("ollama_model_load_duration_seconds", "Load time reported by Ollama")
+resident_gauge = metrics.gauge("ollama_model_resident", "1 when the model is loaded in Ollama memory")
+reload_counter = metrics.counter("ollama_model_reloads_total", "Warm-up loads by reason")
+
+
+def _normalize_model_name(name: str) -> str:
+    return name if ":" in name else f"{name}:latest"
+
+
+class ModelResidencyManager(LoggerMixin):
+    """
+    Preloads the configured models at startup and keeps them resident.
+
+    A background loop polls ``/api/ps`` on every backend and reloads any
+    configured model that Ollama has unloaded, so user requests do not pay
+    the cold-start cost.
+    """
+
+    def __init__(self, backend_urls: Optional[List[str]] = None, models: Optional[List[str]] = None):
+        urls = backend_urls or [backend.url for backend in ollama_pool.backends]
+        self.clients = {url: OllamaClient(url) for url in urls}
+        # Only the main model by default: on a single GPU, keeping every profile's
+        # model resident makes them evict each other and the loop reload them forever
+        self.models = models or settings.ollama_warmup_models or [settings.ollama_model]
+        self._task: Optional[asyncio.Task] = None
+        self._status: Dict[str, Dict[str, Dict[str, Any]]] = {
+            url: {
+                model: {"resident": False, "last_load_seconds": None, "last_checked": None}
+                for model in self.models
+            }
+            for url in urls
+        }
+
+    async def start(self) -> None:
+        """Start the warm-up and residency loop in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the residency loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        await asyncio.gather(*(
+            self.warm_model(url, model, reason="startup")
+            for url in self.clients for model in self.models
+        ))
+
+        while True:
+            await asyncio.sleep(settings.ollama_residency_check_interval)
+            try:
+                await self.ensure_resident()
+            except Exception as e:
+                self.log_operation_error("model_residency_check", e)
+
+    async def warm_model(self, url: str, model: str, reason: str = "manual") -> Optional[float]:
+        """Load ``model`` on backend ``url`` and return the observed load latency in seconds."""
+        started_at = time.monotonic()
+        # Load with the context size requests will use, or the first request reloads it
+        result = await self.clients[url].load_model(model, options={"num_ctx": settings.model_num_ctx(model)})
+        elapsed = time.monotonic() - started_at
+
+        if not result["success"]:
+            self.logger.warning("Model warm-up failed", backend=url, model=model,
+                                reason=reason, error=result.get("error"))
+            self._set_resident(url, model, False)
+            return None
+
+        load_latency_histogram.observe(elapsed, model=model, backend=url)
+        load_duration_histogram.observe(result.get("load_duration", 0.0), model=model, backend=url)
+        reload_counter.inc(model=model, backend=url, reason=reason)
+        self._status[url][model]["last_load_seconds"] = round(elapsed, 3)
+        self._set_resident(url, model, True)
+
+        self.logger.info("Model warmed", backend=url, model=model, reason=reason, load_seconds=round(elapsed, 3))
+        return elapsed
+
+    async def ensure_resident(self) -> List[str]:
+        """Reload configured models missing from a backend's ``/api/ps``; returns ``model@backend`` reloaded."""
+        reloaded = []
+        for url, client in self.clients.items():
+            backend = ollama_pool.get(url)
+            if backend is not None and not backend.healthy:
+                continue
+
+            running = await client.list_running_models()
+            if not running["success"]:
+                self.logger.warning("Could not query running models", backend=url, error=running.get("error"))
+                continue
+
+            loaded = {
+                _normalize_model_name(entry.get("name") or entry.get("model", ""))
+                for entry in running["models"]
+            }
+
+            for model in self.models:
+                self._status[url][model]["last_checked"] = time.time()
+                if _normalize_model_name(model) in loaded:
+                    self._set_resident(url, model, True)
+                    continue
+
+                self._set_resident(url, model, False)
+                if await self.warm_model(url, model, reason="evicted") is not None:
+                    reloaded.append(f"{model}@{url}")
+
+        return reloaded
+
+    def _set_resident(self, url: str, model: str, resident: bool) -> None:
+        self._status[url][model]["resident"] = resident
+        resident_gauge.set(1 if resident else 0, model=model, backend=url)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            url: {model: dict(status) for model, status in models.items()}
+            for url, models in self._status.items()
+        }
+
+
+# Global manager instance
+model_manager = ModelResidencyManager()
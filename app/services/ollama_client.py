@@ -1,34 +1,499 @@
 import asyncio
 import aiohttp
+import numpy as np
 import json
-from typing import Dict, Any, Optional
+import hashlib
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Dict, Any, List, Optional, AsyncIterator, Iterable, Tuple, Type, Union
+from pydantic import BaseModel
+from app.core.config import settings
+from app.core.deadline import client_timeout, deadline_expired
+from app.core.disk_cache import DiskCache
+from app.core.http import http_transport
+from app.core.singleflight import SingleFlight
+from app.services.llm_scheduler import llm_scheduler, Priority
+from app.services.llm_hedging import hedged_call
+from app.services.json_stream import JSONObjectStream, early_stops_counter
+from app.services.llm_usage import record_usage, record_outcome
+from app.services.ollama_pool import ollama_pool
 
-class OllamaClient:
-    def __init__(self, base_url: str = "http://localhost:11434"):
+# Shared across client instances so duplicates coalesce across requests
+_generate_flights = SingleFlight("ollama_generate")
+
+# Persistent store of completed generations
+llm_response_cache = DiskCache(
+    "llm_responses",
+    settings.llm_cache_path,
+    max_bytes=settings.llm_cache_max_bytes,
+    ttl=settings.llm_cache_ttl
+)
+
+
+def request_key(payload: Dict[str, Any]) -> str:
+    """Stable hash of everything that determines a generation's output"""
+    material = {key: value for key, value in payload.items() if key not in ("stream", "keep_alive")}
+    encoded = json.dumps(material, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class _OpenStream:
+    """A streaming response that has produced its first line, plus what it holds open"""
+    
+    def __init__(self, resources: AsyncExitStack, response: aiohttp.ClientResponse, base_url: str):
+        self.resources = resources
+        self.response = response
         self.base_url = base_url
+        self._first_line: Optional[bytes] = None
+    
+    async def read_first_line(self) -> None:
+        async for line in self.response.content:
+            line = line.strip()
+            if line:
+                self._first_line = line
+                return
+    
+    async def lines(self) -> AsyncIterator[bytes]:
+        """Non-empty lines, starting with the one already read"""
+        if self._first_line is not None:
+            yield self._first_line
+        async for line in self.response.content:
+            line = line.strip()
+            if line:
+                yield line
+    
+    async def close(self) -> None:
+        await self.resources.aclose()
+
+
+class OllamaClient:
+    def __init__(self, base_url: Optional[str] = None):
+        # Without an explicit base_url, requests are routed across the backend pool
+        self.base_url = base_url.rstrip("/") if base_url else None
+    
+    @asynccontextmanager
+    async def _backend(self, exclude: Iterable[str] = (), prefer: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield the base URL to use for one request"""
+        if self.base_url:
+            yield self.base_url
+            return
+        
+        async with ollama_pool.lease(exclude=exclude, prefer=prefer) as backend:
+            yield backend.url
+    
+    async def generate(self, model: str, prompt: str, system_prompt: Optional[str] = None,
+                       options: Optional[Dict[str, Any]] = None,
+                       format: Optional[Union[str, Dict[str, Any]]] = None,
+                       priority: Optional[Priority] = None,
+                       use_cache: bool = True,
+                       context: Optional[List[int]] = None,
+                       backend: Optional[str] = None,
+                       schema: Optional[Type[BaseModel]] = None,
+                       keep_context: bool = False) -> Dict[str, Any]:
+        """Generate text using Ollama API
+        
+        ``format`` takes ``"json"`` or a JSON schema to constrain the output.
+        ``schema`` constrains the output to that model instead; the generation
+        is then streamed internally and stopped as soon as the JSON object is
+        complete or one of its fields fails validation (see ``JSONObjectStream``).
+        A generation stopped early has no ``context``: pass ``keep_context``
+        to read a complete object to the end so the result carries it.
+        ``context`` continues from a previous generation's returned ``context``;
+        ``backend`` routes the request to that generation's host when healthy so
+        its KV cache can be reused.
+        Successful generations are kept in a persistent response cache keyed by
+        model, system prompt, prompt and options; pass ``use_cache=False`` to
+        force a fresh generation. Concurrent calls with the same key are
+        coalesced into a single upstream generation and share its result.
+        """
+        if schema is not None:
+            format = format or schema.model_json_schema()
+        payload = self._build_generate_payload(model, prompt, system_prompt, options, format, context, stream=False)
+        key = request_key(payload)
+        use_cache = use_cache and settings.llm_cache_enabled
+        
+        if use_cache:
+            cached = await llm_response_cache.aget_json(key)
+            # An entry stopped early has no context to give a caller that needs one
+            if cached is not None and (cached.get("context") or not keep_context):
+                record_outcome(model, "cached")
+                return {**cached, "cached": True}
+        
+        result = await _generate_flights.do(
+            f"{key}:context" if keep_context else key,
+            lambda: self._generate_and_store(key, payload, priority, use_cache, backend, schema, keep_context)
+        )
+        return dict(result)
+    
+    async def _generate_and_store(self, key: str, payload: Dict[str, Any], priority: Optional[Priority],
+                                  use_cache: bool, backend: Optional[str] = None,
+                                  schema: Optional[Type[BaseModel]] = None,
+                                  keep_context: bool = False) -> Dict[str, Any]:
+        result = await self._request_generate(payload, priority, backend, schema, keep_context)
+        if use_cache and result["success"]:
+            await llm_response_cache.aset_json(key, result)
+        return result
     
-    async def generate(self, model: str, prompt: str, system_prompt: Optional[str] = None) -> Dict[str, Any]:
-        """Generate text using Ollama API"""
-        url = f"{self.base_url}/api/generate"
+    async def _request_generate(self, payload: Dict[str, Any], priority: Optional[Priority],
+                                prefer: Optional[str] = None,
+                                schema: Optional[Type[BaseModel]] = None,
+                                keep_context: bool = False) -> Dict[str, Any]:
+        """Send a non-streaming generate request, failing over to another backend on connection errors
+        
+        With hedging enabled, a request that is slower than recent ones is also
+        sent to a second backend and the first successful response is used.
+        """
+        model = payload["model"]
+        attempts = 1 if self.base_url else max(1, len(ollama_pool))
+        tried: List[str] = []
+        last_error = None
+        
+        async with llm_scheduler.slot(model, priority) as slot:
+            for _ in range(attempts):
+                if deadline_expired():
+                    # Time spent queued (or on failed backends) used up the request's deadline
+                    record_outcome(model, "timeout")
+                    return {"success": False, "error": "Deadline exceeded before the request was sent"}
+                try:
+                    status, body, base_url = await hedged_call(
+                        model, "generate",
+                        primary=lambda: self._post_generate(payload, tried, None if tried else prefer, schema,
+                                                            keep_context),
+                        hedge=lambda: self._post_hedge(payload, tried, priority, schema, keep_context),
+                        can_hedge=lambda: self._can_hedge(tried, model),
+                        accept=lambda response: response[0] == 200,
+                        keep_running=slot.hold_until
+                    )
+                    if status == 200 and body.get("invalid"):
+                        record_outcome(model, "invalid_output")
+                        return {
+                            "success": False,
+                            "error": body["invalid"],
+                            "partial": body.get("partial")
+                        }
+                    if status == 200:
+                        slot.record(body.get("eval_count", 0))
+                        return {
+                            "success": True,
+                            "response": body.get("response", ""),
+                            "model": body.get("model", model),
+                            "usage": record_usage(model, body),
+                            "context": body.get("context"),
+                            "backend": base_url
+                        }
+                    else:
+                        record_outcome(model, "error")
+                        return {
+                            "success": False,
+                            "error": f"HTTP {status}: {body}"
+                        }
+                except aiohttp.ClientConnectionError as e:
+                    last_error = e
+                except asyncio.TimeoutError:
+                    record_outcome(model, "timeout")
+                    return {
+                        "success": False,
+                        "error": "Timed out waiting for the model"
+                    }
+                except Exception as e:
+                    record_outcome(model, "error")
+                    return {
+                        "success": False,
+                        "error": f"Connection error: {str(e)}"
+                    }
         
+        record_outcome(model, "error")
+        return {
+            "success": False,
+            "error": f"Connection error: {str(last_error)}"
+        }
+    
+    async def _post_generate(self, payload: Dict[str, Any], tried: List[str],
+                             prefer: Optional[str] = None,
+                             schema: Optional[Type[BaseModel]] = None,
+                             keep_context: bool = False) -> Tuple[int, Any, str]:
+        """POST one generate request; returns (status, JSON body or error text, base URL)
+        
+        With a ``schema`` (and early stop enabled) the generation is streamed and
+        read into the same body by ``_read_json_stream``.
+        """
+        streamed = schema is not None and settings.llm_json_early_stop
+        async with self._backend(exclude=tried, prefer=prefer) as base_url:
+            tried.append(base_url)
+            session = await http_transport.get_session()
+            async with session.post(f"{base_url}/api/generate", json={**payload, "stream": True} if streamed else payload,
+                                    timeout=client_timeout(settings.ollama_timeout)) as response:
+                if response.status != 200:
+                    return response.status, await response.text(), base_url
+                if streamed:
+                    return response.status, await self._read_json_stream(response, payload["model"], schema,
+                                                                           keep_context), base_url
+                return response.status, await response.json(), base_url
+    
+    async def _read_json_stream(self, response: aiohttp.ClientResponse, model: str,
+                                schema: Type[BaseModel], keep_context: bool = False) -> Dict[str, Any]:
+        """Read a streamed generation into a non-streaming response body, stopping early when possible
+        
+        Returning before the final chunk closes the connection, which makes
+        Ollama stop generating. A body stopped early has no final stats or
+        context; its ``eval_count`` is the number of chunks (one token each).
+        With ``keep_context`` a complete object is read to the final chunk instead.
+        An invalid output comes back as ``{"invalid": reason, "partial": valid fields}``.
+        """
+        parser = JSONObjectStream(schema)
+        parts: List[str] = []
+        chunks = 0
+        async for line in response.content:
+            if not line.strip():
+                continue
+            chunk = json.loads(line)
+            if chunk.get("error"):
+                return {"invalid": chunk["error"]}
+            
+            chunks += 1
+            parts.append(parser.feed(chunk.get("response", "")))
+            if chunk.get("done"):
+                parser.finish()
+                if parser.error:
+                    return {"invalid": parser.error, "partial": parser.fields}
+                return {**chunk, "response": "".join(parts)}
+            if parser.should_stop() and (parser.error or not keep_context):
+                reason = "invalid_output" if parser.error else "object_complete"
+                early_stops_counter.inc(model=model, reason=reason)
+                if parser.error:
+                    return {"invalid": parser.error, "partial": parser.fields}
+                return {"model": chunk.get("model", model), "response": "".join(parts), "eval_count": chunks}
+        
+        parser.finish()
+        if parser.error:
+            return {"invalid": parser.error, "partial": parser.fields}
+        return {"model": model, "response": "".join(parts), "eval_count": chunks}
+    
+    async def _post_hedge(self, payload: Dict[str, Any], tried: List[str], priority: Optional[Priority],
+                          schema: Optional[Type[BaseModel]] = None,
+                          keep_context: bool = False) -> Tuple[int, Any, str]:
+        """``_post_generate`` for a hedge, which holds a scheduler slot of its own"""
+        async with llm_scheduler.slot(payload["model"], priority):
+            return await self._post_generate(payload, tried, schema=schema, keep_context=keep_context)
+    
+    def _can_hedge(self, tried: List[str], model: str) -> bool:
+        """Whether the scheduler has a free slot for ``model`` and another healthy,
+        lightly loaded backend can take a hedge"""
+        if self.base_url or not llm_scheduler.has_capacity(model):
+            return False
+        return any(
+            backend.healthy and backend.url not in tried
+            and backend.in_flight < settings.llm_hedge_max_backend_in_flight
+            for backend in ollama_pool.backends
+        )
+    
+    def _build_generate_payload(self, model: str, prompt: str, system_prompt: Optional[str],
+                                options: Optional[Dict[str, Any]],
+                                format: Optional[Union[str, Dict[str, Any]]],
+                                context: Optional[List[int]], stream: bool) -> Dict[str, Any]:
+        """Build the /api/generate request body"""
         payload = {
             "model": model,
             "prompt": prompt,
-            "stream": False
+            "stream": stream
         }
         
         if system_prompt:
             payload["system"] = system_prompt
         
+        if options:
+            payload["options"] = options
+        
+        if format:
+            payload["format"] = format
+        
+        if context:
+            payload["context"] = context
+        
+        if settings.ollama_keep_alive:
+            payload["keep_alive"] = settings.ollama_keep_alive
+        
+        return payload
+    
+    async def generate_stream(self, model: str, prompt: str, system_prompt: Optional[str] = None,
+                              options: Optional[Dict[str, Any]] = None,
+                              format: Optional[Union[str, Dict[str, Any]]] = None,
+                              priority: Optional[Priority] = None,
+                              context: Optional[List[int]] = None,
+                              backend: Optional[str] = None,
+                              schema: Optional[Type[BaseModel]] = None,
+                              keep_context: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """Stream generated text chunks from Ollama API as they are produced
+        
+        With hedging enabled, a stream whose first token is slower than recent
+        ones is also opened on a second backend; the first to produce a token
+        is streamed and the other is closed.
+        
+        With a ``schema`` the output is constrained to it and parsed as it
+        arrives: nothing after the JSON object is streamed, the generation is
+        stopped shortly after the object completes (the final chunk then has
+        ``stopped_early`` and no context, unless ``keep_context`` asks to read
+        on to the final chunk), and a field that fails validation ends the
+        stream with an error right away (with the valid fields parsed so far
+        under ``partial``).
+        """
+        if schema is not None:
+            format = format or schema.model_json_schema()
+        payload = self._build_generate_payload(model, prompt, system_prompt, options, format, context, stream=True)
+        parser = JSONObjectStream(schema) if schema is not None and settings.llm_json_early_stop else None
+        chunks = 0
+        tried: List[str] = []
+        
+        try:
+            async with llm_scheduler.slot(model, priority) as slot:
+                if deadline_expired():
+                    record_outcome(model, "timeout")
+                    yield {
+                        "success": False,
+                        "error": "Deadline exceeded before the request was sent"
+                    }
+                    return
+                
+                stream = await hedged_call(
+                    model, "stream",
+                    primary=lambda: self._open_stream(payload, tried, backend),
+                    hedge=lambda: self._open_stream(payload, tried, hedge=True, priority=priority),
+                    can_hedge=lambda: self._can_hedge(tried, model),
+                    accept=lambda opened: opened.response.status == 200,
+                    discard=lambda opened: opened.close(),
+                    keep_running=slot.hold_until
+                )
+                
+                async with stream.resources:
+                    response, base_url = stream.response, stream.base_url
+                    if response.status != 200:
+                        error_text = await response.text()
+                        yield {
+                            "success": False,
+                            "error": f"HTTP {response.status}: {error_text}"
+                        }
+                        return
+                    
+                    # Ollama streams newline-delimited JSON objects
+                    async for line in stream.lines():
+                        chunk = json.loads(line)
+                        if chunk.get("error"):
+                            record_outcome(model, "error")
+                            yield {
+                                "success": False,
+                                "error": chunk["error"]
+                            }
+                            return
+                        
+                        chunks += 1
+                        text = chunk.get("response", "")
+                        data = {
+                            "success": True,
+                            "response": parser.feed(text) if parser else text,
+                            "done": chunk.get("done", False),
+                            "model": chunk.get("model", model)
+                        }
+                        if parser and chunk.get("done"):
+                            parser.finish()
+                        
+                        # The final chunk carries the token counts and timings
+                        if chunk.get("done"):
+                            slot.record(chunk.get("eval_count", chunks))
+                            data["usage"] = record_usage(model, chunk)
+                            data["context"] = chunk.get("context")
+                            data["backend"] = base_url
+                        
+                        if parser and parser.error:
+                            early_stops_counter.inc(model=model, reason="invalid_output")
+                            record_outcome(model, "invalid_output")
+                            yield {
+                                "success": False,
+                                "error": parser.error,
+                                "partial": parser.fields
+                            }
+                            return
+                        
+                        yield data
+                        
+                        if chunk.get("done"):
+                            return
+                        
+                        if parser and parser.should_stop() and not keep_context:
+                            # Leaving the response unread closes the connection, which stops the generation
+                            early_stops_counter.inc(model=model, reason="object_complete")
+                            slot.record(chunks)
+                            yield {
+                                "success": True,
+                                "response": "",
+                                "done": True,
+                                "model": chunk.get("model", model),
+                                "usage": record_usage(model, {"eval_count": chunks}),
+                                "context": None,
+                                "backend": base_url,
+                                "stopped_early": True
+                            }
+                            return
+        except asyncio.TimeoutError:
+            record_outcome(model, "timeout")
+            yield {
+                "success": False,
+                "error": "Timed out waiting for the model"
+            }
+        except Exception as e:
+            record_outcome(model, "error")
+            yield {
+                "success": False,
+                "error": f"Connection error: {str(e)}"
+            }
+    
+    async def _open_stream(self, payload: Dict[str, Any], tried: List[str],
+                           prefer: Optional[str] = None, hedge: bool = False,
+                           priority: Optional[Priority] = None) -> "_OpenStream":
+        """Open a streaming generate request and wait for its first line (the first token)
+        
+        A ``hedge`` holds a scheduler slot of its own until the stream is closed.
+        """
+        resources = AsyncExitStack()
+        try:
+            if hedge:
+                await resources.enter_async_context(llm_scheduler.slot(payload["model"], priority))
+            base_url = await resources.enter_async_context(self._backend(exclude=tried, prefer=prefer))
+            tried.append(base_url)
+            session = await http_transport.get_session()
+            response = await resources.enter_async_context(
+                session.post(f"{base_url}/api/generate", json=payload,
+                             timeout=client_timeout(settings.ollama_timeout))
+            )
+            stream = _OpenStream(resources, response, base_url)
+            if response.status == 200:
+                await stream.read_first_line()
+            return stream
+        except BaseException as e:
+            # Also runs when a losing hedge is cancelled: release its connection and backend lease
+            await resources.__aexit__(type(e), e, e.__traceback__)
+            raise
+    
+    async def chat(self, model: str, messages: list, priority: Optional[Priority] = None) -> Dict[str, Any]:
+        """Chat using Ollama API"""
+        
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": False
+        }
+        
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload) as response:
+            async with llm_scheduler.slot(model, priority) as slot, self._backend() as base_url:
+                session = await http_transport.get_session()
+                async with session.post(f"{base_url}/api/chat", json=payload,
+                                        timeout=client_timeout(settings.ollama_timeout)) as response:
                     if response.status == 200:
                         result = await response.json()
+                        slot.record(result.get("eval_count", 0))
                         return {
                             "success": True,
-                            "response": result.get("response", ""),
-                            "model": result.get("model", model)
+                            "message": result.get("message", {}),
+                            "model": result.get("model", model),
+                            "usage": record_usage(model, result)
                         }
                     else:
                         error_text = await response.text()
@@ -42,33 +507,46 @@ class OllamaClient:
                 "error": f"Connection error: {str(e)}"
             }
     
-    async def chat(self, model: str, messages: list) -> Dict[str, Any]:
-        """Chat using Ollama API"""
-        url = f"{self.base_url}/api/chat"
+    async def embed(self, model: str, input: Union[str, List[str]], truncate: bool = True,
+                    priority: Optional[Priority] = None) -> Dict[str, Any]:
+        """Embed one text or a batch of texts in a single /api/embed call
         
+        ``embeddings`` is a float32 NumPy array with one row per input, in order.
+        """
+        texts = [input] if isinstance(input, str) else list(input)
         payload = {
             "model": model,
-            "messages": messages,
-            "stream": False
+            "input": texts,
+            "truncate": truncate
         }
         
+        if settings.ollama_keep_alive:
+            payload["keep_alive"] = settings.ollama_keep_alive
+        
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload) as response:
+            async with llm_scheduler.slot(model, priority) as slot, self._backend() as base_url:
+                session = await http_transport.get_session()
+                async with session.post(f"{base_url}/api/embed", json=payload,
+                                        timeout=client_timeout(settings.ollama_timeout)) as response:
                     if response.status == 200:
                         result = await response.json()
+                        # Embeddings generate nothing; their cost follows the input tokens
+                        slot.record(result.get("prompt_eval_count", len(texts)))
                         return {
                             "success": True,
-                            "message": result.get("message", {}),
-                            "model": result.get("model", model)
+                            "embeddings": np.asarray(result.get("embeddings", []), dtype=np.float32),
+                            "model": result.get("model", model),
+                            "usage": record_usage(model, result)
                         }
                     else:
                         error_text = await response.text()
+                        record_outcome(model, "error")
                         return {
                             "success": False,
                             "error": f"HTTP {response.status}: {error_text}"
                         }
         except Exception as e:
+            record_outcome(model, "error")
             return {
                 "success": False,
                 "error": f"Connection error: {str(e)}"
@@ -76,11 +554,11 @@ class OllamaClient:
     
     async def list_models(self) -> Dict[str, Any]:
         """List available models"""
-        url = f"{self.base_url}/api/tags"
-        
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
+            async with self._backend() as base_url:
+                session = await http_transport.get_session()
+                async with session.get(f"{base_url}/api/tags",
+                                       timeout=client_timeout(settings.ollama_health_check_timeout)) as response:
                     if response.status == 200:
                         result = await response.json()
                         return {
@@ -97,4 +575,68 @@ class OllamaClient:
             return {
                 "success": False,
                 "error": f"Connection error: {str(e)}"
-            }
\ No newline at end of file
+            }
+    
+    async def list_running_models(self) -> Dict[str, Any]:
+        """List models currently loaded in memory"""
+        try:
+            async with self._backend() as base_url:
+                session = await http_transport.get_session()
+                async with session.get(f"{base_url}/api/ps",
+                                       timeout=client_timeout(settings.ollama_health_check_timeout)) as response:
+                    if response.status == 200:
+                        result = await response.json()
+                        return {
+                            "success": True,
+                            "models": result.get("models", [])
+                        }
+                    else:
+                        error_text = await response.text()
+                        return {
+                            "success": False,
+                            "error": f"HTTP {response.status}: {error_text}"
+                        }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"Connection error: {str(e)}"
+            }
+    
+    async def load_model(self, model: str, keep_alive: Optional[str] = None,
+                         options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Load a model into memory without generating (empty prompt request)"""
+        
+        payload = {
+            "model": model,
+            "prompt": "",
+            "stream": False,
+            "keep_alive": keep_alive or settings.ollama_keep_alive
+        }
+        
+        if options:
+            payload["options"] = options
+        
+        try:
+            # Loading competes with generation for the GPU; queue it as background work
+            async with llm_scheduler.slot(model, Priority.BATCH), self._backend() as base_url:
+                session = await http_transport.get_session()
+                async with session.post(f"{base_url}/api/generate", json=payload,
+                                        timeout=client_timeout(settings.ollama_timeout)) as response:
+                    if response.status == 200:
+                        result = await response.json()
+                        return {
+                            "success": True,
+                            "model": result.get("model", model),
+                            "load_duration": result.get("load_duration", 0) / 1e9
+                        }
+                    else:
+                        error_text = await response.text()
+                        return {
+                            "success": False,
+                            "error": f"HTTP {response.status}: {error_text}"
+                        }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"Connection error: {str(e)}"
+            }
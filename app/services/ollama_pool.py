@@ -0,0 +1,170 @@
+"""
+Ollama Pool - Least-loaded routing across several Ollama hosts
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+import aiohttp
+
+from app.core.config import settings
+from app.core.http import http_transport
+from app.core.logger import get_logger
+from app.core.metrics import metrics
+
+logger = get_logger(__name__)
+
+backend_requests = metrics.counter("ollama_backend_requests_total", "Requests routed per backend and outcome")
+backend_in_flight = metrics.gauge("ollama_backend_in_flight", "Requests in flight per backend")
+backend_healthy = metrics.gauge("ollama_backend_healthy", "1 when the backend passes health checks")
+
+
+class OllamaBackend:
+    """Routing state for one Ollama host."""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.healthy = True
+        self.in_flight = 0
+        self.latency_ewma: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_checked: Optional[float] = None
+
+    def score(self, default_latency: float) -> float:
+        """Expected wait if one more request were routed here (lower is better)."""
+        latency = self.latency_ewma if self.latency_ewma is not None else default_latency
+        return (self.in_flight + 1) * latency
+
+    def record_latency(self, latency: float) -> None:
+        alpha = settings.llm_latency_ewma_alpha
+        self.latency_ewma = latency if self.latency_ewma is None else (
+            alpha * latency + (1 - alpha) * self.latency_ewma
+        )
+
+    def set_healthy(self, healthy: bool, error: Optional[str] = None) -> None:
+        if healthy != self.healthy:
+            logger.warning("Ollama backend health changed", backend=self.url, healthy=healthy, error=error)
+        self.healthy = healthy
+        self.last_error = error
+        backend_healthy.set(1 if healthy else 0, backend=self.url)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "latency_ewma": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+            "last_error": self.last_error,
+            "last_checked": self.last_checked,
+        }
+
+
+class OllamaBackendPool:
+    """
+    Pool of Ollama endpoints.
+
+    Each request is routed to the healthy backend with the lowest expected
+    wait, estimated from its in-flight count and recent latency. Hosts that
+    fail a connection or a periodic ``/api/tags`` probe are taken out of
+    rotation until a later probe succeeds.
+    """
+
+    def __init__(self, urls: Iterable[str]):
+        self.backends: List[OllamaBackend] = [OllamaBackend(url) for url in urls]
+        self._task: Optional[asyncio.Task] = None
+        for backend in self.backends:
+            backend_healthy.set(1, backend=backend.url)
+
+    def __len__(self) -> int:
+        return len(self.backends)
+
+    def get(self, url: str) -> Optional[OllamaBackend]:
+        url = url.rstrip("/")
+        return next((backend for backend in self.backends if backend.url == url), None)
+
+    def pick(self, exclude: Iterable[str] = ()) -> OllamaBackend:
+        """Choose the least-loaded healthy backend not in ``exclude``."""
+        excluded = set(exclude)
+        candidates = [b for b in self.backends if b.healthy and b.url not in excluded]
+        if not candidates:
+            # Everything looks down: still try, preferring hosts not yet excluded
+            candidates = [b for b in self.backends if b.url not in excluded] or self.backends
+
+        known = [b.latency_ewma for b in self.backends if b.latency_ewma is not None]
+        default_latency = sum(known) / len(known) if known else 1.0
+        return min(candidates, key=lambda backend: backend.score(default_latency))
+
+    @asynccontextmanager
+    async def lease(self, exclude: Iterable[str] = (),
+                    prefer: Optional[str] = None) -> AsyncIterator[OllamaBackend]:
+        """
+        Route one request, tracking in-flight count and latency on the chosen backend.
+
+        ``prefer`` pins the request to a specific healthy backend when possible
+        (e.g. the host holding a conversation's KV cache).
+        """
+        preferred = self.get(prefer) if prefer else None
+        backend = preferred if preferred is not None and preferred.healthy else self.pick(exclude)
+
+        backend.in_flight += 1
+        backend_in_flight.set(backend.in_flight, backend=backend.url)
+        started_at = time.monotonic()
+        try:
+            yield backend
+        except aiohttp.ClientConnectionError as e:
+            # Passive health check: stop routing here until a probe succeeds
+            backend.set_healthy(False, str(e))
+            backend_requests.inc(backend=backend.url, outcome="connection_error")
+            raise
+        except Exception:
+            backend_requests.inc(backend=backend.url, outcome="error")
+            raise
+        else:
+            backend.record_latency(time.monotonic() - started_at)
+            backend_requests.inc(backend=backend.url, outcome="ok")
+        finally:
+            backend.in_flight -= 1
+            backend_in_flight.set(backend.in_flight, backend=backend.url)
+
+    async def probe(self, backend: OllamaBackend) -> bool:
+        """Check one backend via ``/api/tags`` and update its health."""
+        backend.last_checked = time.time()
+        try:
+            session = await http_transport.get_session()
+            timeout = aiohttp.ClientTimeout(total=settings.ollama_health_check_timeout)
+            async with session.get(f"{backend.url}/api/tags", timeout=timeout) as response:
+                healthy = response.status == 200
+                backend.set_healthy(healthy, None if healthy else f"HTTP {response.status}")
+        except Exception as e:
+            backend.set_healthy(False, str(e) or type(e).__name__)
+        return backend.healthy
+
+    async def probe_all(self) -> None:
+        await asyncio.gather(*(self.probe(backend) for backend in self.backends))
+
+    async def start(self) -> None:
+        """Start periodic health probes in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(settings.ollama_health_check_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {backend.url: backend.stats() for backend in self.backends}
+
+
+# Global pool built from OLLAMA_BASE_URLS (or the single OLLAMA_BASE_URL)
+ollama_pool = OllamaBackendPool(settings.ollama_base_urls or [settings.ollama_base_url])
@@ -0,0 +1,180 @@
+"""
+Prompt Builder - Assemble prompts that fit a token budget
+"""
+
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+section_tokens_histogram = metrics.histogram(
+    "llm_prompt_section_tokens", "Estimated prompt tokens per section after trimming",
+    buckets=(16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+)
+trimmed_counter = metrics.counter("llm_prompt_sections_trimmed_total", "Prompt sections trimmed to fit the budget")
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for ``text`` (characters per token from settings)."""
+    if not text:
+        return 0
+    return math.ceil(len(text) / settings.llm_chars_per_token)
+
+
+def _max_chars(tokens: int) -> int:
+    return int(tokens * settings.llm_chars_per_token)
+
+
+def trim_text(text: str, max_tokens: int) -> str:
+    """Cut free text to ``max_tokens``, preferring sentence then word boundaries."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+
+    limit = _max_chars(max_tokens) - 1
+    cut = text[:limit]
+    sentences = _SENTENCE_END.split(cut)
+    if len(sentences) > 1:
+        cut = " ".join(sentences[:-1])
+    elif " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip() + "…"
+
+
+def trim_lines(text: str, max_tokens: int) -> str:
+    """Keep whole lines from the top of a context block while they fit in ``max_tokens``."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    kept: List[str] = []
+    used = 0
+    for line in text.splitlines():
+        cost = estimate_tokens(line + "\n")
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+
+    # A lone header says nothing; drop the block instead
+    if len([line for line in kept if line.strip()]) <= 1:
+        return ""
+    return "\n".join(kept)
+
+
+class PromptSection:
+    """One block of a prompt and how it may be shrunk."""
+
+    def __init__(self, name: str, text: str, priority: int = 0, min_tokens: int = 0,
+                 max_tokens: Optional[int] = None, strategy: str = "text", required: bool = False):
+        self.name = name
+        self.text = text
+        self.priority = priority  # Higher values are trimmed first
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens  # Soft cap applied before any priority trimming
+        self.strategy = strategy  # "text" (sentence/word cut) or "lines" (drop trailing lines)
+        self.required = required  # Never trimmed
+        self.original_tokens = estimate_tokens(text)
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+    def shrink_to(self, max_tokens: int) -> None:
+        max_tokens = max(self.min_tokens, max_tokens)
+        if self.strategy == "lines":
+            self.text = trim_lines(self.text, max_tokens)
+        else:
+            self.text = trim_text(self.text, max_tokens)
+
+
+class BuiltPrompt:
+    """Assembled prompt text plus its per-section token report."""
+
+    def __init__(self, text: str, sections: List[PromptSection], budget_tokens: Optional[int]):
+        self.text = text
+        self.budget_tokens = budget_tokens
+        self.sections = sections
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "budget_tokens": self.budget_tokens,
+            "total_tokens": self.tokens,
+            "sections": {
+                section.name: {
+                    "tokens": section.tokens,
+                    "original_tokens": section.original_tokens,
+                    "trimmed": section.tokens < section.original_tokens,
+                }
+                for section in self.sections
+            },
+        }
+
+
+class PromptBuilder:
+    """
+    Builds a prompt from named sections and trims it to a token budget.
+
+    Sections are rendered in the order they were added. When the estimated
+    total exceeds the budget, sections over their ``max_tokens`` soft cap are
+    cut to it first; then optional sections are shrunk starting from the
+    highest ``priority`` value, each down to its ``min_tokens`` floor (or
+    dropped when the floor is zero), until the prompt fits.
+    """
+
+    def __init__(self, budget_tokens: Optional[int] = None, separator: str = "\n\n"):
+        self.budget_tokens = budget_tokens
+        self.separator = separator
+        self.sections: List[PromptSection] = []
+
+    def add(self, name: str, text: str, **kwargs: Any) -> "PromptBuilder":
+        self.sections.append(PromptSection(name, text.strip("\n"), **kwargs))
+        return self
+
+    def _render(self) -> str:
+        return self.separator.join(section.text for section in self.sections if section.text)
+
+    def build(self, agent: str = "unknown") -> BuiltPrompt:
+        if self.budget_tokens is not None:
+            trimmable = sorted(
+                (section for section in self.sections if not section.required),
+                key=lambda section: section.priority, reverse=True
+            )
+
+            # Oversized sections give up their excess before anything is dropped
+            for section in trimmable:
+                if section.max_tokens is not None and section.tokens > section.max_tokens:
+                    overflow = estimate_tokens(self._render()) - self.budget_tokens
+                    if overflow <= 0:
+                        break
+                    self._shrink(section, max(section.max_tokens, section.tokens - overflow), agent)
+
+            for section in trimmable:
+                overflow = estimate_tokens(self._render()) - self.budget_tokens
+                if overflow <= 0:
+                    break
+                self._shrink(section, section.tokens - overflow, agent)
+
+        for section in self.sections:
+            section_tokens_histogram.observe(section.tokens, agent=agent, section=section.name)
+        return BuiltPrompt("\n" + self._render() + "\n", self.sections, self.budget_tokens)
+
+    def _shrink(self, section: PromptSection, max_tokens: int, agent: str) -> None:
+        before = section.tokens
+        section.shrink_to(max_tokens)
+        if section.tokens < before:
+            trimmed_counter.inc(agent=agent, section=section.name)
+
+
+def prompt_budget(num_ctx: int, num_predict: Optional[int], system_prompt: str = "") -> int:
+    """Tokens left for the user prompt once the system prompt and the output are reserved."""
+    reserved = estimate_tokens(system_prompt) + (num_predict or 0) + settings.llm_prompt_safety_margin
+    return max(0, num_ctx - reserved)
@@ -0,0 +1,138 @@
+"""
+Service Registry - Builds the agents and their services once and shares them across requests
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.logger import LoggerMixin
+from app.core.metrics import metrics
+
+build_histogram = metrics.histogram("registry_build_seconds", "Time to construct a shared component")
+
+Factory = Callable[["ServiceRegistry"], Any]
+
+
+class ServiceRegistry(LoggerMixin):
+    """
+    Named factories for the app's long-lived components, built at most once.
+
+    Agents and services are stateless between calls but expensive to
+    construct (keyword tables, regex patterns, image catalogs, and a tree of
+    sub-services under each agent). Factories receive the registry and pull
+    their dependencies from it, so a dependency shared by several components
+    (the Ollama client, web search, embeddings) is a single instance. ``start``
+    builds everything at startup; ``get`` builds on first use for scripts that
+    never start the app. ``provider`` turns a component into a FastAPI
+    dependency.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Factory] = {}
+        self._instances: Dict[str, Any] = {}
+        self._status: Dict[str, Dict[str, Any]] = {}
+        # Reentrant: a factory builds its dependencies while holding the lock
+        self._lock = threading.RLock()
+        self.started_at: Optional[float] = None
+
+    def register(self, name: str, factory: Factory) -> None:
+        """Register ``factory`` under ``name``, dropping any instance built by a previous factory."""
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+            self._status[name] = {"built": False, "build_seconds": None, "built_at": None, "requests": 0}
+
+    def get(self, name: str) -> Any:
+        """The shared instance of ``name``, built on first use."""
+        instance = self._instances.get(name)
+        if instance is None:
+            instance = self._build(name)
+        return instance
+
+    def provider(self, name: str) -> Callable[[], Any]:
+        """FastAPI dependency returning the shared instance of ``name``."""
+        if name not in self._factories:
+            raise KeyError(f"Unknown component: {name}")
+
+        # Async so FastAPI resolves it on the event loop instead of the threadpool
+        async def dependency() -> Any:
+            self._status[name]["requests"] += 1
+            return self.get(name)
+
+        dependency.__name__ = f"get_{name}"
+        return dependency
+
+    def start(self) -> List[str]:
+        """Build every registered component; returns the names built by this call."""
+        started = time.monotonic()
+        built = [name for name in list(self._factories) if name not in self._instances]
+        for name in built:
+            self._build(name)
+        self.started_at = time.time()
+        self.logger.info("Service registry started", components=built,
+                         seconds=round(time.monotonic() - started, 3))
+        return built
+
+    def _build(self, name: str) -> Any:
+        with self._lock:
+            instance = self._instances.get(name)
+            if instance is not None:
+                return instance
+            if name not in self._factories:
+                raise KeyError(f"Unknown component: {name}")
+
+            started = time.monotonic()
+            instance = self._factories[name](self)
+            elapsed = time.monotonic() - started
+
+            self._instances[name] = instance
+            self._status[name].update(built=True, build_seconds=round(elapsed, 6), built_at=time.time())
+            build_histogram.observe(elapsed, component=name)
+            return instance
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "started_at": self.started_at,
+            "components": {name: dict(status) for name, status in self._status.items()}
+        }
+
+
+def _register_defaults(registry: ServiceRegistry) -> None:
+    # Imported here: the agents import most of app.services
+    from app.agents.analyzer import AnalyzerAgent
+    from app.agents.competitor_researcher import CompetitorResearcher
+    from app.agents.image_finder import ImageFinder
+    from app.agents.optimizer import OptimizerAgent
+    from app.services.embeddings import EmbeddingService
+    from app.services.market_intelligence import MarketIntelligence
+    from app.services.ollama_client import OllamaClient
+    from app.services.real_image_service import RealImageService
+    from app.services.seo_analyzer import SEOAnalyzer
+    from app.services.web_search import WebSearchService
+
+    registry.register("ollama", lambda r: OllamaClient())
+    # One instance, so its semaphore bounds all outgoing searches, not each caller's
+    registry.register("web_search", lambda r: WebSearchService())
+    registry.register("embeddings", lambda r: EmbeddingService(ollama=r.get("ollama")))
+    registry.register("real_images", lambda r: RealImageService())
+    registry.register("competitor_researcher", lambda r: CompetitorResearcher(web_search=r.get("web_search")))
+    registry.register("seo_analyzer", lambda r: SEOAnalyzer(ollama=r.get("ollama"), embeddings=r.get("embeddings")))
+    registry.register("market_intelligence", lambda r: MarketIntelligence(
+        ollama=r.get("ollama"), embeddings=r.get("embeddings"), web_search=r.get("web_search")
+    ))
+    registry.register("analyzer", lambda r: AnalyzerAgent(
+        ollama=r.get("ollama"),
+        competitor_researcher=r.get("competitor_researcher"),
+        seo_analyzer=r.get("seo_analyzer"),
+        market_intelligence=r.get("market_intelligence")
+    ))
+    registry.register("optimizer", lambda r: OptimizerAgent(ollama=r.get("ollama")))
+    registry.register("image_finder", lambda r: ImageFinder(
+        web_search=r.get("web_search"), ollama=r.get("ollama"), real_image_service=r.get("real_images")
+    ))
+
+
+# Global registry instance
+registry = ServiceRegistry()
+_register_defaults(registry)
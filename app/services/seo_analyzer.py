@@ -9,13 +9,19 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime
 import hashlib
 from app.services.ollama_client import OllamaClient
+from app.services.embeddings import EmbeddingService
+from app.services.llm_usage import llm_call_scope
 from app.core.config import settings
+from app.core.deadline import allow_optional
+from app.schemas.llm import SemanticKeywords
+from pydantic import ValidationError
 
 class SEOAnalyzer:
     """Advanced SEO analysis capabilities for Amazon listings"""
     
-    def __init__(self):
-        self.ollama = OllamaClient()
+    def __init__(self, ollama: Optional[OllamaClient] = None, embeddings: Optional[EmbeddingService] = None):
+        self.ollama = ollama or OllamaClient()
+        self.embeddings = embeddings or EmbeddingService(ollama=self.ollama)
         
         # Spanish Amazon SEO keywords by category
         self.high_value_keywords = {
@@ -53,15 +59,21 @@ class SEOAnalyzer:
             "navigational": ["marca", "modelo", "oficial", "tienda"]
         }
     
-    async def analyze_seo_metrics(self, title: str, description: str, keywords: List[str]) -> Dict[str, Any]:
-        """Comprehensive SEO analysis for Amazon listings"""
+    async def analyze_seo_metrics(self, title: str, description: str, keywords: List[str],
+                                  include_semantic: bool = True) -> Dict[str, Any]:
+        """Comprehensive SEO analysis for Amazon listings
+        
+        With ``include_semantic=False`` the AI semantic keywords are left empty so
+        the caller can generate them elsewhere and add them with
+        ``apply_semantic_keywords``.
+        """
         
         try:
             # Detect product category
-            category = self._detect_category(title.lower() + " " + description.lower())
+            category = await self._classify_category(title, description)
             
             # Generate enhanced keywords
-            enhanced_keywords = await self._generate_enhanced_keywords(title, description, category)
+            enhanced_keywords = await self._generate_enhanced_keywords(title, description, category, include_semantic)
             
             # Analyze search intent
             intent_analysis = self._analyze_search_intent(title, description, keywords)
@@ -119,7 +131,54 @@ class SEOAnalyzer:
         
         return "generic"
     
-    async def _generate_enhanced_keywords(self, title: str, description: str, category: str) -> Dict[str, Any]:
+    async def _classify_category(self, title: str, description: str) -> str:
+        """Detect the category by keyword, falling back to embedding similarity"""
+        
+        category = self._detect_category(title.lower() + " " + description.lower())
+        if category != "generic" or not self.embeddings.enabled:
+            return category
+        
+        # Describe each category by its search vocabulary; these vectors come from the cache after the first call
+        categories = list(self.high_value_keywords)
+        descriptions = [
+            f"{name}: {', '.join(self.high_value_keywords[name]['primary'] + self.high_value_keywords[name]['benefits'])}"
+            for name in categories
+        ]
+        with llm_call_scope("seo_analyzer", "category_detection"):
+            similarity = await self.embeddings.similarity([f"{title}. {description}"], descriptions)
+        
+        if similarity is not None:
+            best = int(similarity[0].argmax())
+            if similarity[0, best] >= settings.embedding_category_threshold:
+                return categories[best]
+        return category
+    
+    async def apply_semantic_keywords(self, seo_analysis: Dict[str, Any], semantic_keywords: List[str]) -> Dict[str, Any]:
+        """Merge externally generated semantic keywords into an SEO analysis, deduplicated like the rest"""
+        
+        if not seo_analysis.get("success"):
+            return seo_analysis
+        
+        data = seo_analysis["data"]
+        enhanced_keywords = data["enhanced_keywords"]
+        semantic = [kw.lower().strip() for kw in semantic_keywords if len(kw.strip()) > 2]
+        # Same order and near-duplicate collapsing as ``_generate_enhanced_keywords``
+        all_keywords = list(dict.fromkeys(enhanced_keywords["all_keywords"] + semantic))
+        with llm_call_scope("seo_analyzer", "keyword_dedup"):
+            deduplicated = await self.embeddings.dedupe(all_keywords)
+        if deduplicated is not None:
+            all_keywords = deduplicated
+        
+        enhanced_keywords.update({
+            "semantic": semantic,
+            "all_keywords": all_keywords,
+            "total_count": len(all_keywords)
+        })
+        data["search_metrics"] = self._estimate_search_metrics(all_keywords)
+        return seo_analysis
+    
+    async def _generate_enhanced_keywords(self, title: str, description: str, category: str,
+                                          include_semantic: bool = True) -> Dict[str, Any]:
         """Generate enhanced keyword sets using AI"""
         
         category_keywords = self.high_value_keywords.get(category, self.high_value_keywords["generic"] if "generic" in self.high_value_keywords else {})
@@ -137,13 +196,24 @@ class SEOAnalyzer:
         long_tail = self._generate_long_tail_keywords(primary_keywords, modifier_keywords, spec_keywords)
         
         # Generate semantic keywords using AI
-        semantic_keywords = await self._generate_semantic_keywords(title, description)
+        # (an optional LLM call, skipped when the request's deadline is close)
+        if include_semantic and allow_optional("semantic_keywords", settings.deadline_min_llm_seconds):
+            semantic_keywords = await self._generate_semantic_keywords(title, description)
+        else:
+            semantic_keywords = []
         
-        all_keywords = list(set(
+        # Ordered so that dedup keeps the category's own keywords over extracted variants
+        all_keywords = list(dict.fromkeys(
             primary_keywords + modifier_keywords + spec_keywords + 
             benefit_keywords + content_keywords + long_tail + semantic_keywords
         ))
         
+        # Collapse near-duplicates ("mochila impermeable" / "mochilas impermeables") by embedding similarity
+        with llm_call_scope("seo_analyzer", "keyword_dedup"):
+            deduplicated = await self.embeddings.dedupe(all_keywords)
+        if deduplicated is not None:
+            all_keywords = deduplicated
+        
         return {
             "primary": primary_keywords,
             "modifiers": modifier_keywords,
@@ -162,7 +232,7 @@ class SEOAnalyzer:
         system_prompt = """Eres un experto en SEO y marketing digital para Amazon España. 
         Genera palabras clave semánticamente relacionadas que los usuarios españoles buscarían.
         
-        IMPORTANTE: Responde SOLO con un JSON array de strings. No incluyas explicaciones."""
+        IMPORTANTE: Responde SOLO con un objeto JSON con la lista "keywords". No incluyas explicaciones."""
         
         prompt = f"""
         Genera 10 palabras clave semánticamente relacionadas para este producto de Amazon:
@@ -176,30 +246,27 @@ class SEOAnalyzer:
         - Variaciones coloquiales
         - Keywords de compra (transaccionales)
         
-        Formato: ["keyword1", "keyword2", "keyword3", ...]
+        Formato: {{"keywords": ["keyword1", "keyword2", "keyword3", ...]}}
         """
         
+        profile = settings.llm_profile("semantic_keywords")
+        
         try:
-            result = await self.ollama.generate(
-                model=settings.ollama_model,
-                prompt=prompt,
-                system_prompt=system_prompt
-            )
+            with llm_call_scope("seo_analyzer", "semantic_keywords"):
+                result = await self.ollama.generate(
+                    model=profile.model,
+                    prompt=prompt,
+                    system_prompt=system_prompt,
+                    options=profile.options(),
+                    schema=SemanticKeywords
+                )
             
             if result["success"]:
-                response_text = result["response"].strip()
-                
-                # Extract JSON from response
-                if "[" in response_text and "]" in response_text:
-                    start = response_text.find("[")
-                    end = response_text.rfind("]") + 1
-                    json_text = response_text[start:end]
-                    
-                    try:
-                        keywords = json.loads(json_text)
-                        return [kw.lower().strip() for kw in keywords if isinstance(kw, str) and len(kw.strip()) > 2]
-                    except json.JSONDecodeError:
-                        pass
+                try:
+                    keywords = SemanticKeywords.model_validate_json(result["response"]).keywords
+                    return [kw.lower().strip() for kw in keywords if len(kw.strip()) > 2]
+                except ValidationError:
+                    pass
             
             # Fallback keywords
             return ["producto de calidad", "envío rápido", "mejor precio", "recomendado", "popular"]
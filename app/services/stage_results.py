@@ -0,0 +1,84 @@
+"""
+Stage Results - Persisted per-stage analysis outputs keyed by input fingerprints
+"""
+
+import copy
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.metrics import metrics
+from app.models.listing import ListingStageResult
+
+logger = get_logger(__name__)
+
+stage_reuse_counter = metrics.counter("analysis_stage_reuse_total", "Analysis stages reused or recomputed, by stage")
+
+# Bump a stage's version when its code or prompts change so stored outputs
+# from the old version are recomputed instead of reused
+STAGE_VERSIONS: Dict[str, int] = {
+    "competitor_research": 1,
+    "seo_analysis": 1,
+    "market_intelligence": 1,
+    "ai_generation": 1,
+}
+
+
+def stage_fingerprint(stage: str, **inputs: Any) -> str:
+    """Hash of everything a stage's output depends on, including its version."""
+    material = json.dumps(
+        {"stage": stage, "version": STAGE_VERSIONS[stage], "inputs": inputs},
+        sort_keys=True, ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class StageResultStore:
+    """
+    Stored stage outputs of one listing.
+
+    ``get`` returns a stage's stored output when its fingerprint matches the
+    current inputs; ``save`` replaces it after a successful recomputation.
+    Only successful outputs are stored, so failed, deadline-cut or degraded
+    (``"degraded": True``, e.g. built from demo data) stages are retried on
+    the next analysis.
+    """
+
+    def __init__(self, db: Session, listing_id: int):
+        self.db = db
+        self.listing_id = listing_id
+        self.reused: List[str] = []
+        rows = db.query(ListingStageResult).filter(ListingStageResult.listing_id == listing_id).all()
+        self._rows: Dict[str, ListingStageResult] = {row.stage: row for row in rows}
+
+    def get(self, stage: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        row = self._rows.get(stage)
+        if not settings.incremental_analysis_enabled or row is None or row.fingerprint != fingerprint:
+            stage_reuse_counter.inc(stage=stage, outcome="recomputed")
+            return None
+        stage_reuse_counter.inc(stage=stage, outcome="reused")
+        self.reused.append(stage)
+        logger.info("Reusing stored stage output", listing_id=self.listing_id, stage=stage)
+        return copy.deepcopy(row.result)
+
+    def save(self, stage: str, fingerprint: str, result: Dict[str, Any]) -> None:
+        if not result.get("success", True) or result.get("degraded"):
+            return
+        try:
+            row = self._rows.get(stage)
+            if row is None:
+                row = ListingStageResult(listing_id=self.listing_id, stage=stage)
+                self.db.add(row)
+                self._rows[stage] = row
+            row.fingerprint = fingerprint
+            # Round-trip through JSON so later in-place changes to ``result`` are not stored
+            row.result = json.loads(json.dumps(result, default=str))
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            self._rows.pop(stage, None)
+            logger.warning("Failed to store stage output", listing_id=self.listing_id, stage=stage, error=str(e))
@@ -1,54 +1,81 @@
 import aiohttp
 import asyncio
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 import json
+from app.core.config import settings
+from app.core.deadline import client_timeout, deadline_expired
+from app.core.http import http_transport
 
 class WebSearchService:
     def __init__(self):
         self.base_url = "https://api.duckduckgo.com/"
-        self.timeout = 10
+        self.timeout = settings.web_search_timeout
+        # Bounds parallel queries to stay clear of the API's rate limiting;
+        # created per event loop, like the shared HTTP session
+        self._concurrency: Optional[asyncio.Semaphore] = None
+        self._concurrency_loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._concurrency is None or self._concurrency_loop is not loop:
+            self._concurrency = asyncio.Semaphore(settings.web_search_concurrency)
+            self._concurrency_loop = loop
+        return self._concurrency
+    
+    async def search_many(self, queries: Sequence[Tuple[str, int]]) -> List[List[Dict[str, Any]]]:
+        """Run several ``(query, max_results)`` searches in parallel, results in query order"""
+        
+        return list(await asyncio.gather(*(self.search(query, max_results) for query, max_results in queries)))
     
     async def search(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
-        """Perform web search using DuckDuckGo API"""
+        """Perform web search using DuckDuckGo API
+        
+        Failed searches fall back to demo results, each marked ``"demo": True``.
+        Once the deadline has expired nothing is searched and the result is empty.
+        """
+        
+        if deadline_expired():
+            # No time left for the network: return nothing rather than made-up data
+            return []
         
         try:
             # Use DuckDuckGo Instant Answer API (free, no API key needed)
             search_url = f"{self.base_url}?q={query}&format=json&no_html=1&skip_disambig=1"
             
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
-                async with session.get(search_url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        results = []
-                        
-                        # Parse DuckDuckGo results
-                        if data.get("RelatedTopics"):
-                            for topic in data["RelatedTopics"][:max_results]:
-                                if isinstance(topic, dict) and "Text" in topic:
-                                    results.append({
-                                        "title": topic.get("FirstURL", "").split("/")[-1].replace("-", " ").title(),
-                                        "snippet": topic.get("Text", ""),
-                                        "url": topic.get("FirstURL", "")
-                                    })
-                        
-                        # If no RelatedTopics, try Abstract
-                        if not results and data.get("Abstract"):
-                            results.append({
-                                "title": data.get("Heading", query),
-                                "snippet": data.get("Abstract", ""),
-                                "url": data.get("AbstractURL", "")
-                            })
-                        
-                        # If still no results, create synthetic results for demo
-                        if not results:
-                            results = await self._generate_demo_results(query, max_results)
-                        
-                        return results[:max_results]
+            session = await http_transport.get_session()
+            async with self._semaphore(), session.get(search_url, timeout=client_timeout(self.timeout)) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    
+                    results = []
+                    
+                    # Parse DuckDuckGo results
+                    if data.get("RelatedTopics"):
+                        for topic in data["RelatedTopics"][:max_results]:
+                            if isinstance(topic, dict) and "Text" in topic:
+                                results.append({
+                                    "title": topic.get("FirstURL", "").split("/")[-1].replace("-", " ").title(),
+                                    "snippet": topic.get("Text", ""),
+                                    "url": topic.get("FirstURL", "")
+                                })
+                    
+                    # If no RelatedTopics, try Abstract
+                    if not results and data.get("Abstract"):
+                        results.append({
+                            "title": data.get("Heading", query),
+                            "snippet": data.get("Abstract", ""),
+                            "url": data.get("AbstractURL", "")
+                        })
+                    
+                    # If still no results, create synthetic results for demo
+                    if not results:
+                        results = await self._generate_demo_results(query, max_results)
                     
-                    else:
-                        # Fallback to demo results if API fails
-                        return await self._generate_demo_results(query, max_results)
+                    return results[:max_results]
+                
+                else:
+                    # Fallback to demo results if API fails
+                    return await self._generate_demo_results(query, max_results)
         
         except Exception as e:
             print(f"Search API error: {e}")
@@ -125,4 +152,4 @@ class WebSearchService:
                 }
             ]
         
-        return results[:max_results]
\ No newline at end of file
+        return [{**result, "demo": True} for result in results[:max_results]]
\ No newline at end of file
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark del análisis: tres llamadas al LLM (SEO + mercado + listing) vs. modo fusionado
+
+Uso:
+    python benchmark_analysis.py --runs 3
+    python benchmark_analysis.py --title "Mochila impermeable" --description "Mochila de 30L..."
+
+Requiere Ollama en marcha. La caché de respuestas del LLM se desactiva para que
+cada ejecución mida generaciones reales.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.core.config import settings
+from app.agents.analyzer import AnalyzerAgent
+from app.services.llm_usage import calls_counter, prompt_tokens_counter, completion_tokens_counter, compute_seconds_counter
+
+DEFAULT_TITLE = "Mochila impermeable para portátil de 15 pulgadas"
+DEFAULT_DESCRIPTION = (
+    "Mochila resistente al agua con compartimento acolchado para portátil, puerto USB de carga, "
+    "bolsillo antirrobo y tirantes ergonómicos. Ideal para viaje, trabajo y universidad."
+)
+
+
+def _totals():
+    """Current LLM usage totals across every agent and stage."""
+    def total(counter, **match):
+        return sum(
+            entry["value"] for entry in counter.snapshot()["values"]
+            if all(entry["labels"].get(name) == value for name, value in match.items())
+        )
+
+    return {
+        "calls": total(calls_counter, outcome="ok"),
+        "prompt_tokens": total(prompt_tokens_counter),
+        "completion_tokens": total(completion_tokens_counter),
+        "compute_seconds": total(compute_seconds_counter),
+    }
+
+
+async def run_mode(agent: AnalyzerAgent, fused: bool, title: str, description: str, runs: int):
+    latencies = []
+    before = _totals()
+
+    for run in range(runs):
+        started_at = time.perf_counter()
+        result = await agent.analyze(title, description, fused=fused)
+        latencies.append(time.perf_counter() - started_at)
+        print(f"  {'fusionado' if fused else 'tres llamadas'} #{run + 1}: {latencies[-1]:.2f}s "
+              f"({'ok' if result.get('success') else 'error'})")
+
+    after = _totals()
+    usage = {name: (after[name] - before[name]) / runs for name in after}
+    return latencies, usage
+
+
+def _report(name: str, latencies, usage):
+    print(f"\n📊 {name}")
+    print(f"   Latencia media:   {statistics.mean(latencies):.2f}s")
+    print(f"   Latencia mediana: {statistics.median(latencies):.2f}s")
+    print(f"   Llamadas LLM:     {usage['calls']:.1f} por análisis")
+    print(f"   Tokens de prompt: {usage['prompt_tokens']:.0f} por análisis")
+    print(f"   Tokens generados: {usage['completion_tokens']:.0f} por análisis")
+    print(f"   Tiempo de modelo: {usage['compute_seconds']:.2f}s por análisis")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compara el análisis en tres llamadas con el modo fusionado")
+    parser.add_argument("--runs", type=int, default=3, help="Ejecuciones por modo")
+    parser.add_argument("--title", default=DEFAULT_TITLE)
+    parser.add_argument("--description", default=DEFAULT_DESCRIPTION)
+    args = parser.parse_args()
+
+    settings.llm_cache_enabled = False
+    agent = AnalyzerAgent()
+
+    print(f"🚀 Benchmark con modelo {settings.ollama_model} ({args.runs} ejecuciones por modo)")
+
+    # One untimed run so the model is loaded before either mode is measured
+    await agent.analyze(args.title, args.description, fused=True)
+
+    three_call = await run_mode(agent, False, args.title, args.description, args.runs)
+    fused = await run_mode(agent, True, args.title, args.description, args.runs)
+
+    _report("Tres llamadas (SEO + mercado + listing)", *three_call)
+    _report("Modo fusionado (una llamada)", *fused)
+
+    baseline = statistics.mean(three_call[0])
+    speedup = baseline / statistics.mean(fused[0]) if fused[0] else 0
+    print(f"\n⚡ Aceleración del modo fusionado: x{speedup:.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
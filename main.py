@@ -1,21 +1,48 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from app.api import listings, products
+from app.api import listings, products, metrics
 from app.models.database import engine, Base
 from app.core.config import settings
 from app.core.logger import configure_logging
 from app.core.middleware import ErrorHandlingMiddleware, LoggingMiddleware
+from app.core.http import http_transport
+from app.core.cache import memo_backend
+from app.services.ollama_client import llm_response_cache
+from app.services.model_manager import model_manager
+from app.services.ollama_pool import ollama_pool
+from app.services.registry import registry
 
 # Configure logging
 configure_logging()
 
 Base.metadata.create_all(bind=engine)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared outbound connection pool for Ollama, web search and image checks
+    await http_transport.start()
+    await ollama_pool.start()
+    # Build the agents and their services once, before the first request
+    registry.start()
+    if settings.ollama_warmup_enabled:
+        # Preload models in the background so startup is not blocked
+        await model_manager.start()
+    yield
+    await model_manager.stop()
+    await ollama_pool.stop()
+    await http_transport.close()
+    await memo_backend.close()
+    llm_response_cache.close()
+
+
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
-    debug=settings.debug
+    debug=settings.debug,
+    lifespan=lifespan
 )
 
 # Add middleware
@@ -29,6 +56,7 @@ templates = Jinja2Templates(directory="app/templates")
 
 app.include_router(listings.router, prefix="/api/listings", tags=["listings"])
 app.include_router(products.router, prefix="/api/products", tags=["products"])
+app.include_router(metrics.router, prefix="/api/metrics", tags=["metrics"])
 
 @app.get("/")
 async def root(request: Request):
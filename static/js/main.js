@@ -87,6 +87,49 @@ window.utils = {
             console.error('API Request Error:', error);
             throw error;
         }
+    },
+
+    // Server-Sent Events over fetch (EventSource only supports GET):
+    // calls onEvent(event, data) for every frame as it arrives
+    streamEvents: async function(url, options = {}, onEvent) {
+        const response = await fetch(url, options);
+        if (!response.ok || !response.body) {
+            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        const dispatch = (frame) => {
+            let event = 'message';
+            const data = [];
+            frame.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    data.push(line.slice(5).trimStart());
+                }
+            });
+            if (data.length > 0) {
+                onEvent(event, JSON.parse(data.join('\n')));
+            }
+        };
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                dispatch(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+            }
+        }
+        if (buffer.trim()) {
+            dispatch(buffer);
+        }
     }
 };
 
@@ -0,0 +1,201 @@
+import pytest
+
+from app.agents.analyzer import AnalyzerAgent
+from app.core import cache as cache_module
+from app.core.cache import MemoryBackend, code_version, fold_text, memo_stats, memoize, normalize_text
+
+
+@pytest.fixture(autouse=True)
+def backend(monkeypatch):
+    """A private memory backend, so tests don't see each other's entries."""
+    backend = MemoryBackend(max_entries=100)
+    monkeypatch.setattr(cache_module, "memo_backend", backend)
+    return backend
+
+
+def test_text_normalization():
+    assert normalize_text("  Mochila \n de\tviaje ") == "Mochila de viaje"
+    # Decomposed "n" + combining tilde is the same text as "ñ"
+    assert normalize_text("Nin\u0303o") == "Ni\u00f1o"
+    assert fold_text("MOCHILA  de Viaje") == "mochila de viaje"
+
+
+@pytest.mark.asyncio
+async def test_equivalent_arguments_share_an_entry():
+    calls = []
+
+    @memoize("test_normalized_key")
+    async def search(query, limit=5):
+        calls.append(query)
+        return {"query": query}
+
+    await search("Mochila de viaje")
+    await search("  Mochila   de viaje ")
+    await search("Mochila de viaje", limit=5)
+    await search(query="Mochila de viaje")
+    assert len(calls) == 1
+
+    await search("mochila de viaje")
+    await search("Mochila de viaje", 10)
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_fold_text_ignores_case():
+    calls = []
+
+    @memoize("test_folded_key", normalize=fold_text)
+    async def search(query):
+        calls.append(query)
+        return query
+
+    await search("Mochila de viaje")
+    await search("MOCHILA DE VIAJE")
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_instances_share_entries_and_results_are_copies():
+    calls = []
+
+    class Service:
+        @memoize("test_method_key")
+        async def lookup(self, term):
+            calls.append(term)
+            return {"terms": [term]}
+
+    first = await Service().lookup("mochila")
+    first["terms"].append("changed")
+
+    assert await Service().lookup("mochila") == {"terms": ["mochila"]}
+    assert len(calls) == 1
+
+
+def test_unhashable_arguments_are_refused():
+    @memoize("test_object_argument")
+    def describe(value):
+        return "value"
+
+    with pytest.raises(TypeError):
+        describe(object())
+
+
+def test_code_version_follows_the_source():
+    def first():
+        return 1
+
+    def second():
+        return 2
+
+    assert code_version(first) == code_version(first)
+    assert code_version(first) != code_version(second)
+    assert code_version(first, second) != code_version(first)
+
+
+@pytest.mark.asyncio
+async def test_changed_code_or_version_does_not_hit_old_entries():
+    @memoize("test_code_version")
+    async def generate(title):
+        return "old"
+
+    assert await generate("Mochila") == "old"
+
+    @memoize("test_code_version")
+    async def generate(title):
+        return "new"
+
+    assert await generate("Mochila") == "new"
+
+    @memoize("test_code_version", version="2")
+    async def generate(title):
+        return "new"
+
+    assert memo_stats()["test_code_version"]["version"].startswith("2:")
+
+
+@pytest.mark.asyncio
+async def test_cache_if_rejects_results():
+    calls = []
+
+    @memoize("test_cache_if", cache_if=lambda result: result["success"])
+    async def fetch(term):
+        calls.append(term)
+        return {"success": term != "fails"}
+
+    await fetch("fails")
+    await fetch("fails")
+    await fetch("works")
+    await fetch("works")
+
+    assert calls == ["fails", "fails", "works"]
+
+
+@pytest.mark.asyncio
+async def test_degraded_competitor_research_is_not_cached():
+    class FakeResearcher:
+        def __init__(self, result):
+            self.result = result
+            self.calls = 0
+
+        async def research_competitors(self, title, description):
+            self.calls += 1
+            return dict(self.result)
+
+    degraded = FakeResearcher({"success": True, "degraded": True, "data": {"competitors_found": 5}})
+    agent = AnalyzerAgent(ollama=object(), competitor_researcher=degraded, seo_analyzer=object(),
+                          market_intelligence=object())
+    await agent._research_competitors("Mochila", "Resistente al agua")
+    await agent._research_competitors("Mochila", "Resistente al agua")
+    assert degraded.calls == 2
+
+    real = FakeResearcher({"success": True, "degraded": False, "data": {"competitors_found": 5}})
+    agent = AnalyzerAgent(ollama=object(), competitor_researcher=real, seo_analyzer=object(),
+                          market_intelligence=object())
+    await agent._research_competitors("Mochila", "Resistente al agua")
+    await agent._research_competitors("Mochila", "Resistente al agua")
+    assert real.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_hits_and_misses_are_counted():
+    @memoize("test_stats")
+    async def lookup(term):
+        return term
+
+    await lookup("a")
+    await lookup("a")
+    await lookup("b")
+
+    stats = memo_stats()["test_stats"]
+    assert (stats["hits"], stats["misses"], stats["coalesced"]) == (1, 2, 0)
+    assert stats["hit_rate"] == pytest.approx(0.333)
+
+
+def test_sync_functions_use_a_bounded_lru(monkeypatch):
+    monkeypatch.setattr(cache_module.settings, "memo_memory_max_entries", 2)
+    calls = []
+
+    @memoize("test_sync_lru")
+    def square(value):
+        calls.append(value)
+        return value * value
+
+    for value in (1, 2, 1, 3, 1, 2):
+        assert square(value) == value * value
+
+    # 2 was evicted by 3 (1 was used more recently) and computed again
+    assert calls == [1, 2, 3, 2]
+
+
+def test_disabled_memoization_always_calls(monkeypatch):
+    monkeypatch.setattr(cache_module.settings, "memo_enabled", False)
+    calls = []
+
+    @memoize("test_disabled")
+    def lookup(term):
+        calls.append(term)
+        return term
+
+    lookup("a")
+    lookup("a")
+    assert calls == ["a", "a"]
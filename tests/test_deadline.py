@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from app.core import deadline as deadline_module
+from app.core.deadline import (
+    Deadline, allow_optional, client_timeout, current_deadline, deadline_expired, deadline_scope
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(deadline_module.time, "monotonic", clock)
+    return clock
+
+
+def test_for_stage_gets_its_budget_without_the_reserve(clock):
+    deadline = Deadline(30)
+
+    stage = deadline.for_stage("seo_analysis", budget=10, reserve=15)
+    assert stage.remaining() == 10
+
+    # Only 20 - 15 seconds are left outside the reserve
+    clock.now += 10
+    stage = deadline.for_stage("market_intelligence", budget=10, reserve=15)
+    assert stage.remaining() == 5
+    assert deadline.stages_cut == []
+
+
+def test_for_stage_skips_when_only_the_reserve_is_left(clock):
+    deadline = Deadline(30)
+    clock.now += 16
+
+    assert deadline.for_stage("competitor_research", budget=10, reserve=15) is None
+    assert deadline.status("competitor_research") == "skipped"
+    assert deadline.report()["stages_cut"] == [{"stage": "competitor_research", "reason": "skipped"}]
+
+
+def test_child_deadlines_never_outlive_the_parent_and_report_to_the_root(clock):
+    deadline = Deadline(10)
+    stage = deadline.for_stage("seo_analysis", budget=60)
+    assert stage.remaining() == 10
+
+    stage.cut("semantic_keywords", "skipped")
+    assert deadline.status("semantic_keywords") == "skipped"
+    assert deadline.status("seo_analysis") == "completed"
+
+    clock.now += 10
+    assert stage.expired and deadline.expired
+
+
+def test_client_timeout_is_capped_by_the_remaining_time(clock):
+    assert client_timeout(60).total == 60
+    assert client_timeout(None).total is None
+
+    with deadline_scope(Deadline(20)):
+        assert client_timeout(60).total == 20
+        assert client_timeout(5).total == 5
+        assert client_timeout(None).total == 20
+
+        clock.now += 25
+        # Zero would mean "no timeout" to aiohttp
+        assert client_timeout(60).total == 0.001
+        assert deadline_expired()
+
+
+def test_allow_optional_records_the_cut(clock):
+    assert allow_optional("semantic_keywords", 5)
+
+    deadline = Deadline(10)
+    with deadline_scope(deadline):
+        assert allow_optional("semantic_keywords", 5)
+        clock.now += 6
+        assert not allow_optional("semantic_keywords", 5)
+    assert deadline.status("semantic_keywords") == "skipped"
+
+
+def test_scope_is_restored_after_the_block():
+    outer, inner = Deadline(10), Deadline(5)
+    with deadline_scope(outer):
+        with deadline_scope(inner):
+            assert current_deadline() is inner
+        assert current_deadline() is outer
+    assert current_deadline() is None
+
+
+@pytest.mark.asyncio
+async def test_deadline_propagates_into_tasks():
+    deadline = Deadline(10)
+
+    async def seen():
+        await asyncio.sleep(0)
+        return current_deadline()
+
+    with deadline_scope(deadline):
+        task = asyncio.create_task(seen())
+        gathered = await asyncio.gather(seen(), seen())
+    # Tasks copy the context when created, so leaving the scope does not affect them
+    assert await task is deadline
+    assert gathered == [deadline, deadline]
+
+    # A scope set inside a task does not leak back to the caller
+    async def scoped():
+        with deadline_scope(Deadline(1)):
+            await asyncio.sleep(0)
+
+    await asyncio.create_task(scoped())
+    assert current_deadline() is None
@@ -0,0 +1,96 @@
+import sqlite3
+
+import pytest
+
+from app.core import disk_cache as disk_cache_module
+from app.core.disk_cache import DiskCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(disk_cache_module.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = DiskCache("test", str(tmp_path / "cache.db"), max_bytes=100)
+    yield cache
+    cache.close()
+
+
+def test_miss_returns_none(cache):
+    assert cache.get_bytes("missing") is None
+    assert cache.get_json("missing") is None
+    assert cache.get_many_bytes(["missing"]) == {}
+
+
+def test_round_trip_and_persistence(tmp_path, clock):
+    path = str(tmp_path / "cache.db")
+    cache = DiskCache("test", path, max_bytes=1000)
+    cache.set_json("key", {"título": "Mochila", "bullets": [1, 2]})
+    cache.close()
+
+    reopened = DiskCache("test", path, max_bytes=1000)
+    assert reopened.get_json("key") == {"título": "Mochila", "bullets": [1, 2]}
+    assert reopened.stats()["bytes"] > 0
+    reopened.close()
+
+
+def test_entries_expire_after_their_ttl(cache, clock):
+    cache.set_bytes("short", b"a", ttl=10)
+    cache.set_bytes("forever", b"b")
+
+    clock.now += 9
+    assert cache.get_bytes("short") == b"a"
+
+    clock.now += 2
+    assert cache.get_bytes("short") is None
+    assert cache.get_many_bytes(["short", "forever"]) == {"forever": b"b"}
+    assert cache.stats()["bytes"] == 1
+
+
+def test_least_recently_used_entries_are_evicted_at_the_size_limit(cache, clock):
+    for key in ("a", "b", "c"):
+        cache.set_bytes(key, b"x" * 40)
+        clock.now += 1
+    # "a" was evicted to make room for "c"
+    assert cache.get_bytes("a") is None
+
+    # Reading "b" makes "c" the least recently used
+    clock.now += 1
+    assert cache.get_bytes("b") is not None
+    clock.now += 1
+    cache.set_bytes("d", b"x" * 40)
+
+    assert cache.get_bytes("c") is None
+    assert cache.get_bytes("b") is not None
+    assert cache.get_bytes("d") is not None
+    assert cache.stats()["bytes"] == 80
+
+
+def test_values_larger_than_the_budget_are_not_stored(cache):
+    cache.set_bytes("big", b"x" * 101)
+    assert cache.get_bytes("big") is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_corrupt_row_reads_as_a_miss_and_is_dropped(cache, tmp_path):
+    cache.set_json("key", {"ok": True})
+    conn = sqlite3.connect(str(tmp_path / "cache.db"))
+    conn.execute("UPDATE entries SET value = ? WHERE key = ?", (b"{not json", "key"))
+    conn.commit()
+    conn.close()
+
+    assert cache.get_json("key") is None
+    assert cache.get_bytes("key") is None
+    assert cache.stats()["bytes"] == 0
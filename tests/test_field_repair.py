@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.schemas.llm import OptimizedListing
+from app.services.field_repair import FieldRepair, split_path
+
+LISTING = {
+    "title": "Mochila de viaje 40L",
+    "description": "Mochila resistente al agua",
+    "bullets": ["Ligera", "Puerto USB", "Bolsillo oculto"],
+}
+
+
+class FakeOllama:
+    """Answers every ``generate`` call with the next queued response."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    async def generate(self, **kwargs):
+        self.calls.append(kwargs)
+        response = self.responses.pop(0)
+        if isinstance(response, dict) and "success" in response:
+            return response
+        return {"success": True, "response": json.dumps(response, ensure_ascii=False)}
+
+
+def test_split_path():
+    assert split_path("title") == ("title", None)
+    assert split_path("bullets.2") == ("bullets", 2)
+
+
+def test_can_repair_bounds(monkeypatch):
+    repair = FieldRepair("test", FakeOllama())
+    monkeypatch.setattr(settings, "llm_field_repair_max_fields", 2)
+
+    assert not repair.can_repair({})
+    assert repair.can_repair({"title": "missing"})
+    assert repair.can_repair({"title": "missing", "bullets.0": "too long"})
+    assert not repair.can_repair({"title": "missing", "bullets.0": "too long", "description": "missing"})
+
+    monkeypatch.setattr(settings, "llm_field_repair_enabled", False)
+    assert not repair.can_repair({"title": "missing"})
+
+
+@pytest.mark.asyncio
+async def test_nothing_is_generated_outside_the_bounds():
+    ollama = FakeOllama()
+
+    assert await FieldRepair("test", ollama).repair(LISTING, {}, OptimizedListing, product="") is None
+    assert ollama.calls == []
+
+
+@pytest.mark.asyncio
+async def test_repaired_fields_are_merged_into_the_listing():
+    ollama = FakeOllama({"bullets_1": "Puerto de carga USB", "improvements": ["Bullet 2 más claro"]})
+    problems = {"bullets.1": "contains the forbidden word 'free'", "improvements": "missing"}
+
+    repaired = await FieldRepair("test", ollama).repair(LISTING, problems, OptimizedListing, product="Mochila")
+
+    assert repaired == {
+        **LISTING,
+        "bullets": ["Ligera", "Puerto de carga USB", "Bolsillo oculto"],
+        "improvements": ["Bullet 2 más claro"],
+    }
+    # Only the requested fields are asked for
+    assert set(ollama.calls[0]["schema"].model_fields) == {"bullets_1", "improvements"}
+    assert LISTING["bullets"] == ["Ligera", "Puerto USB", "Bolsillo oculto"]
+
+
+@pytest.mark.asyncio
+async def test_a_bullet_past_the_end_is_appended():
+    ollama = FakeOllama({"bullets_3": "Garantía de dos años"})
+
+    repaired = await FieldRepair("test", ollama).repair(LISTING, {"bullets.3": "missing"}, OptimizedListing, product="")
+
+    assert repaired["bullets"] == LISTING["bullets"] + ["Garantía de dos años"]
+
+
+@pytest.mark.asyncio
+async def test_failed_or_invalid_repairs_return_none():
+    problems = {"title": "missing"}
+
+    failed = FakeOllama({"success": False, "error": "HTTP 500"})
+    assert await FieldRepair("test", failed).repair(LISTING, problems, OptimizedListing, product="") is None
+
+    invalid = FakeOllama({"title": ["not", "a", "string"]})
+    assert await FieldRepair("test", invalid).repair(LISTING, problems, OptimizedListing, product="") is None
@@ -0,0 +1,122 @@
+import json
+from typing import Dict, List
+
+from pydantic import BaseModel, Field
+
+from app.schemas.llm import ListingGeneration, OptimizedListing
+from app.services.json_stream import JSONObjectStream
+
+
+class Nested(BaseModel):
+    name: str
+    specs: Dict[str, List[int]]
+    tags: List[str] = []
+
+
+class Scored(BaseModel):
+    title: str
+    description: str
+    score: int = Field(default=0, ge=0, le=100)
+
+
+def feed_all(parser, text, size=7):
+    """Feed ``text`` in chunks of ``size`` characters; returns what the parser let through."""
+    return "".join(parser.feed(text[start:start + size]) for start in range(0, len(text), size))
+
+
+LISTING = {
+    "title": "Mochila de viaje 40L",
+    "description": "Resistente al agua",
+    "bullets": ["Ligera", "Puerto USB"],
+    "keywords": ["mochila", "viaje"],
+}
+
+
+def test_skips_a_code_fence_before_the_object():
+    parser = JSONObjectStream(ListingGeneration, grace_chunks=0)
+    body = json.dumps(LISTING, ensure_ascii=False)
+
+    passed = feed_all(parser, f"```json\n{body}\n```\nExplanation")
+
+    assert parser.complete and parser.error is None
+    assert parser.text == body
+    assert passed.endswith(body)
+    assert parser.fields == LISTING
+
+
+def test_escaped_quotes_and_braces_inside_strings():
+    parser = JSONObjectStream(ListingGeneration)
+    listing = {**LISTING, "title": 'Mochila "Pro" {40L}', "description": 'Bolsillo \\ oculto } y "{"'}
+
+    feed_all(parser, json.dumps(listing), size=3)
+
+    assert parser.complete and parser.error is None
+    assert parser.fields == listing
+
+
+def test_nested_objects_and_arrays():
+    parser = JSONObjectStream(Nested)
+    value = {"name": "Auriculares", "specs": {"hz": [20, 20000], "ohm": [32]}, "tags": ["a", "b"]}
+
+    feed_all(parser, json.dumps(value), size=5)
+
+    assert parser.complete and parser.error is None
+    assert parser.fields == value
+
+
+def test_constraint_violation_removes_the_field():
+    parser = JSONObjectStream(Scored)
+    text = '{"title": "T", "description": "D", "score": 150}'
+
+    feed_all(parser, text)
+
+    assert "score" in parser.error
+    assert "score" not in parser.fields
+    assert parser.fields == {"title": "T", "description": "D"}
+    assert parser.should_stop()
+
+
+def test_out_of_range_compliance_score_is_not_an_error():
+    # The optimizer recomputes the score, so the model's value is never rejected
+    parser = JSONObjectStream(OptimizedListing)
+    text = '{"title": "T", "description": "D", "bullets": ["b"], "compliance_score": 150}'
+
+    feed_all(parser, text)
+
+    assert parser.complete and parser.error is None
+    assert parser.fields["compliance_score"] == 150
+
+
+def test_missing_required_fields():
+    parser = JSONObjectStream(ListingGeneration)
+
+    feed_all(parser, json.dumps({"title": "T", "description": "D"}))
+
+    assert parser.complete
+    assert parser.error == "Missing required fields: ['bullets', 'keywords']"
+    assert parser.missing_fields() == ["bullets", "keywords"]
+    assert parser.fields == {"title": "T", "description": "D"}
+
+
+def test_finish_on_a_truncated_object():
+    parser = JSONObjectStream(ListingGeneration)
+
+    feed_all(parser, '{"title": "T", "description": "D", "bullets": ["uno", "do')
+    assert parser.error is None and not parser.complete
+
+    parser.finish()
+    assert parser.error == "Incomplete JSON response, missing fields: ['bullets', 'keywords']"
+    assert parser.fields == {"title": "T", "description": "D"}
+
+
+def test_should_stop_after_the_grace_chunks():
+    parser = JSONObjectStream(ListingGeneration, grace_chunks=2)
+    parser.feed(json.dumps(LISTING))
+    assert parser.complete and not parser.should_stop()
+
+    assert parser.feed("\n") == ""
+    assert parser.feed("\n") == ""
+    assert not parser.should_stop()
+
+    assert parser.feed("Trailing text") == ""
+    assert parser.should_stop()
@@ -0,0 +1,64 @@
+import pytest
+
+from app.services.language_detector import LanguageDetector
+
+
+@pytest.fixture
+def detector():
+    return LanguageDetector(max_entries=100)
+
+
+@pytest.mark.parametrize("text", [
+    "Mochila de viaje para portátil con puerto USB",
+    "Auriculares inalámbricos con cancelación de ruido",
+    "Zapatillas de running para hombre",
+    "Funda para iPhone 15 de silicona",
+    "Cafetera espresso con espumador de leche",
+    "Niño",
+])
+def test_spanish_titles(detector, text):
+    assert detector.detect(text) == "spanish"
+
+
+@pytest.mark.parametrize("text", [
+    "Travel backpack with USB charging port for laptops",
+    "Wireless earbuds with noise cancelling and charging case",
+    "Running shoes for men",
+    "Silicone case for iPhone 15 with MagSafe",
+    "The best espresso machine for your kitchen",
+])
+def test_english_titles(detector, text):
+    assert detector.detect(text) == "english"
+
+
+@pytest.mark.parametrize("text", [
+    "Samsung Galaxy Watch 6 smartwatch negro",
+    "Mochila Kipling backpack",
+    "Sony WH-1000XM5",
+    "",
+])
+def test_texts_without_stopwords_are_mixed(detector, text):
+    assert detector.detect(text) == "mixed"
+
+
+def test_accented_letters_win_over_english_stopwords(detector):
+    assert detector.detect("The best café for your kitchen") == "spanish"
+
+
+def test_each_stopword_counts_once(detector):
+    # Two distinct English words against one Spanish word repeated
+    assert detector.detect("de de de the and") == "english"
+    assert detector.detect("de the") == "mixed"
+
+
+def test_batch_matches_single_texts_and_caches(detector):
+    texts = ["Mochila de viaje", "Running shoes for men", "Mochila de viaje", "Sony WH-1000XM5"]
+
+    labels = detector.detect_many(texts)
+
+    assert labels == ["spanish", "english", "spanish", "mixed"]
+    assert labels == [LanguageDetector(max_entries=100).detect(text) for text in texts]
+    assert detector.stats()["cached"] == 3
+    # Case and Unicode normalization share cache entries
+    assert detector.detect("MOCHILA DE VIAJE") == "spanish"
+    assert detector.stats()["cached"] == 3
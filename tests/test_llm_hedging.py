@@ -0,0 +1,188 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services import llm_hedging
+from app.services import ollama_client as ollama_client_module
+from app.services.llm_hedging import first_response_histogram, hedge_delay, hedged_call
+from app.services.llm_scheduler import LLMScheduler
+from app.services.ollama_client import OllamaClient
+from app.services.ollama_pool import OllamaBackendPool
+
+
+@pytest.fixture
+def fixed_delay(monkeypatch):
+    """Hedge any request still running after 10ms and never leave a primary to finish."""
+    monkeypatch.setattr(llm_hedging, "hedge_delay", lambda model, mode: 0.01)
+    monkeypatch.setattr(settings, "llm_hedge_measure_fraction", 0.0)
+
+
+class Attempt:
+    """A fake primary or hedge that answers ``result`` after ``delay`` seconds."""
+
+    def __init__(self, result, delay, error=None):
+        self.result = result
+        self.delay = delay
+        self.error = error
+        self.started = False
+        self.cancelled = False
+
+    async def __call__(self):
+        self.started = True
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def test_no_hedge_delay_until_enough_samples(monkeypatch):
+    monkeypatch.setattr(settings, "llm_hedge_enabled", True)
+    monkeypatch.setattr(settings, "llm_hedge_min_samples", 3)
+    monkeypatch.setattr(settings, "llm_hedge_percentile", 50.0)
+    monkeypatch.setattr(settings, "llm_hedge_min_delay", 0.5)
+
+    for latency in (1.0, 2.0):
+        first_response_histogram.observe(latency, model="delay-model", mode="generate")
+    assert hedge_delay("delay-model", "generate") is None
+
+    first_response_histogram.observe(3.0, model="delay-model", mode="generate")
+    assert hedge_delay("delay-model", "generate") == pytest.approx(2.0)
+    # Modes are kept apart
+    assert hedge_delay("delay-model", "stream") is None
+
+
+def test_hedge_delay_respects_the_floor_and_the_switch(monkeypatch):
+    monkeypatch.setattr(settings, "llm_hedge_enabled", True)
+    monkeypatch.setattr(settings, "llm_hedge_min_samples", 1)
+    monkeypatch.setattr(settings, "llm_hedge_min_delay", 0.5)
+    first_response_histogram.observe(0.1, model="floor-model", mode="generate")
+
+    assert hedge_delay("floor-model", "generate") == 0.5
+
+    monkeypatch.setattr(settings, "llm_hedge_enabled", False)
+    assert hedge_delay("floor-model", "generate") is None
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_wins_without_hedging(fixed_delay):
+    primary, hedge = Attempt("primary", 0), Attempt("hedge", 0)
+
+    assert await hedged_call("m", "generate", primary, hedge) == "primary"
+    assert not hedge.started
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_loses_to_the_hedge_and_is_cancelled(fixed_delay):
+    primary, hedge = Attempt("primary", 1.0), Attempt("hedge", 0)
+
+    assert await hedged_call("m", "generate", primary, hedge) == "hedge"
+    assert primary.cancelled
+
+
+@pytest.mark.asyncio
+async def test_slow_hedge_is_cancelled_when_the_primary_wins(fixed_delay):
+    primary, hedge = Attempt("primary", 0.05), Attempt("hedge", 1.0)
+
+    assert await hedged_call("m", "generate", primary, hedge) == "primary"
+    assert hedge.started and hedge.cancelled
+
+
+@pytest.mark.asyncio
+async def test_rejected_and_failed_attempts_fall_back(fixed_delay):
+    # A rejected primary loses to an accepted hedge
+    primary, hedge = Attempt("bad", 0.05), Attempt("good", 0.1)
+    assert await hedged_call("m", "generate", primary, hedge, accept=lambda result: result == "good") == "good"
+
+    # With nothing accepted, the primary's result is returned
+    primary, hedge = Attempt("bad primary", 0.05), Attempt("bad hedge", 0.02)
+    assert await hedged_call("m", "generate", primary, hedge, accept=lambda result: False) == "bad primary"
+
+    # A failed primary gives way to a successful hedge, and both failing raises the primary's error
+    primary, hedge = Attempt(None, 0.02, error=ConnectionError("primary")), Attempt("hedge", 0.05)
+    assert await hedged_call("m", "generate", primary, hedge) == "hedge"
+    primary, hedge = Attempt(None, 0.02, error=ConnectionError("primary")), Attempt(None, 0.05, error=ValueError())
+    with pytest.raises(ConnectionError, match="primary"):
+        await hedged_call("m", "generate", primary, hedge)
+
+
+@pytest.mark.asyncio
+async def test_completed_losers_are_discarded(fixed_delay):
+    discarded = []
+
+    async def discard(result):
+        discarded.append(result)
+
+    # Rejected primary completes first; the accepted hedge wins and the primary is released
+    primary, hedge = Attempt("bad", 0.02), Attempt("good", 0.05)
+    result = await hedged_call("m", "stream", primary, hedge, accept=lambda result: result == "good", discard=discard)
+
+    assert result == "good"
+    assert discarded == ["bad"]
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_without_a_free_slot(fixed_delay):
+    primary, hedge = Attempt("primary", 0.05), Attempt("hedge", 0)
+
+    assert await hedged_call("m", "generate", primary, hedge, can_hedge=lambda: False) == "primary"
+    assert not hedge.started
+
+
+@pytest.mark.asyncio
+async def test_losing_primary_is_only_measured_when_its_slot_is_kept(fixed_delay, monkeypatch):
+    monkeypatch.setattr(settings, "llm_hedge_measure_fraction", 1.0)
+
+    primary, hedge = Attempt("primary", 0.05), Attempt("hedge", 0)
+    assert await hedged_call("m", "generate", primary, hedge) == "hedge"
+    assert primary.cancelled
+
+    kept = []
+    primary, hedge = Attempt("primary", 0.05), Attempt("hedge", 0)
+    assert await hedged_call("m", "generate", primary, hedge, keep_running=kept.append) == "hedge"
+    assert len(kept) == 1 and not primary.cancelled
+    await kept[0]
+    assert not primary.cancelled
+
+
+@pytest.mark.asyncio
+async def test_hedging_stays_within_the_scheduler_limit(fixed_delay, monkeypatch):
+    monkeypatch.setattr(settings, "llm_hedge_measure_fraction", 1.0)
+    monkeypatch.setattr(settings, "llm_max_in_flight", 2)
+    monkeypatch.setattr(settings, "llm_hedge_max_backend_in_flight", 100)
+    monkeypatch.setattr(ollama_client_module, "llm_scheduler", LLMScheduler())
+    monkeypatch.setattr(ollama_client_module, "ollama_pool", OllamaBackendPool(["http://a", "http://b"]))
+
+    client = OllamaClient()
+    running = 0
+    peak = 0
+
+    async def fake_post(payload, tried, prefer=None, schema=None, keep_context=False):
+        nonlocal running, peak
+        # The first attempt of each request is slow, so hedges win and primaries are left to finish
+        url = "http://b" if tried else "http://a"
+        delay = 0.01 if tried else 0.1
+        tried.append(url)
+        running += 1
+        peak = max(peak, running)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            running -= 1
+        return 200, {"response": payload["prompt"], "eval_count": 5}, url
+
+    monkeypatch.setattr(client, "_post_generate", fake_post)
+
+    results = await asyncio.gather(*[
+        client._request_generate({"model": "limit-model", "prompt": str(index)}, priority=None)
+        for index in range(6)
+    ])
+    await asyncio.gather(*llm_hedging._measurements)
+
+    assert [result["response"] for result in results] == [str(index) for index in range(6)]
+    assert peak <= 2
+    assert ollama_client_module.llm_scheduler.stats()["limit-model"]["in_flight"] == 0
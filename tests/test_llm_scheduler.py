@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services import llm_scheduler as scheduler_module
+from app.services.llm_scheduler import LLMScheduler, Priority
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    monkeypatch.setattr(settings, "llm_max_in_flight", 1)
+    monkeypatch.setattr(settings, "llm_min_in_flight", 1)
+    monkeypatch.setattr(settings, "llm_adaptive_concurrency", False)
+    return LLMScheduler()
+
+
+async def _hold(scheduler, model, priority, order, release):
+    async with scheduler.slot(model, priority):
+        order.append(priority)
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_are_served_before_batch(scheduler):
+    order = []
+    release = asyncio.Event()
+    first = asyncio.create_task(_hold(scheduler, "m", Priority.BATCH, order, release))
+    await asyncio.sleep(0)
+
+    batch = asyncio.create_task(_hold(scheduler, "m", Priority.BATCH, order, release))
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(_hold(scheduler, "m", Priority.INTERACTIVE, order, release))
+    await asyncio.sleep(0)
+    assert scheduler.stats()["m"]["queued"] == {"interactive": 1, "batch": 1}
+
+    release.set()
+    await asyncio.gather(first, batch, interactive)
+    assert order == [Priority.BATCH, Priority.INTERACTIVE, Priority.BATCH]
+    assert scheduler.stats()["m"]["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_keep_the_slot(scheduler):
+    order = []
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(scheduler, "m", Priority.INTERACTIVE, order, release))
+    await asyncio.sleep(0)
+
+    cancelled = asyncio.create_task(_hold(scheduler, "m", Priority.INTERACTIVE, order, release))
+    waiting = asyncio.create_task(_hold(scheduler, "m", Priority.BATCH, order, release))
+    await asyncio.sleep(0)
+
+    cancelled.cancel()
+    release.set()
+    await asyncio.gather(holder, waiting)
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+
+    assert order == [Priority.INTERACTIVE, Priority.BATCH]
+    assert scheduler.stats()["m"]["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_slot_granted_while_cancelled_is_handed_on(scheduler):
+    order = []
+    release = asyncio.Event()
+    holder_release = asyncio.Event()
+    holder = asyncio.create_task(_hold(scheduler, "m", Priority.INTERACTIVE, order, holder_release))
+    await asyncio.sleep(0)
+
+    granted = asyncio.create_task(_hold(scheduler, "m", Priority.INTERACTIVE, order, release))
+    waiting = asyncio.create_task(_hold(scheduler, "m", Priority.BATCH, order, release))
+    await asyncio.sleep(0)
+
+    # Releasing grants the slot to ``granted``; cancel it before it gets to run
+    holder_release.set()
+    while not holder.done():
+        await asyncio.sleep(0)
+    granted.cancel()
+
+    release.set()
+    await waiting
+    with pytest.raises(asyncio.CancelledError):
+        await granted
+
+    assert order == [Priority.INTERACTIVE, Priority.BATCH]
+    assert scheduler.stats()["m"]["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_no_capacity_while_the_limit_is_reached(scheduler):
+    assert scheduler.has_capacity("m")
+    async with scheduler.slot("m"):
+        # A hedge would have to queue behind the request it duplicates
+        assert not scheduler.has_capacity("m")
+    assert scheduler.has_capacity("m")
+
+
+async def _request(scheduler, clock, seconds, tokens):
+    async with scheduler.slot("m") as slot:
+        clock.now += seconds
+        if tokens is not None:
+            slot.record(tokens)
+
+
+@pytest.fixture
+def adaptive(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler_module.time, "monotonic", clock)
+    monkeypatch.setattr(settings, "llm_max_in_flight", 4)
+    monkeypatch.setattr(settings, "llm_min_in_flight", 1)
+    monkeypatch.setattr(settings, "llm_adaptive_concurrency", True)
+    monkeypatch.setattr(settings, "llm_latency_tolerance", 2.0)
+    return LLMScheduler(), clock
+
+
+@pytest.mark.asyncio
+async def test_limit_shrinks_when_per_token_latency_degrades(adaptive):
+    scheduler, clock = adaptive
+    for _ in range(5):
+        await _request(scheduler, clock, 5.0, 500)
+    assert scheduler.stats()["m"]["limit"] == 4
+
+    for _ in range(10):
+        await _request(scheduler, clock, 30.0, 500)
+    assert scheduler.stats()["m"]["limit"] < 4
+
+
+@pytest.mark.asyncio
+async def test_short_and_long_generations_at_the_same_speed_keep_the_limit(adaptive):
+    scheduler, clock = adaptive
+    for _ in range(10):
+        await _request(scheduler, clock, 0.5, 50)
+        await _request(scheduler, clock, 30.0, 3000)
+    assert scheduler.stats()["m"]["limit"] == 4
+
+
+@pytest.mark.asyncio
+async def test_unrecorded_failures_do_not_set_the_baseline(adaptive):
+    scheduler, clock = adaptive
+    for _ in range(10):
+        # Fast errors: the caller never records them
+        await _request(scheduler, clock, 0.01, None)
+        await _request(scheduler, clock, 10.0, 500)
+    assert scheduler.stats()["m"]["limit"] == 4
@@ -0,0 +1,50 @@
+import pytest
+
+from app.services.market_intelligence import MarketIntelligence
+
+
+class FakeWebSearch:
+    def __init__(self, results):
+        self.results = results
+
+    async def search_many(self, queries):
+        return [list(self.results) for _ in queries]
+
+
+class NoEmbeddings:
+    enabled = False
+
+
+def make_intelligence(results):
+    return MarketIntelligence(ollama=object(), embeddings=NoEmbeddings(), web_search=FakeWebSearch(results))
+
+
+@pytest.mark.asyncio
+async def test_simulated_competitors_mark_the_analysis_degraded():
+    intelligence = make_intelligence([])
+
+    result = await intelligence.analyze_market_competition(
+        "Mochila de viaje", "Mochila resistente al agua", include_insights=False
+    )
+
+    assert result["success"]
+    assert result["degraded"]
+    assert all(competitor["source"] == "simulated" for competitor in result["data"]["competitors"])
+
+
+@pytest.mark.asyncio
+async def test_real_competitors_are_not_degraded():
+    results = [
+        {"title": f"Mochila de viaje {index} impermeable", "snippet": f"Mochila de viaje por {30 + index}€",
+         "url": f"https://shop.example/{index}"}
+        for index in range(5)
+    ]
+    intelligence = make_intelligence(results)
+
+    result = await intelligence.analyze_market_competition(
+        "Mochila de viaje", "Mochila resistente al agua", max_competitors=5, include_insights=False
+    )
+
+    assert result["success"]
+    assert not result["degraded"]
+    assert result["data"]["competitors_analyzed"] == 5
@@ -0,0 +1,127 @@
+import aiohttp
+import pytest
+
+from app.services import ollama_pool as pool_module
+from app.services.ollama_pool import OllamaBackendPool
+
+URLS = ["http://a:11434", "http://b:11434", "http://c:11434"]
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """Answers ``/api/tags`` probes: an int is the HTTP status, an exception is raised."""
+
+    def __init__(self, replies):
+        self.replies = replies
+
+    def get(self, url, timeout=None):
+        reply = self.replies[url.rsplit("/api/", 1)[0]]
+        if isinstance(reply, Exception):
+            raise reply
+        return FakeResponse(reply)
+
+
+@pytest.fixture
+def pool():
+    return OllamaBackendPool(URLS)
+
+
+@pytest.fixture
+def replies(monkeypatch):
+    replies = {url: 200 for url in URLS}
+
+    async def get_session():
+        return FakeSession(replies)
+
+    monkeypatch.setattr(pool_module.http_transport, "get_session", get_session)
+    return replies
+
+
+def test_picks_the_backend_with_the_lowest_expected_wait(pool):
+    a, b, c = pool.backends
+    a.latency_ewma, b.latency_ewma, c.latency_ewma = 1.0, 0.5, 2.0
+    assert pool.pick() is b
+
+    # Two requests queued on b: (2 + 1) * 0.5 > (0 + 1) * 1.0
+    b.in_flight = 2
+    assert pool.pick() is a
+    assert pool.pick(exclude=[a.url]) is b
+
+
+def test_unknown_latency_counts_as_the_average(pool):
+    a, b, c = pool.backends
+    a.latency_ewma, b.latency_ewma = 1.0, 3.0
+    # c has no samples yet and counts as 2.0
+    assert pool.pick() is a
+
+    a.in_flight = 2
+    assert pool.pick() is c
+
+
+def test_unhealthy_backends_are_skipped_until_none_is_left(pool):
+    a, b, c = pool.backends
+    a.set_healthy(False)
+    b.set_healthy(False)
+    assert pool.pick() is c
+
+    c.set_healthy(False)
+    # Everything is down: still route, skipping excluded hosts
+    assert pool.pick(exclude=[a.url, c.url]) is b
+
+
+@pytest.mark.asyncio
+async def test_lease_tracks_load_and_prefers_a_healthy_host(pool):
+    a, b, c = pool.backends
+    async with pool.lease(prefer=c.url) as backend:
+        assert backend is c and c.in_flight == 1
+    assert c.in_flight == 0 and c.latency_ewma is not None
+
+    c.set_healthy(False)
+    async with pool.lease(prefer=c.url) as backend:
+        assert backend is not c
+
+
+@pytest.mark.asyncio
+async def test_connection_error_ejects_the_backend(pool):
+    with pytest.raises(aiohttp.ClientConnectionError):
+        async with pool.lease(prefer=URLS[0]):
+            raise aiohttp.ClientConnectionError("refused")
+
+    assert not pool.backends[0].healthy
+    assert pool.backends[0].in_flight == 0
+    assert pool.pick().url != URLS[0]
+
+
+@pytest.mark.asyncio
+async def test_other_errors_keep_the_backend_in_rotation(pool):
+    with pytest.raises(ValueError):
+        async with pool.lease(prefer=URLS[0]):
+            raise ValueError("bad response")
+    assert pool.backends[0].healthy
+
+
+@pytest.mark.asyncio
+async def test_probes_eject_and_recover_backends(pool, replies):
+    a, b, c = pool.backends
+    replies[a.url] = 500
+    replies[b.url] = aiohttp.ClientConnectionError("refused")
+
+    await pool.probe_all()
+    assert [backend.healthy for backend in pool.backends] == [False, False, True]
+    assert a.last_error == "HTTP 500" and b.last_error == "refused"
+    assert pool.pick() is c
+
+    replies[a.url] = replies[b.url] = 200
+    await pool.probe_all()
+    assert all(backend.healthy for backend in pool.backends)
+    assert a.last_error is None and a.last_checked is not None
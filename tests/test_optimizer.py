@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from app.agents.optimizer import OptimizerAgent
+
+LISTING = {
+    "title": "Mochila de viaje 40L impermeable",
+    "description": "Mochila resistente al agua con puerto USB",
+    "bullets": ["Ligera y resistente", "Puerto USB integrado"],
+}
+
+
+class FakeOllama:
+    """Answers every ``generate`` call with the next queued result."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+
+    async def generate(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.results.pop(0)
+
+
+def rejected(partial):
+    """A generation rejected by the stream validator, with the fields that were valid."""
+    return {"success": False, "error": "Invalid output", "partial": partial}
+
+
+async def optimize(ollama):
+    return await OptimizerAgent(ollama=ollama).optimize(
+        LISTING["title"], LISTING["description"], LISTING["bullets"], ["mochila"]
+    )
+
+
+@pytest.mark.asyncio
+async def test_invalid_optional_field_is_dropped_without_a_repair():
+    ollama = FakeOllama(rejected({**LISTING, "improvements": "Título más claro", "compliance_score": "alto"}))
+
+    result = await optimize(ollama)
+
+    assert result["success"]
+    assert result["data"]["improvements"] == []
+    assert result["data"]["compliance_score"] == 100
+    assert "repaired_fields" not in result["data"]
+    assert len(ollama.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_missing_required_field_is_repaired_with_the_invalid_ones():
+    partial = {"title": LISTING["title"], "description": LISTING["description"], "improvements": "Título más claro"}
+    repair = {"bullets": LISTING["bullets"], "improvements": ["Título más claro"]}
+    ollama = FakeOllama(rejected(partial), {"success": True, "response": json.dumps(repair)})
+
+    result = await optimize(ollama)
+
+    assert result["success"]
+    assert result["data"]["bullets"] == LISTING["bullets"]
+    assert result["data"]["improvements"] == ["Título más claro"]
+    assert result["data"]["repaired_fields"] == ["bullets", "improvements"]
+    assert set(ollama.calls[1]["schema"].model_fields) == {"bullets", "improvements"}
+
+
+@pytest.mark.asyncio
+async def test_failed_repair_reports_an_incomplete_response():
+    ollama = FakeOllama(rejected({"title": LISTING["title"]}), {"success": False, "error": "HTTP 500"})
+
+    result = await optimize(ollama)
+
+    assert result == {"success": False, "message": "Respuesta incompleta del modelo", "data": None}
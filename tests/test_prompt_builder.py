@@ -0,0 +1,103 @@
+import pytest
+
+from app.core.config import settings
+from app.services.prompt_builder import PromptBuilder, prompt_budget, trim_lines, trim_text
+
+
+@pytest.fixture(autouse=True)
+def one_char_per_token(monkeypatch):
+    # Token estimates equal character counts, so budgets are easy to reason about
+    monkeypatch.setattr(settings, "llm_chars_per_token", 1.0)
+
+
+def _rendered_tokens(built):
+    # ``BuiltPrompt.text`` wraps the sections in a leading and trailing newline
+    return built.tokens - 2
+
+
+def test_without_a_budget_sections_are_kept_in_order():
+    built = PromptBuilder().add("a", "first").add("b", "second").add("c", "").build()
+    assert built.text == "\nfirst\n\nsecond\n"
+
+
+def test_fits_within_the_budget():
+    builder = PromptBuilder(budget_tokens=60)
+    builder.add("instructions", "Write a listing.", required=True)
+    builder.add("context", "One sentence here. Another sentence there. A third one to cut.", priority=1)
+
+    built = builder.build()
+
+    assert _rendered_tokens(built) <= 60
+    assert built.text.startswith("\nWrite a listing.")
+    assert built.report()["sections"]["context"]["trimmed"]
+    assert "A third one" not in built.text
+
+
+def test_highest_priority_value_is_trimmed_first():
+    # 16 + 80 + 80 tokens and two separators: only "market" has to give way
+    builder = PromptBuilder(budget_tokens=130)
+    builder.add("product", "Mochila de viaje", required=True)
+    builder.add("seo", "keyword " * 10, priority=1)
+    builder.add("market", "insight " * 10, priority=2)
+
+    report = builder.build().report()["sections"]
+
+    assert report["market"]["trimmed"]
+    assert not report["seo"]["trimmed"]
+    assert not report["product"]["trimmed"]
+
+
+def test_lower_priorities_are_trimmed_once_higher_ones_are_gone():
+    builder = PromptBuilder(budget_tokens=30)
+    builder.add("product", "Mochila de viaje", required=True)
+    builder.add("seo", "keyword " * 10, priority=1)
+    builder.add("market", "insight " * 10, priority=2)
+
+    built = builder.build()
+    report = built.report()["sections"]
+
+    assert report["market"]["tokens"] == 0
+    assert report["seo"]["trimmed"]
+    assert _rendered_tokens(built) <= 30
+
+
+def test_required_sections_are_never_dropped():
+    requirements = "Output only JSON. " * 10
+    builder = PromptBuilder(budget_tokens=20)
+    builder.add("requirements", requirements, required=True)
+    builder.add("context", "optional context", priority=1)
+
+    built = builder.build()
+
+    # Over budget, but the required text is intact and the optional one is gone
+    assert requirements.strip() in built.text
+    assert "optional context" not in built.text
+
+
+def test_min_tokens_floor_and_soft_cap():
+    builder = PromptBuilder(budget_tokens=40)
+    builder.add("product", "x" * 10, required=True)
+    builder.add("description", "word " * 20, priority=1, min_tokens=15)
+    builder.add("competitors", "line\n" * 20, priority=0, max_tokens=25, strategy="lines")
+
+    built = builder.build()
+    report = built.report()["sections"]
+
+    assert report["competitors"]["tokens"] <= 25
+    # Shrunk towards its floor rather than dropped
+    assert 0 < report["description"]["tokens"] <= 15
+    assert _rendered_tokens(built) <= 40
+
+
+def test_trim_helpers():
+    assert trim_text("One. Two. Three.", 11) == "One. Two.…"
+    assert trim_text("short", 10) == "short"
+    assert trim_lines("Header:\n- a\n- b\n- c", 12) == "Header:\n- a"
+    # A header without any of its lines is dropped
+    assert trim_lines("Header:\n- a\n- b", 9) == ""
+
+
+def test_prompt_budget_reserves_system_prompt_output_and_margin(monkeypatch):
+    monkeypatch.setattr(settings, "llm_prompt_safety_margin", 100)
+    assert prompt_budget(4096, 1024, "s" * 500) == 4096 - 500 - 1024 - 100
+    assert prompt_budget(1000, 2048) == 0
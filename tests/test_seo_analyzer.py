@@ -0,0 +1,47 @@
+import pytest
+
+from app.services.seo_analyzer import SEOAnalyzer
+
+
+class FakeEmbeddings:
+    """Collapses plural variants, standing in for embedding similarity."""
+
+    enabled = True
+
+    def __init__(self):
+        self.calls = []
+
+    async def dedupe(self, texts, threshold=None):
+        self.calls.append(list(texts))
+        kept = []
+        for text in texts:
+            if not any(text.rstrip("s") == other.rstrip("s") for other in kept):
+                kept.append(text)
+        return kept
+
+
+def _analysis(keywords):
+    return {"success": True, "data": {"enhanced_keywords": {"all_keywords": list(keywords)}}}
+
+
+@pytest.mark.asyncio
+async def test_semantic_keywords_are_merged_in_order_and_deduplicated():
+    embeddings = FakeEmbeddings()
+    analyzer = SEOAnalyzer(ollama=object(), embeddings=embeddings)
+    analysis = _analysis(["mochila", "impermeable", "mochila viaje"])
+
+    await analyzer.apply_semantic_keywords(analysis, ["Mochilas", "mochila viaje", "bolso de mano", "xx"])
+
+    keywords = analysis["data"]["enhanced_keywords"]
+    assert keywords["all_keywords"] == ["mochila", "impermeable", "mochila viaje", "bolso de mano"]
+    assert keywords["semantic"] == ["mochilas", "mochila viaje", "bolso de mano"]
+    assert keywords["total_count"] == 4
+    assert embeddings.calls == [["mochila", "impermeable", "mochila viaje", "mochilas", "bolso de mano"]]
+
+
+@pytest.mark.asyncio
+async def test_failed_analysis_is_left_alone():
+    embeddings = FakeEmbeddings()
+    analysis = {"success": False, "data": None}
+    assert await SEOAnalyzer(ollama=object(), embeddings=embeddings).apply_semantic_keywords(analysis, ["a b c"]) is analysis
+    assert embeddings.calls == []
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_run_once():
+    flights = SingleFlight("test")
+    calls = 0
+    release = asyncio.Event()
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "result"
+
+    callers = [asyncio.create_task(flights.do("key", work)) for _ in range(5)]
+    await asyncio.sleep(0)
+    assert flights.in_flight() == 1
+
+    release.set()
+    assert await asyncio.gather(*callers) == ["result"] * 5
+    assert calls == 1
+    assert flights.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_different_keys_run_separately():
+    flights = SingleFlight("test")
+
+    async def work(value):
+        await asyncio.sleep(0)
+        return value
+
+    assert await asyncio.gather(flights.do("a", lambda: work(1)), flights.do("b", lambda: work(2))) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_every_caller_gets_the_leaders_exception():
+    flights = SingleFlight("test")
+    release = asyncio.Event()
+
+    async def fail():
+        await release.wait()
+        raise RuntimeError("upstream failed")
+
+    callers = [asyncio.create_task(flights.do("key", fail)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+
+    outcomes = await asyncio.gather(*callers, return_exceptions=True)
+    assert all(isinstance(outcome, RuntimeError) and str(outcome) == "upstream failed" for outcome in outcomes)
+    assert flights.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_key_is_cleared_after_completion():
+    flights = SingleFlight("test")
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await flights.do("key", work) == 1
+    # Not in flight any more: a later call runs again
+    assert await flights.do("key", work) == 2
+    assert flights.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_work_is_cancelled_only_when_every_caller_is_gone():
+    flights = SingleFlight("test")
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def work():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    first = asyncio.create_task(flights.do("key", work))
+    second = asyncio.create_task(flights.do("key", work))
+    await started.wait()
+
+    first.cancel()
+    await asyncio.gather(first, return_exceptions=True)
+    assert not cancelled.is_set()
+    assert flights.in_flight() == 1
+
+    second.cancel()
+    await asyncio.gather(second, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert cancelled.is_set()
+    assert flights.in_flight() == 0
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from app.core.stage_graph import StageGraph
+
+
+def _stage(result, seconds=0.0, seen=None):
+    async def run(done):
+        if seen is not None:
+            seen.append(dict(done))
+        await asyncio.sleep(seconds)
+        return result
+    return run
+
+
+@pytest.mark.asyncio
+async def test_dependent_stage_gets_its_dependency_with_a_slow_consumer():
+    seen = []
+    graph = StageGraph("test")
+    graph.add("other", _stage("other result"))
+    graph.add("research", _stage("research result", seconds=0.02))
+    graph.add("seo", _stage("seo result", seen=seen), depends_on=["research"])
+
+    finished = []
+    async for name in graph.as_completed():
+        finished.append(name)
+        # Still busy with "other" when "research" finishes and "seo" starts
+        await asyncio.sleep(0.05)
+
+    assert seen == [{"research": "research result"}]
+    assert finished == ["other", "research", "seo"]
+    assert graph.results == {"other": "other result", "research": "research result", "seo": "seo result"}
+
+
+@pytest.mark.asyncio
+async def test_independent_stages_run_concurrently():
+    graph = StageGraph("test")
+    graph.add("a", _stage("a", seconds=0.05))
+    graph.add("b", _stage("b", seconds=0.05))
+    graph.add("c", _stage("c", seconds=0.05), depends_on=["a"])
+
+    results = await graph.run()
+
+    assert results == {"a": "a", "b": "b", "c": "c"}
+    assert graph.timings["b"]["start"] < graph.timings["a"]["end"]
+    assert graph.timings["c"]["start"] >= graph.timings["a"]["end"]
+
+
+@pytest.mark.asyncio
+async def test_failed_stage_cancels_the_rest():
+    cancelled = asyncio.Event()
+
+    async def fail(done):
+        raise RuntimeError("boom")
+
+    async def slow(done):
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    graph = StageGraph("test").add("fail", fail).add("slow", slow)
+    with pytest.raises(RuntimeError):
+        await graph.run()
+    assert cancelled.is_set()
+
+
+def test_dependencies_must_be_added_first():
+    graph = StageGraph("test")
+    with pytest.raises(ValueError):
+        graph.add("seo", _stage(None), depends_on=["research"])
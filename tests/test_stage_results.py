@@ -0,0 +1,98 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.database import Base
+from app.models.listing import Listing, ListingStageResult
+from app.services import stage_results
+from app.services.stage_results import StageResultStore, stage_fingerprint
+
+RESULT = {"success": True, "data": {"competitors_found": 3}}
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def listing_id(db):
+    listing = Listing(original_title="Mochila de viaje", original_description="Resistente al agua")
+    db.add(listing)
+    db.commit()
+    return listing.id
+
+
+def test_fingerprint_depends_on_inputs_not_their_order():
+    first = stage_fingerprint("seo_analysis", title="T", keywords=["a", "b"])
+
+    assert first == stage_fingerprint("seo_analysis", keywords=["a", "b"], title="T")
+    assert first != stage_fingerprint("seo_analysis", title="T", keywords=["a"])
+    assert first != stage_fingerprint("market_intelligence", title="T", keywords=["a", "b"])
+
+
+def test_matching_fingerprint_is_reused_across_stores(db, listing_id):
+    fingerprint = stage_fingerprint("competitor_research", search_terms=["mochila"])
+    StageResultStore(db, listing_id).save("competitor_research", fingerprint, RESULT)
+
+    store = StageResultStore(db, listing_id)
+
+    assert store.get("competitor_research", fingerprint) == RESULT
+    assert store.reused == ["competitor_research"]
+    assert store.get("competitor_research", stage_fingerprint("competitor_research", search_terms=["bolso"])) is None
+    assert store.get("seo_analysis", fingerprint) is None
+
+
+def test_reused_output_is_a_copy(db, listing_id):
+    store = StageResultStore(db, listing_id)
+    result = {"success": True, "data": {"keywords": ["mochila"]}}
+    store.save("seo_analysis", "fp", result)
+    result["data"]["keywords"].append("changed")
+
+    reused = store.get("seo_analysis", "fp")
+    reused["data"]["keywords"].append("changed again")
+
+    assert store.get("seo_analysis", "fp") == {"success": True, "data": {"keywords": ["mochila"]}}
+
+
+def test_saving_replaces_the_stored_output(db, listing_id):
+    store = StageResultStore(db, listing_id)
+    store.save("seo_analysis", "old", RESULT)
+    store.save("seo_analysis", "new", {"success": True, "data": {}})
+
+    rows = db.query(ListingStageResult).filter(ListingStageResult.listing_id == listing_id).all()
+    assert [(row.stage, row.fingerprint) for row in rows] == [("seo_analysis", "new")]
+    assert StageResultStore(db, listing_id).get("seo_analysis", "old") is None
+
+
+def test_stage_version_bump_invalidates_stored_output(db, listing_id, monkeypatch):
+    fingerprint = stage_fingerprint("market_intelligence", title="T")
+    StageResultStore(db, listing_id).save("market_intelligence", fingerprint, RESULT)
+
+    monkeypatch.setitem(stage_results.STAGE_VERSIONS, "market_intelligence", 2)
+    bumped = stage_fingerprint("market_intelligence", title="T")
+
+    assert bumped != fingerprint
+    assert StageResultStore(db, listing_id).get("market_intelligence", bumped) is None
+
+
+@pytest.mark.parametrize("result", [
+    {"success": False, "error": "Ollama unavailable", "data": None},
+    {"success": True, "degraded": True, "data": {"competitors_found": 5}},
+])
+def test_failed_and_degraded_outputs_are_not_stored(db, listing_id, result):
+    StageResultStore(db, listing_id).save("competitor_research", "fp", result)
+
+    assert db.query(ListingStageResult).count() == 0
+    assert StageResultStore(db, listing_id).get("competitor_research", "fp") is None
+
+
+def test_nothing_is_reused_when_incremental_analysis_is_off(db, listing_id, monkeypatch):
+    StageResultStore(db, listing_id).save("seo_analysis", "fp", RESULT)
+    monkeypatch.setattr(stage_results.settings, "incremental_analysis_enabled", False)
+
+    assert StageResultStore(db, listing_id).get("seo_analysis", "fp") is None